@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+"""
+Low-overhead disk I/O (and resource) sampler for TiKV nodes.
+
+Runs on a TiKV node (tikv-ycsb.py uploads it) and reads the kernel's I/O
+counters at a fixed interval instead of tracing every syscall:
+- /proc/diskstats for the device backing the data directory: bytes read
+  and written, write requests, and flush requests (kernel >= 5.5).
+- /proc/<pid>/io of every process whose command line matches --match:
+  read_bytes/write_bytes that reached storage, write syscalls, and wchar
+  (bytes passed to write()).
+Nothing is attached to the measured process. Counters are cumulative;
+a row is written only when a source's counters changed, so idle periods
+cost nothing:
+
+    time,source,read_bytes,write_bytes,writes,flushes,wchar
+    1700000000.100,dev:nvme1n1,0,4096,1,1,0
+    1700000000.100,pid:1234,0,4096,12,0,40960
+
+With --resources, node-wide utilization counters are also written every
+sample (cumulative, CPU in jiffies, disk busy time of the sampled
+devices in ms, network bytes over all interfaces but lo):
+
+    time,cpu_busy,cpu_iowait,cpu_total,disk_busy_ms,net_rx_bytes,net_tx_bytes
+
+With --memory, page cache and memory counters are written every sample:
+the usage and memory.stat of the --cgroup TiKV runs in (v2 or v1; empty
+without one) and the node's /proc/vmstat. Refaults and major faults are
+page cache misses of pages that had been cached before:
+
+    time,memory_current,anon,file,active_file,inactive_file,refault,activate,pgmajfault,vm_pgpgin,vm_pgmajfault,vm_refault
+
+    sudo ./disksampler.py --device nvme1n1 --match tikv-server --out disk-samples.csv
+    ./disksampler.py phases disk-samples.csv phases.csv
+
+`phases` prints what each source wrote during every phase in phases.csv.
+"""
+
+import argparse
+import csv
+import os
+import signal
+import sys
+import time
+
+fields = ['time', 'source', 'read_bytes', 'write_bytes', 'writes', 'flushes', 'wchar']
+counters = fields[2:]
+memory_fields = ['time', 'memory_current', 'anon', 'file', 'active_file', 'inactive_file',
+                 'refault', 'activate', 'pgmajfault', 'vm_pgpgin', 'vm_pgmajfault', 'vm_refault']
+# memory.stat names per column: cgroup v2 (newer, older kernels), then v1
+cgroup_stats = {
+    'anon': ['anon', 'total_rss'],
+    'file': ['file', 'total_cache'],
+    'active_file': ['active_file', 'total_active_file'],
+    'inactive_file': ['inactive_file', 'total_inactive_file'],
+    'refault': ['workingset_refault_file', 'workingset_refault'],
+    'activate': ['workingset_activate_file', 'workingset_activate'],
+    'pgmajfault': ['pgmajfault', 'total_pgmajfault'],
+}
+resource_fields = ['time', 'cpu_busy', 'cpu_iowait', 'cpu_total', 'disk_busy_ms', 'net_rx_bytes', 'net_tx_bytes']
+SECTOR = 512
+
+
+def read_diskstats(devices):
+    """
+    ({'dev:<name>': counters}, busy ms summed over those devices) for the
+    given devices (all whole disks if empty).
+    """
+    stats = {}
+    busy = 0
+    with open('/proc/diskstats') as f:
+        for line in f:
+            parts = line.split()
+            name = parts[2]
+            if devices and name not in devices:
+                continue
+            if name.startswith(('loop', 'ram')) or (not devices and not os.path.exists(f'/sys/block/{name}')):
+                continue
+            values = [int(v) for v in parts[3:]]
+            flushes = values[15] if len(values) > 15 else 0
+            stats[f'dev:{name}'] = [values[2] * SECTOR, values[6] * SECTOR, values[4], flushes, 0]
+            busy += values[9]
+    return stats, busy
+
+
+def read_cpu():
+    """(busy, iowait, total) jiffies of all CPUs."""
+    with open('/proc/stat') as f:
+        values = [int(v) for v in f.readline().split()[1:]]
+    # user nice system idle iowait irq softirq steal (guest time is already in user)
+    idle, iowait = values[3], values[4]
+    total = sum(values[:8])
+    return total - idle - iowait, iowait, total
+
+
+def read_net():
+    """(rx, tx) bytes over every interface but lo."""
+    rx = tx = 0
+    with open('/proc/net/dev') as f:
+        for line in f.readlines()[2:]:
+            name, _, rest = line.partition(':')
+            if name.strip() == 'lo':
+                continue
+            values = rest.split()
+            rx += int(values[0])
+            tx += int(values[8])
+    return rx, tx
+
+
+def read_keyed(path):
+    """{key: int} of a 'key value' per line file such as memory.stat or /proc/vmstat."""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(' ')
+            values[key] = int(value)
+    return values
+
+
+def cgroup_dir(cgroup):
+    """Directory of a cgroup path (e.g. /system.slice/tikv-0.scope) under the v2 or v1 memory hierarchy."""
+    for root in ('/sys/fs/cgroup', '/sys/fs/cgroup/memory'):
+        if os.path.exists(f'{root}{cgroup}/memory.stat'):
+            return f'{root}{cgroup}'
+    return None
+
+
+def read_memory(cgroup):
+    """One memory_fields row without the time; cgroup columns are empty if it is not (yet) there."""
+    row = []
+    path = cgroup_dir(cgroup) if cgroup else None
+    stats = {}
+    if path:
+        try:
+            stats = read_keyed(f'{path}/memory.stat')
+            current = 'memory.current' if os.path.exists(f'{path}/memory.current') else 'memory.usage_in_bytes'
+            with open(f'{path}/{current}') as f:
+                row.append(int(f.read()))
+        except OSError:
+            stats = {}
+    if not stats:
+        row = ['']
+    for names in cgroup_stats.values():
+        row.append(next((stats[n] for n in names if n in stats), ''))
+    vm = read_keyed('/proc/vmstat')
+    row += [vm.get('pgpgin', ''), vm.get('pgmajfault', ''),
+            vm.get('workingset_refault_file', vm.get('workingset_refault', ''))]
+    return row
+
+
+def read_proc_io(pid):
+    values = {}
+    with open(f'/proc/{pid}/io') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            values[key] = int(value)
+    return [values['read_bytes'], values['write_bytes'], values['syscw'], 0, values['wchar']]
+
+
+def find_pids(pattern):
+    me = os.getpid()
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit() or int(entry) == me:
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+        except OSError:
+            continue
+        if pattern in cmdline and 'disksampler' not in cmdline:
+            pids.append(int(entry))
+    return pids
+
+
+def sample(args):
+    stopped = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopped.append(True))
+
+    devices = set(args.device or [])
+    last = {}
+    pids = []
+    next_scan = 0.0
+    resources = open(args.resources, 'w', newline='') if args.resources else None
+    if resources:
+        rwriter = csv.writer(resources)
+        rwriter.writerow(resource_fields)
+    memory = open(args.memory, 'w', newline='') if args.memory else None
+    if memory:
+        mwriter = csv.writer(memory)
+        mwriter.writerow(memory_fields)
+    with open(args.out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        next_sample = time.time()
+        while not stopped:
+            now = time.time()
+            if args.match and now >= next_scan:
+                # processes come and go between runs; rescan once a second
+                pids = find_pids(args.match)
+                next_scan = now + 1.0
+            stats, busy = read_diskstats(devices)
+            if resources:
+                rwriter.writerow([f'{now:.3f}', *read_cpu(), busy, *read_net()])
+                resources.flush()
+            if memory:
+                mwriter.writerow([f'{now:.3f}', *read_memory(args.cgroup)])
+                memory.flush()
+            for pid in pids:
+                try:
+                    stats[f'pid:{pid}'] = read_proc_io(pid)
+                except (OSError, KeyError):
+                    pass
+            for source, values in stats.items():
+                if last.get(source) != values:
+                    writer.writerow([f'{now:.3f}', source] + values)
+                    last[source] = values
+            f.flush()
+            next_sample += args.interval
+            time.sleep(max(next_sample - time.time(), 0))
+    if resources:
+        resources.close()
+    if memory:
+        memory.close()
+
+
+def read_samples(path):
+    """{source: [(time, counters)]} in time order."""
+    series = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            series.setdefault(row['source'], []).append(
+                (float(row['time']), [int(row[c]) for c in counters]))
+    return series
+
+
+def at(points, t):
+    """Counters of a source at time t: its last sample at or before t."""
+    value = None
+    for ts, values in points:
+        if ts > t:
+            break
+        value = values
+    return value or [0] * len(counters)
+
+
+def phase_deltas(series, phases):
+    """One row per (phase, source): what the source's counters grew by within the phase."""
+    rows = []
+    for phase in phases:
+        for source, points in sorted(series.items()):
+            start, end = at(points, phase['start']), at(points, phase['end'])
+            rows.append(dict({k: phase[k] for k in ('phase', 'workload', 'threads')}, source=source,
+                             seconds=phase['end'] - phase['start'],
+                             **{c: e - s for c, e, s in zip(counters, end, start)}))
+    return rows
+
+
+def print_phases(args):
+    # only needed for analysis, and phases.py is not uploaded to the nodes
+    from phases import read_phases
+    writer = csv.writer(sys.stdout)
+    columns = ['phase', 'workload', 'threads', 'source', 'seconds'] + counters
+    writer.writerow(columns)
+    for row in phase_deltas(read_samples(args.samples), read_phases(args.phases)):
+        writer.writerow([f'{row[c]:.3f}' if c == 'seconds' else row[c] for c in columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('phases', help='counter deltas per phase of phases.csv')
+    p.add_argument('samples')
+    p.add_argument('phases')
+
+    # sampling is the default command, so the remote command line stays short
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between samples (0.1)')
+    parser.add_argument('--device', action='append', help='block device name, e.g. nvme1n1 (all disks by default)')
+    parser.add_argument('--match', default=None, help='also sample processes whose command line contains this')
+    parser.add_argument('--out', default='disk-samples.csv')
+    parser.add_argument('--resources', default=None, help='also write CPU, disk busy and network counters here')
+    parser.add_argument('--memory', default=None, help='also write memory and page cache counters here')
+    parser.add_argument('--cgroup', default=None, help='--memory: cgroup of the measured process, e.g. /system.slice/tikv-0.scope')
+
+    args = parser.parse_args()
+    if args.command == 'phases':
+        print_phases(args)
+    else:
+        sample(args)
@@ -0,0 +1,441 @@
+#!/usr/bin/python
+"""
+Lightweight stand-ins for pd-server, tikv-server and go-ycsb, used by
+`tikv-ycsb.py --local --fake` to exercise the experiment harness on a
+single Linux host without building TiKV.
+
+They accept the same command lines tikv-ycsb.py passes to the real
+binaries and produce output in the same formats:
+- pd:   serves /pd/api/v1/health and /pd/api/v1/stores on its client URL.
+- tikv: registers with pd, serves /status and a Prometheus /metrics page
+        with the raftstore, engine and grpc metrics our analysis reads,
+        and writes a TiKV style log. Requests are served by a small pool
+        of "raftstore" workers, so latency rises once it saturates.
+- ycsb: go-ycsb style `load|run tikv -P workload -p key=value ...` that
+        sends batches of operations to the fake stores and prints the
+        periodic and final go-ycsb summary lines.
+
+    ./fakecluster.py pd --client-urls=http://127.0.0.1:2379 --log-file=pd.log
+    ./fakecluster.py tikv --pd-endpoints=127.0.0.1:2379 --addr=127.0.0.1:20160 \\
+        --status-addr=127.0.0.1:20180 --data-dir=data --log-file=tikv.log
+    ./fakecluster.py ycsb run tikv -P workloads/workloadc -p tikv.pd=127.0.0.1:2379 ...
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# fake service costs, in seconds
+WRITE_COST_PER_OP = 20e-6
+WRITE_COST_PER_BYTE = 1e-9
+READ_COST_PER_OP = 5e-6
+RAFTSTORE_WORKERS = 2
+ROLL_BYTES = 64 * 1024 * 1024
+
+# waterfall checkpoints as cumulative fractions of a write's service time
+WF_PHASES = [
+    ('tikv_raftstore_store_wf_batch_wait_duration_seconds', 0.0),
+    ('tikv_raftstore_store_wf_send_to_queue_duration_seconds', 0.05),
+    ('tikv_raftstore_store_wf_before_write_duration_seconds', 0.1),
+    ('tikv_raftstore_store_wf_write_kvdb_end_duration_seconds', 0.35),
+    ('tikv_raftstore_store_wf_write_end_duration_seconds', 0.4),
+    ('tikv_raftstore_store_wf_persist_duration_seconds', 0.7),
+    ('tikv_raftstore_store_wf_commit_log_duration_seconds', 0.9),
+]
+
+
+def log_line(f, level, source, message, **fields):
+    """Append a line in TiKV's log format."""
+    now = time.time()
+    stamp = time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(now))
+    tz = time.strftime('%z', time.localtime(now))
+    extra = ''.join(f' [{k}={v}]' for k, v in fields.items())
+    f.write(f'[{stamp}.{int(now * 1000) % 1000:03d} {tz[:3]}:{tz[3:]}] [{level}] [{source}] ["{message}"]{extra}\n')
+    f.flush()
+
+
+def split_hostport(addr):
+    addr = addr.split('://')[-1]
+    host, _, port = addr.rpartition(':')
+    return host, int(port)
+
+
+def serve(addr, handler):
+    server = ThreadingHTTPServer(split_hostport(addr), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for_signal():
+    stopped = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopped.set())
+    while not stopped.wait(1.0):
+        pass
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, status=200, ctype='application/json'):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+
+# ---- pd ----
+
+def run_pd(args):
+    stores = {}
+    lock = threading.Lock()
+    logf = open(args.log_file, 'a') if args.log_file else sys.stderr
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+
+    class PDHandler(Handler):
+        def do_GET(self):
+            if self.path == '/pd/api/v1/health':
+                self.reply(json.dumps([{'name': args.name, 'health': True}]))
+            elif self.path == '/pd/api/v1/stores':
+                with lock:
+                    body = {'count': len(stores), 'stores': [{'store': s} for s in stores.values()]}
+                self.reply(json.dumps(body))
+            else:
+                self.reply('not found', 404, 'text/plain')
+
+        def do_POST(self):
+            if self.path != '/fake/register':
+                self.reply('not found', 404, 'text/plain')
+                return
+            store = self.body()
+            with lock:
+                existing = stores.get(store['address'])
+                store['id'] = existing['id'] if existing else len(stores) + 1
+                store['state_name'] = 'Up'
+                stores[store['address']] = store
+            log_line(logf, 'INFO', 'cluster.go:386', 'put store ok', store=store['address'])
+            self.reply(json.dumps(store))
+
+    serve(args.client_urls, PDHandler)
+    log_line(logf, 'INFO', 'server.go:1194', 'PD started', name=args.name)
+    wait_for_signal()
+
+
+# ---- tikv ----
+
+class Histogram:
+    bounds = [0.00005 * 2 ** i for i in range(20)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, v, n=1):
+        for i, b in enumerate(self.bounds):
+            if v <= b:
+                self.counts[i] += n
+                break
+        else:
+            self.counts[-1] += n
+        self.sum += v * n
+
+    def lines(self, name, labels=''):
+        sep = ',' if labels else ''
+        out = []
+        cumulative = 0
+        for b, c in zip(self.bounds + ['+Inf'], self.counts):
+            cumulative += c
+            out.append(f'{name}_bucket{{{labels}{sep}le="{b}"}} {cumulative}')
+        out.append(f'{name}_sum{{{labels}}} {self.sum}' if labels else f'{name}_sum {self.sum}')
+        out.append(f'{name}_count{{{labels}}} {cumulative}' if labels else f'{name}_count {cumulative}')
+        return out
+
+
+class FakeStore:
+    """Counts, histograms and a rolling data file standing in for a TiKV store."""
+
+    def __init__(self, data_dir, logf):
+        self.lock = threading.Lock()
+        self.workers = threading.Semaphore(RAFTSTORE_WORKERS)
+        self.histograms = {}
+        self.counters = {}
+        self.logf = logf
+        os.makedirs(data_dir, exist_ok=True)
+        self.datafd = os.open(os.path.join(data_dir, 'fake.sst'), os.O_WRONLY | os.O_CREAT, 0o644)
+        self.written = 0
+        self.keys = 0
+
+    def observe(self, name, value, labels='', n=1):
+        self.histograms.setdefault((name, labels), Histogram()).observe(value, n)
+
+    def add(self, name, value, labels=''):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def handle(self, op, count, nbytes):
+        queued = time.monotonic()
+        with self.workers:
+            start = time.monotonic()
+            if op in ('insert', 'update'):
+                cost = count * WRITE_COST_PER_OP + nbytes * WRITE_COST_PER_BYTE
+                self.write_data(nbytes)
+            else:
+                cost = count * READ_COST_PER_OP
+            time.sleep(cost)
+        wait = start - queued
+        service = time.monotonic() - start
+
+        with self.lock:
+            grpc = {'insert': 'raw_put', 'update': 'raw_put', 'read': 'raw_get', 'scan': 'raw_scan'}[op]
+            # every operation in the batch waited for the whole request
+            self.observe('tikv_grpc_msg_duration_seconds', wait + service, f'type="{grpc}"', count)
+            self.add('tikv_grpc_msg_total', count, f'type="{grpc}"')
+            if op not in ('insert', 'update'):
+                self.add('tikv_engine_flow_bytes', nbytes, 'db="kv",type="bytes_read"')
+                return wait + service
+            for name, frac in WF_PHASES:
+                self.observe(name, wait + service * frac)
+            self.observe('tikv_raftstore_store_duration_secs', wait + service * 0.9)
+            self.observe('tikv_raftstore_append_log_duration_seconds', service * 0.3)
+            self.observe('tikv_raftstore_commit_log_duration_seconds', service * 0.5)
+            self.observe('tikv_raftstore_apply_wait_time_duration_secs', service * 0.05)
+            self.observe('tikv_raftstore_apply_duration_secs', service * 0.2)
+            self.add('tikv_engine_flow_bytes', nbytes, 'db="kv",type="bytes_written"')
+            self.add('tikv_engine_flow_bytes', nbytes, 'db="kv",type="wal_file_bytes"')
+            self.add('tikv_engine_flow_bytes', nbytes, 'db="raft",type="wal_file_bytes"')
+            self.add('tikv_engine_flow_bytes', nbytes, 'db="kv",type="flush_write_bytes"')
+            self.add('tikv_engine_compaction_flow_bytes', int(nbytes * 1.5), 'db="kv",type="bytes_written"')
+            if op == 'insert':
+                self.keys += count
+                if self.keys // 100000 != (self.keys - count) // 100000:
+                    log_line(self.logf, 'INFO', 'peer.rs:3610', 'on split', keys=self.keys)
+        return wait + service
+
+    def write_data(self, nbytes):
+        # roll the file over so long runs don't fill the disk
+        if self.written + nbytes > ROLL_BYTES:
+            os.lseek(self.datafd, 0, os.SEEK_SET)
+            self.written = 0
+        os.write(self.datafd, b'\0' * nbytes)
+        os.fdatasync(self.datafd)
+        self.written += nbytes
+
+    def metrics(self):
+        with self.lock:
+            out = []
+            for (name, labels), hist in sorted(self.histograms.items()):
+                out.append(f'# TYPE {name} histogram')
+                out.extend(hist.lines(name, labels))
+            for (name, labels), value in sorted(self.counters.items()):
+                out.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+            t = os.times()
+            out.append(f'process_cpu_seconds_total {t.user + t.system}')
+        return '\n'.join(out) + '\n'
+
+
+def run_tikv(args):
+    logf = open(args.log_file, 'a') if args.log_file else sys.stderr
+    store = FakeStore(args.data_dir, logf)
+
+    class TiKVHandler(Handler):
+        def do_GET(self):
+            if self.path == '/status':
+                self.reply('', 200, 'text/plain')
+            elif self.path == '/metrics':
+                self.reply(store.metrics(), 200, 'text/plain; version=0.0.4')
+            else:
+                self.reply('not found', 404, 'text/plain')
+
+        def do_POST(self):
+            if self.path != '/fake/kv':
+                self.reply('not found', 404, 'text/plain')
+                return
+            req = self.body()
+            took = store.handle(req['op'], req['count'], req['bytes'])
+            self.reply(json.dumps({'took': took}))
+
+    serve(args.status_addr, TiKVHandler)
+
+    # register with pd, retrying until it is up
+    registration = json.dumps({'address': args.addr, 'status_address': args.status_addr}).encode()
+    pdurl = 'http://' + args.pd_endpoints.split(',')[0].split('://')[-1]
+    while True:
+        try:
+            req = urllib.request.Request(f'{pdurl}/fake/register', registration,
+                                         {'Content-Type': 'application/json'})
+            urllib.request.urlopen(req, timeout=2).read()
+            break
+        except OSError:
+            time.sleep(0.2)
+    log_line(logf, 'INFO', 'server.rs:282', 'TiKV started', addr=args.addr)
+    wait_for_signal()
+    log_line(logf, 'INFO', 'server.rs:353', 'TiKV is for exit')
+
+
+# ---- ycsb ----
+
+# workload letter -> [(op, proportion)], as in go-ycsb's core workloads
+WORKLOADS = {
+    'a': [('READ', 0.5), ('UPDATE', 0.5)],
+    'b': [('READ', 0.95), ('UPDATE', 0.05)],
+    'c': [('READ', 1.0)],
+    'd': [('READ', 0.95), ('INSERT', 0.05)],
+    'e': [('SCAN', 0.95), ('INSERT', 0.05)],
+    'f': [('READ', 0.5), ('READ_MODIFY_WRITE', 0.5)],
+}
+
+
+class OpStats:
+    def __init__(self):
+        self.latencies = []
+        self.count = 0
+
+    def add(self, latency_us, count):
+        self.latencies.append(latency_us)
+        self.count += count
+
+    def line(self, op, takes):
+        lat = sorted(self.latencies) or [0.0]
+
+        def pct(p):
+            return int(lat[min(int(p * len(lat)), len(lat) - 1)])
+        avg = sum(lat) / len(lat)
+        return (f'{op:<6} - Takes(s): {takes:.1f}, Count: {self.count}, OPS: {self.count / max(takes, 1e-9):.1f}, '
+                f'Avg(us): {int(avg)}, Min(us): {int(lat[0])}, Max(us): {int(lat[-1])}, '
+                f'50th(us): {pct(0.5)}, 90th(us): {pct(0.9)}, 95th(us): {pct(0.95)}, '
+                f'99th(us): {pct(0.99)}, 99.9th(us): {pct(0.999)}, 99.99th(us): {pct(0.9999)}')
+
+
+def run_ycsb(args):
+    props = dict(p.split('=', 1) for p in args.p)
+    threads = int(props.get('threadcount', 1))
+    batch = int(props.get('fake.batch', 100))
+    valuesize = int(props.get('fieldcount', 10)) * int(props.get('fieldlength', 100))
+    interval = float(props.get('status.interval', 10))
+    target = float(props.get('target', 0))
+    if args.command == 'load':
+        total = int(props.get('insertcount', props.get('recordcount', 1000)))
+        mix = [('INSERT', 1.0)]
+    else:
+        total = int(props.get('operationcount', 1000))
+        mix = WORKLOADS.get(args.P[-1:], WORKLOADS['a'])
+
+    with urllib.request.urlopen(f'http://{props.get("tikv.pd", "127.0.0.1:2379")}/pd/api/v1/stores') as resp:
+        stores = [s['store']['status_address'] for s in json.load(resp)['stores']]
+    print('***************** properties *****************')
+    for k, v in sorted(props.items()):
+        print(f'"{k}"="{v}"')
+    print('**********************************************', flush=True)
+
+    lock = threading.Lock()
+    stats = {}
+    remaining = [total]
+    start = time.monotonic()
+    # like go-ycsb, an interrupted run stops early and still prints its summary
+    interrupted = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: interrupted.set())
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conns = {}
+        while not interrupted.is_set():
+            with lock:
+                n = min(batch, remaining[0])
+                remaining[0] -= n
+            if n <= 0:
+                return
+            if target > 0:
+                # pace this thread to its share of the target rate
+                done = total - remaining[0]
+                ahead = done / target - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            r = rng.random()
+            for op, share in mix:
+                r -= share
+                if r <= 0:
+                    break
+            kind = {'INSERT': 'insert', 'UPDATE': 'update', 'READ': 'read', 'SCAN': 'scan',
+                    'READ_MODIFY_WRITE': 'update'}[op]
+            addr = rng.choice(stores)
+            conn = conns.get(addr) or conns.setdefault(addr, http.client.HTTPConnection(*split_hostport(addr)))
+            body = json.dumps({'op': kind, 'count': n, 'bytes': n * valuesize if kind in ('insert', 'update') else 0})
+            t0 = time.monotonic()
+            conn.request('POST', '/fake/kv', body, {'Content-Type': 'application/json'})
+            conn.getresponse().read()
+            latency = (time.monotonic() - t0) * 1e6
+            with lock:
+                for name in (op, 'TOTAL'):
+                    stats.setdefault(name, OpStats()).add(latency, n)
+
+    def report(final=False):
+        takes = time.monotonic() - start
+        with lock:
+            for op in sorted(stats, key=lambda o: (o == 'TOTAL', o)):
+                print(stats[op].line(op, takes))
+        sys.stdout.flush()
+
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+    for w in workers:
+        w.start()
+    next_report = start + interval
+    while any(w.is_alive() for w in workers):
+        for w in workers:
+            w.join(timeout=max(next_report - time.monotonic(), 0.01))
+            if time.monotonic() >= next_report:
+                report()
+                next_report += interval
+    print(f'Run finished, takes {time.monotonic() - start:.3f}s')
+    report(final=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='service', required=True)
+
+    pd = sub.add_parser('pd')
+    pd.add_argument('--name', default='pd')
+    pd.add_argument('--data-dir', default=None)
+    pd.add_argument('--client-urls', required=True)
+    pd.add_argument('--peer-urls', default=None)
+    pd.add_argument('--log-file', default=None)
+
+    tikv = sub.add_parser('tikv')
+    tikv.add_argument('--pd-endpoints', required=True)
+    tikv.add_argument('--addr', required=True)
+    tikv.add_argument('--status-addr', required=True)
+    tikv.add_argument('--data-dir', required=True)
+    tikv.add_argument('--log-file', default=None)
+    tikv.add_argument('--config', default=None)
+
+    ycsb = sub.add_parser('ycsb')
+    ycsb.add_argument('command', choices=['load', 'run'])
+    ycsb.add_argument('db')
+    ycsb.add_argument('-P', default='workloada')
+    ycsb.add_argument('-p', action='append', default=[])
+
+    args = parser.parse_args()
+    {'pd': run_pd, 'tikv': run_tikv, 'ycsb': run_ycsb}[args.service](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Warm connections and batched command execution for the experiment nodes.
+
+Every conn.run() is a separate SSH channel round trip, and the control
+commands tikv-ycsb.py issues between runs (pkill, pgrep, rm, drop_caches,
+nohup ... & echo $!) are tiny, so their latency is almost all round trips.
+HostPool keeps one SSH transport per host open (with keepalives, so idle
+sessions survive long runs) and gives each host a queue: commands
+submitted while the host is busy, or within `linger` seconds of each
+other, are joined into one shell script and run in a single round trip.
+Each submit() returns a Future resolving to that command's result.
+
+    pool = HostPool()
+    pool.warm(conns)
+    futures = [pool.submit(c, 'sudo pkill -9 tikv') for c in conns]
+    results = [f.result() for f in futures]
+
+Commands in a batch run in submission order, each in its own subshell, so
+a failing command does not stop the rest. stderr is merged into stdout.
+"""
+
+import secrets
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+
+@dataclass
+class CommandResult:
+    """The parts of invoke's Result that callers use."""
+    command: str
+    stdout: str
+    exited: int
+
+    @property
+    def ok(self):
+        return self.exited == 0
+
+
+def batch_script(commands, token):
+    """One script running every command, its output framed by markers with the exit code."""
+    lines = []
+    for i, cmd in enumerate(commands):
+        lines.append(f"printf '\\n{token} begin {i}\\n'")
+        lines.append(f'(\n{cmd}\n) < /dev/null 2>&1')
+        lines.append(f"printf '\\n{token} end {i} %d\\n' $?")
+    return '\n'.join(lines)
+
+
+def split_output(stdout, commands, token):
+    """CommandResult per command from the output of batch_script."""
+    results = [CommandResult(cmd, '', -1) for cmd in commands]
+    current = None
+    out = []
+    for line in stdout.split('\n'):
+        if line.startswith(f'{token} begin '):
+            current = int(line.split()[2])
+            out = []
+        elif line.startswith(f'{token} end ') and current is not None:
+            _, _, i, status = line.split()
+            # drop the newline printed before the end marker
+            results[int(i)].stdout = '\n'.join(out[:-1] if out and out[-1] == '' else out)
+            results[int(i)].exited = int(status)
+            current = None
+        elif current is not None:
+            out.append(line)
+    return results
+
+
+class HostQueue:
+    """Pending commands of one host, run in batches by a worker thread."""
+
+    def __init__(self, conn, linger, max_batch):
+        self.conn = conn
+        self.linger = linger
+        self.max_batch = max_batch
+        self.pending = []
+        self.cond = threading.Condition()
+        self.closed = False
+        self.batches = 0
+        self.commands = 0
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def submit(self, cmd):
+        future = Future()
+        with self.cond:
+            if self.closed:
+                raise RuntimeError(f'{self.conn.host}: host pool is closed')
+            self.pending.append((cmd, future))
+            self.cond.notify()
+        return future
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+
+    def take(self):
+        with self.cond:
+            while not self.pending and not self.closed:
+                self.cond.wait()
+            if not self.pending:
+                return None
+            # give callers submitting a burst of commands a moment to join this batch
+            self.cond.wait_for(lambda: self.closed or len(self.pending) >= self.max_batch, self.linger)
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            return batch
+
+    def work(self):
+        while (batch := self.take()) is not None:
+            commands = [cmd for cmd, _ in batch]
+            token = f'@@hostpool-{secrets.token_hex(8)}'
+            try:
+                res = self.conn.run(batch_script(commands, token), hide=True, warn=True)
+                results = split_output(res.stdout, commands, token)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.commands += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class HostPool:
+
+    def __init__(self, linger=0.005, max_batch=64, keepalive=30):
+        self.linger = linger
+        self.max_batch = max_batch
+        self.keepalive = keepalive
+        self.queues = {}
+        self.lock = threading.Lock()
+
+    def queue(self, conn):
+        with self.lock:
+            if conn.host not in self.queues:
+                self.queues[conn.host] = HostQueue(conn, self.linger, self.max_batch)
+            return self.queues[conn.host]
+
+    def warm(self, conns):
+        """Open the SSH transport of every connection at once and keep it alive."""
+        def open_one(conn):
+            conn.open()
+            transport = getattr(conn, 'transport', None)
+            if transport is not None and self.keepalive:
+                transport.set_keepalive(self.keepalive)
+            self.queue(conn)
+        threads = [threading.Thread(target=open_one, args=(c,)) for c in conns]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def submit(self, conn, cmd):
+        """Queue cmd on conn's host. Returns a Future of its CommandResult."""
+        return self.queue(conn).submit(cmd)
+
+    def run(self, conn, cmd):
+        return self.submit(conn, cmd).result()
+
+    def run_all(self, conns, cmd):
+        """Run cmd on every connection concurrently; results in order."""
+        futures = [self.submit(c, cmd) for c in conns]
+        return [f.result() for f in futures]
+
+    def close(self):
+        with self.lock:
+            queues, self.queues = list(self.queues.values()), {}
+        for q in queues:
+            q.close()
+
+    def summary(self):
+        commands = sum(q.commands for q in self.queues.values())
+        batches = sum(q.batches for q in self.queues.values())
+        return f'{commands} control commands in {batches} round trips'
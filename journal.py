@@ -0,0 +1,77 @@
+"""
+Crash-resumable record of an experiment's steps.
+
+tikv-ycsb.py appends one JSON object per finished step to journal.jsonl
+in the output directory, and flushes it to disk before moving on:
+
+    {"time": 1700000000.1, "step": "service", "name": "tikv-0", "pid": "1234", "host": "10.10.1.2"}
+    {"time": 1700000100.4, "step": "load"}
+    {"time": 1700000200.2, "step": "run:a:64"}
+    {"time": 1700000300.9, "step": "point:16"}
+    {"time": 1700000301.5, "step": "cleanup"}
+    {"time": 1700000301.6, "step": "experiment"}
+
+With --resume the journal is read back: steps already in it are skipped,
+and services started since the last cleanup are the leftovers of the
+crashed run, to be reused or killed (see tikv-ycsb.py reconcile()).
+A truncated last line (the crash hit mid-write) is ignored.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+
+    def __init__(self):
+        self.path = None
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def open(self, path, resume=False):
+        """Start a journal at path, or with resume continue the one already there."""
+        self.path = path
+        self.entries = []
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        pass
+        else:
+            open(path, 'w').close()
+
+    def record(self, step, **info):
+        if not self.path:
+            return
+        entry = dict(time=round(time.time(), 3), step=step, **info)
+        with self.lock:
+            self.entries.append(entry)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def done(self, step):
+        with self.lock:
+            return any(e['step'] == step for e in self.entries)
+
+    def since(self, step):
+        """Entries after the last one of step (all of them if there is none)."""
+        with self.lock:
+            last = max((i for i, e in enumerate(self.entries) if e['step'] == step), default=-1)
+            return self.entries[last + 1:]
+
+    def leftovers(self):
+        """{service name: (pid, host)} of services started since the last cleanup, latest start wins."""
+        return {e['name']: (e['pid'], e['host']) for e in self.since('cleanup') if e['step'] == 'service'}
+
+    def record_when_done(self, future, step, **info):
+        """Record step once future completes without an error (e.g. a background fetch)."""
+        def done(f):
+            if f.exception() is None:
+                self.record(step, **info)
+        future.add_done_callback(done)
@@ -0,0 +1,80 @@
+"""
+Local execution backend for tikv-ycsb.py --local.
+
+LocalConnection implements the part of fabric.Connection the experiment
+script uses (run, get, put, open, host) with local subprocesses, so every
+helper runs unchanged whether a "node" is a Cloudlab host or a directory
+on this machine. Each local node has its own home and data directory
+under the local root, and commands run from the node's home directory,
+like an ssh session would.
+
+Local nodes run unprivileged: sudo is dropped from commands, and
+processes are started in their own session so they can be killed by
+process group instead of pkill'ing by name.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+from contextlib import contextmanager
+
+from invoke import Context
+
+sudo_re = re.compile(r'(^|[;&|(]\s*|\s)sudo\s+')
+
+
+def strip_sudo(cmd):
+    return sudo_re.sub(r'\1', cmd)
+
+
+class LocalConnection(Context):
+    local = True
+
+    def __init__(self, root, role, index):
+        super().__init__()
+        self.name = f'{role}-{index}'
+        # the experiment script groups work by conn.host, so each node needs its own
+        self.host = f'local/{self.name}'
+        self.home = os.path.join(os.path.abspath(root), self.name, 'home')
+        self.data = os.path.join(os.path.abspath(root), self.name, 'data')
+        os.makedirs(self.home, exist_ok=True)
+        os.makedirs(self.data, exist_ok=True)
+
+    def __repr__(self):
+        return f'<LocalConnection {self.name}>'
+
+    def in_home(self, command):
+        # braces keep a trailing '&' in command from backgrounding the cd too
+        return f'cd {self.home} && {{\n{strip_sudo(command)}\n}}'
+
+    def run(self, command, **kwargs):
+        return super().run(self.in_home(command), **kwargs)
+
+    def get(self, remote, local=None):
+        remote = remote if os.path.isabs(remote) else os.path.join(self.home, remote)
+        shutil.copyfile(remote, local)
+
+    def put(self, local, remote=None):
+        remote = remote or os.path.basename(local)
+        remote = remote if os.path.isabs(remote) else os.path.join(self.home, remote)
+        shutil.copyfile(local, remote)
+
+    def open(self):
+        pass
+
+    @contextmanager
+    def stream(self, command):
+        """Yield the stdout of command as a binary file object (see transfer.stream_command)."""
+        p = subprocess.Popen(['bash', '-c', self.in_home(command)],
+                             stdout=subprocess.PIPE)
+        try:
+            yield p.stdout
+        finally:
+            p.stdout.close()
+            if p.wait() != 0:
+                print(f'WARN {self.name}: "{command}" exited with {p.returncode}')
+
+
+def is_local(conn):
+    return getattr(conn, 'local', False)
@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+"""
+Run an experiment matrix on as many clusters as the inventory holds.
+
+A plan file lists the TiKV builds, value sizes, DB sizes and experiments
+to cross; every combination is a cell, i.e. one tikv-ycsb.py invocation
+writing results/<system>-<experiment>-<size>-<vsize> as usual:
+
+    branches:                 # system name -> tikv-server build on the TiKV nodes
+      tikv: /software/tikv-master/target/release/tikv-server
+      xllso: /software/tikv-xll-so/target/release/tikv-server
+      xll: /software/tikv-xll/target/release/tikv-server
+    vsizes: [1024, 16384]
+    db_sizes: [100GB]
+    experiments:
+      - name: ycsb
+        experimenttype: ycsb
+        workloads: a,b,c,d,e,f
+        threads: 64
+      - name: read-scalability
+        experimenttype: ycsb
+        workloads: c
+        threadsmin: 4         # threads, threadsmin, threadstep as in tikv-ycsb.py
+        threads: 64
+        threadstep: 4
+    args: [--dataset_cache]   # passed to every cell
+
+The inventory (inventory.yml) is split into disjoint groups of one PD,
+--tikv_per_group TiKV and --clients_per_group client hosts, in inventory
+order; a host's `ip` variable is used for it if set. Each group runs
+one cell at a time, and cells go to whichever group is free.
+
+Cells that share a dataset (build, DB size and value size) run back to
+back on the same group, so with --dataset_cache only the first of them
+loads; the largest of these batches are dispatched first. Builds are
+best kept as one git worktree per branch, since dataset cache keys come
+from the checkout a binary was built in.
+
+    ./matrix.py plan.yml --inventory inventory.yml
+    ./matrix.py plan.yml --local -- --fake      # one local group, e.g. with the stand-ins
+
+Every cell's output goes to results/matrix/<cell>.log, and its group,
+start, end and exit status to results/matrix/status.csv.
+"""
+
+import argparse
+import csv
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+import yaml
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tikv-ycsb.py')
+size_re = re.compile(r'^(\d+)\s*([KMG]?)B?$', re.IGNORECASE)
+units = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+@dataclass
+class Group:
+    index: int
+    pd: str
+    tikv: list[str]
+    clients: list[str]
+
+    def args(self):
+        return ['--pd_node', self.pd, '--tikv_nodes', ','.join(self.tikv), '--client_nodes', ','.join(self.clients)]
+
+
+@dataclass
+class Cell:
+    system: str
+    exe: str
+    experiment: dict
+    dbsize: int
+    vsize: int
+    args: list[str] = field(default_factory=list)
+
+    @property
+    def name(self):
+        return f'{self.system}-{self.experiment["name"]}'
+
+    @property
+    def label(self):
+        return f'{self.name}-{self.dbsize // 1024 ** 3}GB-{self.vsize // 1024}KB'
+
+    @property
+    def dataset(self):
+        return (self.system, self.dbsize, self.vsize)
+
+    def points(self):
+        """Thread counts the cell runs, as a rough measure of its length."""
+        hi = int(self.experiment.get('threads', 64))
+        lo = int(self.experiment.get('threadsmin', hi))
+        return len(range(lo, hi + 1, int(self.experiment.get('threadstep', 8))))
+
+    def command(self, group):
+        cmd = [sys.executable, '-u', script, '--name', self.name,
+               '--experimenttype', self.experiment.get('experimenttype', 'ycsb'),
+               '-s', str(self.dbsize), '-v', str(self.vsize), '-r', str(self.experiment.get('threads', 64))]
+        for key in ('threadsmin', 'threadstep'):
+            if key in self.experiment:
+                cmd += [f'--{key}', str(self.experiment[key])]
+        if self.experiment.get('workloads'):
+            cmd += ['--workloads', str(self.experiment['workloads'])]
+        if self.exe:
+            cmd += ['--tikv_exe', self.exe]
+        return cmd + (group.args() if group else []) + [str(a) for a in self.experiment.get('args', [])] + self.args
+
+
+def parse_size(value):
+    """100GB, 16KB, 1024 -> bytes"""
+    m = size_re.match(str(value).strip())
+    if not m:
+        raise ValueError(f'bad size {value!r}')
+    return int(m.group(1)) * units[m.group(2).upper()]
+
+
+def inventory_hosts(inventory):
+    """(host, address) of every host in an ansible YAML inventory, in file order, without duplicates."""
+    found = {}
+
+    def walk(group):
+        if not isinstance(group, dict):
+            return
+        for host, hostvars in (group.get('hosts') or {}).items():
+            found.setdefault(host, (hostvars or {}).get('ip') or (hostvars or {}).get('ansible_host') or host)
+        for child in (group.get('children') or {}).values():
+            walk(child)
+
+    for group in inventory.values():
+        walk(group)
+    return list(found.items())
+
+
+def partition(hosts, tikv_per_group, clients_per_group):
+    """Split addresses into as many disjoint (PD, TiKV, clients) groups as they hold."""
+    size = 1 + tikv_per_group + clients_per_group
+    groups = []
+    for i in range(len(hosts) // size):
+        part = hosts[i * size:(i + 1) * size]
+        groups.append(Group(i, part[0], part[1:1 + tikv_per_group], part[1 + tikv_per_group:]))
+    return groups
+
+
+def plan_cells(plan):
+    extra = [str(a) for a in plan.get('args', [])]
+    return [Cell(system, exe or '', experiment, parse_size(dbsize), parse_size(vsize), extra)
+            for system, exe in plan['branches'].items()
+            for vsize in plan['vsizes']
+            for dbsize in plan['db_sizes']
+            for experiment in plan['experiments']]
+
+
+def batches(cells):
+    """
+    Cells grouped by dataset, each batch in plan order (so the first cell
+    loads and saves the dataset), longest batches first: big batches
+    started early keep the groups busy until the end.
+    """
+    bydataset = {}
+    for cell in cells:
+        bydataset.setdefault(cell.dataset, []).append(cell)
+    return sorted(bydataset.values(), key=lambda b: -sum(c.dbsize * c.points() for c in b))
+
+
+class StatusLog:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerow(['cell', 'group', 'start', 'end', 'returncode'])
+
+    def record(self, cell, group, start, end, returncode):
+        with self.lock, open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerow([cell.label, group, f'{start:.3f}', f'{end:.3f}', returncode])
+
+
+def run_matrix(cells, groups, logdir, status):
+    """Dispatch batches of cells to free groups. Returns the cells that failed."""
+    work = queue.Queue()
+    for batch in batches(cells):
+        work.put(batch)
+    failed = []
+    lock = threading.Lock()
+
+    def worker(group):
+        index = group.index if group else 0
+        while True:
+            try:
+                batch = work.get_nowait()
+            except queue.Empty:
+                return
+            for cell in batch:
+                cmd = cell.command(group)
+                print(f'group {index}: {cell.label}')
+                start = time.time()
+                with open(os.path.join(logdir, f'{cell.label}.log'), 'w') as log:
+                    log.write(' '.join(cmd) + '\n')
+                    log.flush()
+                    returncode = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+                status.record(cell, index, start, time.time(), returncode)
+                print(f'group {index}: {cell.label} finished ({returncode}) after {time.time() - start:.0f}s')
+                if returncode != 0:
+                    with lock:
+                        failed.append(cell)
+
+    threads = [threading.Thread(target=worker, args=(g,)) for g in groups]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage='%(prog)s plan [options] [-- tikv-ycsb.py args]')
+    parser.add_argument('plan', help='YAML plan file')
+    parser.add_argument('--inventory', default=os.path.join(os.path.dirname(script), 'inventory.yml'))
+    parser.add_argument('--tikv_per_group', type=int, default=3)
+    parser.add_argument('--clients_per_group', type=int, default=1)
+    parser.add_argument('--local', action='store_true', help='run every cell on one local cluster (tikv-ycsb.py --local)')
+    parser.add_argument('--dry_run', action='store_true', help='print the groups and the order of the cells')
+    argv = sys.argv[1:]
+    passthrough = argv[argv.index('--') + 1:] if '--' in argv else []
+    args = parser.parse_args(argv[:argv.index('--')] if '--' in argv else argv)
+
+    with open(args.plan) as f:
+        plan = yaml.safe_load(f)
+    cells = plan_cells(plan)
+    for cell in cells:
+        cell.args += passthrough + (['--local'] if args.local else [])
+
+    if args.local:
+        groups = [None]
+    else:
+        with open(args.inventory) as f:
+            hosts = [address for _, address in inventory_hosts(yaml.safe_load(f))]
+        groups = partition(hosts, args.tikv_per_group, args.clients_per_group)
+        if not groups:
+            sys.exit(f'{len(hosts)} hosts in {args.inventory}, a group needs '
+                     f'{1 + args.tikv_per_group + args.clients_per_group}')
+    print(f'{len(cells)} cells on {len(groups)} groups')
+    for g in groups:
+        if g:
+            print(f'group {g.index}: pd {g.pd}, tikv {",".join(g.tikv)}, clients {",".join(g.clients)}')
+
+    if args.dry_run:
+        for i, batch in enumerate(batches(cells)):
+            for cell in batch:
+                print(f'batch {i}: ' + ' '.join(cell.command(groups[0])))
+        sys.exit(0)
+
+    logdir = os.path.join(os.getcwd(), 'results', 'matrix')
+    os.makedirs(logdir, exist_ok=True)
+    failed = run_matrix(cells, groups, logdir, StatusLog(os.path.join(logdir, 'status.csv')))
+    for cell in failed:
+        print(f'FAILED {cell.label}, see {logdir}/{cell.label}.log')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,80 @@
+"""
+Open-loop rate sweeps.
+
+A closed-loop run (threads issuing back to back) only shows whatever
+throughput its thread count happens to reach, and a slow request holds
+back the requests behind it instead of queueing them (coordinated
+omission). Here go-ycsb is instead paced to a fixed total target rate
+(its `target` property, split across the clients like the threads), one
+run per rate, from the lowest rate up. A rate is met if the clients
+together achieved at least `min_ratio` of it; the first rate that is not
+met is the saturation point, and the sweep stops there.
+
+go-ycsb times each operation from when it is sent, not from when the
+schedule meant to send it. While the clients keep to the schedule (met
+rates, with enough threads) the two agree and latencies include the
+queueing at the server; at an unmet rate the clients fell behind and
+latencies are understated, which is why such points are flagged.
+"""
+
+import csv
+import os
+
+from ycsblog import parse_summary
+
+fields = ['workload', 'threads', 'target', 'ops', 'met', 'slow_clients', 'p50_us', 'p99_us', 'p999_us']
+
+
+def rate_point(paths, targets, min_ratio, op='TOTAL'):
+    """
+    Result of one rate from its per-client logs and per-client targets:
+    ops summed, latencies weighted by operation count, and the clients
+    that fell short of min_ratio of their own share.
+    """
+    point = {'target': sum(targets), 'ops': 0.0, 'slow_clients': []}
+    weighted = {c: 0.0 for c in ['p50_us', 'p99_us', 'p999_us']}
+    count = 0.0
+    for client, (path, target) in enumerate(zip(paths, targets)):
+        values = parse_summary(path).get(op, {})
+        point['ops'] += values.get('ops', 0.0)
+        if values.get('ops', 0.0) < min_ratio * target:
+            point['slow_clients'].append(client)
+        n = values.get('count', 0.0)
+        count += n
+        for c in weighted:
+            weighted[c] += values.get(c, 0.0) * n
+    point.update({c: v / count if count else float('nan') for c, v in weighted.items()})
+    point['met'] = point['ops'] >= min_ratio * point['target']
+    return point
+
+
+def rate_sweep(measure, rates, min_ratio):
+    """
+    Call measure(rate) for every rate in increasing order until one is not
+    met. measure returns (log paths, per-client targets). Returns the points.
+    """
+    points = []
+    for rate in sorted(rates):
+        paths, targets = measure(rate)
+        point = rate_point(paths, targets, min_ratio)
+        points.append(point)
+        print(f"open loop: {rate} ops/s offered -> {point['ops']:.1f} achieved, "
+              f"p50 {point['p50_us']:.0f} us, p99 {point['p99_us']:.0f} us")
+        if not point['met']:
+            slow = ','.join(str(c) for c in point['slow_clients']) or 'none'
+            print(f'open loop: {rate} ops/s not met (below {min_ratio:.0%}, slow clients: {slow}), saturated')
+            break
+    return points
+
+
+def write_rates(path, workload, threads, points):
+    """Append a workload's points to openloop.csv."""
+    new = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(fields)
+        for p in points:
+            writer.writerow([workload, threads, p['target'], f"{p['ops']:.1f}", int(p['met']),
+                             ';'.join(str(c) for c in p['slow_clients']),
+                             f"{p['p50_us']:.0f}", f"{p['p99_us']:.0f}", f"{p['p999_us']:.0f}"])
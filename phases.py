@@ -0,0 +1,59 @@
+"""
+Experiment phase timeline.
+
+tikv-ycsb.py records when each phase of an experiment started and ended
+(wall clock, seconds since the epoch) in phases.csv in the output
+directory, one row per phase:
+
+    phase,workload,threads,start,end
+    load,,64,1700000000.123,1700000100.456
+    prepare,a,64,...
+    run,a,64,...
+    fetch,a,64,...
+
+`run` and `load` rows are the measurement windows: the go-ycsb processes
+were running and nothing else the harness does overlaps them. `prepare`
+(cache drop, readiness checks) and `fetch` (copying client output) are
+harness overhead and may overlap each other. Metrics and logs can be
+cut to a window with read_phases().
+"""
+
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+fields = ['phase', 'workload', 'threads', 'start', 'end']
+
+
+class PhaseLog:
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, phase, workload, threads, start, end):
+        if not self.path:
+            return
+        with self.lock:
+            new = not os.path.exists(self.path)
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(fields)
+                writer.writerow([phase, workload, threads, f'{start:.3f}', f'{end:.3f}'])
+
+    @contextmanager
+    def phase(self, phase, workload='', threads=''):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(phase, workload, threads, start, time.time())
+
+
+def read_phases(path):
+    """Rows of phases.csv with start and end as floats."""
+    with open(path, newline='') as f:
+        return [dict(row, start=float(row['start']), end=float(row['end'])) for row in csv.DictReader(f)]
@@ -5,6 +5,7 @@ datadir="../dot-dat"
 graphsdir="../graphs"
 valuesizes=(1024 16384)
 dbs=("tikv" "xllso" "xll")
+ycsbtable="$datadir/ycsb.csv"
 
 # args
 # $1: system name
@@ -17,7 +18,7 @@ experiment_directory () {
 # args
 # $1: system name
 # $2: experiment name
-# $3: run number
+# $3: run number, 1..N as tikv-ycsb.py --runs N numbers them
 # $4: db size
 # $5: value size
 experiment_directory_multirun () {
@@ -28,3 +29,9 @@ value_string () {
     echo "$(($1/1024))KB"
 }
 
+
+# parse every ycsb log under $resultsdir once into $ycsbtable
+build_ycsb_table () {
+    mkdir -p $datadir
+    python3 ycsbresults.py table --results $resultsdir --out $ycsbtable
+}
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+"""
+Latency against offered load (tikv-ycsb.py --experimenttype openloop).
+
+Every open-loop run is a go-ycsb run paced to a target rate, logged as
+run_<w>_threads_<t>_target_<rate>_client_<c>.ycsb. The table has one row
+per experiment, workload and offered rate, with the achieved throughput
+(summed over clients), p50/p99/p999 and whether the rate was met
+(achieved at least --min_rate_ratio of it; past that the clients fell
+behind and latencies are understated, see openloop.py).
+
+    ./latencycurve.py table --results ../results --out ../dot-dat/latencycurve.csv
+    ./latencycurve.py plot --table ../dot-dat/latencycurve.csv --workload c --out ../graphs/latencycurve-c.pdf
+
+The plot has p99 (or --latency) against achieved throughput, one line per
+experiment; unmet rates are drawn as open points past the end of a line.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+from writeamp import run_gnuplot, system_of
+from ycsbresults import build_table
+
+columns = ['experiment', 'system', 'experimenttype', 'workload', 'threads', 'target', 'ops', 'met',
+           'p50_us', 'p99_us', 'p999_us']
+
+
+def build_curve(results, min_ratio=0.95, jobs=None, use_index=True):
+    curve = []
+    for r in build_table(results, jobs, use_index):
+        if not r['target'] or r['client'] != 'all' or r['phase'] != 'run' or r['op'] != 'TOTAL':
+            continue
+        target = int(r['target'])
+        ops = r.get('ops', 0.0)
+        curve.append(dict(experiment=r['experiment'], system=system_of(r['experiment']),
+                          experimenttype=r['experimenttype'], workload=r['workload'], threads=r['threads'],
+                          target=target, ops=ops, met=int(ops >= min_ratio * target),
+                          p50_us=r.get('p50_us', float('nan')), p99_us=r.get('p99_us', float('nan')),
+                          p999_us=r.get('p999_us', float('nan'))))
+    curve.sort(key=lambda c: (c['experiment'], c['experimenttype'], c['workload'], c['threads'], c['target']))
+    return curve
+
+
+def fmt(value):
+    if isinstance(value, (str, int)):
+        return str(value)
+    if value != value:
+        return ''
+    return f'{value:.1f}'
+
+
+def write_curve(curve, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in curve:
+            writer.writerow([fmt(row[c]) for c in columns])
+
+
+def read_curve(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def plot(curve, workload, out, latency):
+    """latency (ms) against achieved ops/sec for one workload, one line per experiment."""
+    experiments = sorted({r['experiment'] for r in curve if r['workload'] == workload})
+    datafile = os.path.splitext(out)[0] + '.dat'
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(datafile, 'w') as f:
+        for experiment in experiments:
+            f.write(f'"{experiment}"\n')
+            for r in curve:
+                if r['experiment'] == experiment and r['workload'] == workload:
+                    f.write(f"{r['target']}\t{r['ops'] or 0}\t{float(r[latency] or 0) / 1000:g}\t{r['met']}\n")
+            f.write('\n\n')
+    if not experiments:
+        print(f'WARN no open-loop results for workload {workload}')
+        return
+
+    # met rates as a line, unmet ones (column 4 = 0) as open points
+    plots = ', \\\n    '.join(f"'{datafile}' index {i} using 2:($4 ? $3 : 1/0) with linespoints ls {i + 1} pt 7 "
+                               f"title columnheader(1), "
+                               f"'' index {i} using 2:($4 ? 1/0 : $3) with points ls {i + 1} pt 6 notitle"
+                               for i in range(len(experiments)))
+    script = f'''set terminal pdf size 3.7in,2.4in
+    set output "{out}"
+    set xlabel "Throughput (ops/sec)"
+    set ylabel "{latency.replace('_us', '')} latency (ms)"
+    set xrange [0:*]
+    set yrange [0:*]
+    set key top left
+
+    plot {plots}
+    '''
+    run_gnuplot(script)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    t = sub.add_parser('table', help='offered rate, achieved throughput and latency of every open-loop run')
+    t.add_argument('--results', default='../results')
+    t.add_argument('--out', default='../dot-dat/latencycurve.csv')
+    t.add_argument('--min_rate_ratio', type=float, default=0.95,
+                   help='a rate counts as met if this fraction of it was achieved (0.95)')
+    t.add_argument('-j', '--jobs', type=int, default=None, help='log parser processes (all CPUs default)')
+    t.add_argument('--no-index', dest='use_index', action='store_false',
+                   help='parse every log even if it is unchanged since the last run')
+
+    p = sub.add_parser('plot', help='latency against throughput for one workload')
+    p.add_argument('--table', default='../dot-dat/latencycurve.csv')
+    p.add_argument('--workload', required=True)
+    p.add_argument('--latency', default='p99_us', choices=['p50_us', 'p99_us', 'p999_us'])
+    p.add_argument('--out', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'table':
+        curve = build_curve(args.results, args.min_rate_ratio, args.jobs, args.use_index)
+        write_curve(curve, args.out)
+        print(f'wrote {len(curve)} rows to {args.out}', file=sys.stderr)
+    else:
+        plot(read_curve(args.table), args.workload, args.out, args.latency)
@@ -0,0 +1,349 @@
+#!/usr/bin/python
+"""
+Events in the TiKV logs collected by tikv-ycsb.py, lined up with the runs.
+
+collect_output() copies every node's log to
+    results/<experiment>/<experimenttype>/<node>/tikv-<threads>.log
+Each log is read line by line (constant memory however big it is), and
+the logs are parsed in a process pool, one file per worker; unchanged
+ones come from results-index.sqlite. Lines are in TiKV's format:
+
+    [2024/01/01 12:00:00.123 +00:00] [WARN] [store.rs:1234] ["message"] [key=value] ...
+
+and only those that mention one of a few keywords are parsed further.
+Events taken from them:
+- write_stall: a column family's write stall condition went to delayed
+  or stopped, until it went back to normal (time = start, with duration)
+- slow_raftstore, slow_apply: raftstore and apply warnings that something
+  took long (`... takes 1.2s`, or a takes/elapsed/duration field)
+- region_split
+- compaction: finished compactions with their duration (TiKV messages,
+  or RocksDB EVENT_LOG_v1 compaction_finished lines)
+- mvcc_gc: TiKV's GC worker; xll_gc: any other GC (the XLL value log)
+
+Every event is assigned to the phases.csv window (run or load phase of a
+workload and thread count) it falls in, and per window the summary has
+event counts, the seconds of write stall, compaction and GC inside the
+window, the throughput of that point, and a root-cause candidate: the
+event kind that covered most of the window.
+
+    ./loganalyzer.py --results ../results --events ../dot-dat/log-events.csv --windows ../dot-dat/log-windows.csv
+"""
+
+import argparse
+import bisect
+import calendar
+import csv
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from resultsindex import ResultsIndex
+from ycsbresults import build_table
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from phases import read_phases
+
+# bump when parse_log changes so cached events are re-parsed
+events_kind = 'tikv-log-events/1'
+
+log_re = re.compile(r'^\[(\d{4})/(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)\.(\d+) ([+-])(\d\d):?(\d\d)\] '
+                    r'\[(\w+)\] \[([^\]]*)\] \["((?:[^"\\]|\\.)*)"\](.*)$')
+field_re = re.compile(r'\[([\w.-]+)=("(?:[^"\\]|\\.)*"|[^\]]*)\]')
+# lines without any of these are skipped before the full parse
+keyword_re = re.compile(rb'stall|split|compact|takes|slow|gc|GC|EVENT_LOG')
+duration_re = re.compile(r'(\d+(?:\.\d+)?)(ns|\xb5s|us|ms|s|m)\b')
+takes_re = re.compile(r'takes? (\d+(?:\.\d+)?(?:ns|\xb5s|us|ms|s|m))\b')
+# inside a quoted TiKV message the JSON quotes are escaped
+micros_re = re.compile(r'compaction_time_micros\\?": (\d+)')
+split_re = re.compile(r'^(?:on split|split region|batch split region)', re.IGNORECASE)
+compaction_re = re.compile(r'compaction (?:finished|completed|done)|compact.* finished', re.IGNORECASE)
+gc_re = re.compile(r'\bgc\b|garbage collect', re.IGNORECASE)
+raftstore_re = re.compile(r'store|peer|apply|raft|fsm|region', re.IGNORECASE)
+
+units_ms = {'ns': 1e-6, '\xb5s': 1e-3, 'us': 1e-3, 'ms': 1.0, 's': 1e3, 'm': 6e4}
+duration_fields = ['takes', 'time_takes', 'elapsed', 'duration', 'cost', 'compaction_time_micros']
+stall_fields = ['current', 'cur', 'condition', 'new', 'state']
+stall_severity = {'normal': 0, 'delayed': 1, 'stopped': 2}
+event_kinds = ['write_stall', 'slow_raftstore', 'slow_apply', 'region_split', 'compaction', 'mvcc_gc', 'xll_gc']
+# kinds whose duration counts as time the window spent in them
+timed_kinds = ['write_stall', 'compaction', 'mvcc_gc', 'xll_gc']
+
+event_columns = ['experiment', 'experimenttype', 'node', 'tag', 'time', 'event', 'duration_ms', 'detail',
+                 'phase', 'workload', 'threads']
+window_columns = (['experiment', 'experimenttype', 'phase', 'workload', 'threads', 'start', 'end', 'ops']
+                  + event_kinds + [f'{k}_s' for k in timed_kinds] + ['slow_max_ms', 'candidate'])
+
+
+def parse_duration(text):
+    """'1.5s', '230ms', '45µs' -> milliseconds, None if it is not a duration."""
+    m = duration_re.search(text or '')
+    return float(m.group(1)) * units_ms[m.group(2)] if m else None
+
+
+def line_duration(message, fields):
+    for name in duration_fields:
+        if name in fields:
+            value = fields[name].strip('"')
+            if name.endswith('_micros') and value.isdigit():
+                return int(value) / 1000
+            ms = parse_duration(value)
+            if ms is not None:
+                return ms
+    m = takes_re.search(message)
+    if m:
+        return parse_duration(m.group(1))
+    m = micros_re.search(message)
+    return int(m.group(1)) / 1000 if m else None
+
+
+def stall_condition(message, fields):
+    for name in stall_fields:
+        value = fields.get(name, '').strip('"').lower()
+        for condition in stall_severity:
+            if condition in value:
+                return condition
+    lowered = message.lower()
+    for condition in ['stopped', 'delayed', 'normal']:
+        if condition in lowered:
+            return condition
+    return None
+
+
+class Clock:
+    """Log timestamps to epoch seconds, reusing the last second's conversion (logs are in order)."""
+
+    def __init__(self):
+        self.key = None
+        self.base = 0.0
+
+    def time(self, m):
+        key = m.group(1, 2, 3, 4, 5, 6, 8, 9, 10)
+        if key != self.key:
+            y, mo, d, h, mi, s, sign, th, tm = key
+            offset = (int(th) * 3600 + int(tm) * 60) * (1 if sign == '+' else -1)
+            self.base = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(s))) - offset
+            self.key = key
+        frac = m.group(7)
+        return self.base + int(frac) / 10 ** len(frac)
+
+
+def parse_log(path):
+    """[time, event, duration_ms, detail] of every event in one TiKV log, in file order."""
+    events = []
+    clock = Clock()
+    stalls = {}  # cf -> [start, worst condition]
+    last = None
+    with open(path, 'rb') as f:
+        for raw in f:
+            if not keyword_re.search(raw):
+                continue
+            m = log_re.match(raw.decode('utf-8', 'replace').rstrip('\n'))
+            if not m:
+                continue
+            t = last = clock.time(m)
+            level, source, message = m.group(11), m.group(12), m.group(13)
+            fields = dict(field_re.findall(m.group(14)))
+            lowered = message.lower()
+
+            if 'stall' in lowered:
+                condition = stall_condition(message, fields)
+                cf = fields.get('cf', fields.get('cf_name', '')).strip('"')
+                if condition in ('delayed', 'stopped'):
+                    stall = stalls.setdefault(cf, [t, condition])
+                    if stall_severity[condition] > stall_severity[stall[1]]:
+                        stall[1] = condition
+                elif condition == 'normal' and cf in stalls:
+                    start, worst = stalls.pop(cf)
+                    events.append([start, 'write_stall', (t - start) * 1000, f'cf={cf} {worst}'])
+            elif split_re.search(message):
+                region = fields.get('region_id', fields.get('region', '')).strip('"')
+                events.append([t, 'region_split', None, f'region={region}' if region else source])
+            elif 'compaction_finished' in message or compaction_re.search(message):
+                cf = fields.get('cf', '').strip('"')
+                events.append([t, 'compaction', line_duration(message, fields), f'cf={cf}' if cf else source])
+            elif gc_re.search(message):
+                kind = 'mvcc_gc' if source.startswith(('gc_worker', 'gc_manager', 'compaction_filter')) else 'xll_gc'
+                events.append([t, kind, line_duration(message, fields), message[:120]])
+            elif level in ('WARN', 'WARNING', 'ERROR') and raftstore_re.search(source):
+                ms = line_duration(message, fields)
+                if ms is None and 'slow' not in lowered:
+                    continue
+                kind = 'slow_apply' if 'apply' in source.lower() or 'apply' in lowered else 'slow_raftstore'
+                events.append([t, kind, ms, f'{source} {message[:120]}'])
+
+    # stalls still on when the log ends last until its last event
+    for cf, (start, worst) in stalls.items():
+        events.append([start, 'write_stall', (last - start) * 1000, f'cf={cf} {worst}, unfinished'])
+    return events
+
+
+def find_logs(results):
+    """(path, experiment, experimenttype, node, tag) of every collected TiKV log."""
+    logs = []
+    for path in sorted(glob.glob(os.path.join(results, '*', '*', '[0-9]*', 'tikv-*.log'))):
+        nodedir, filename = os.path.split(path)
+        typedir, node = os.path.split(nodedir)
+        expdir, experimenttype = os.path.split(typedir)
+        logs.append((path, os.path.basename(expdir), experimenttype, node, filename[len('tikv-'):-len('.log')]))
+    return logs
+
+
+def parse_logs(logs, results, jobs=None, use_index=True):
+    """Events of every log as event_columns rows (without the window), parsed in parallel."""
+    paths = [log[0] for log in logs]
+    if use_index:
+        index = ResultsIndex(results)
+        parsed = index.lookup_many(paths, events_kind, parse_log, jobs)
+        print(f'{index.hits} logs unchanged, {index.misses} parsed', file=sys.stderr)
+        index.close()
+    elif paths:
+        # one big log per worker, so no batching
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = dict(zip(paths, pool.map(parse_log, paths)))
+    else:
+        parsed = {}
+    return [dict(experiment=experiment, experimenttype=experimenttype, node=node, tag=tag,
+                 time=t, event=event, duration_ms=ms, detail=detail)
+            for path, experiment, experimenttype, node, tag in logs
+            for t, event, ms, detail in parsed[path]]
+
+
+def read_windows(results, experiment, experimenttype):
+    path = os.path.join(results, experiment, experimenttype, 'phases.csv')
+    if not os.path.exists(path):
+        return []
+    return sorted((p for p in read_phases(path) if p['phase'] in ('run', 'load')), key=lambda p: p['start'])
+
+
+def point_ops(rows, windows):
+    """
+    Throughput of each window from the client=all TOTAL rows of its directory.
+    phases.csv has the total thread count, as do rows of runs with a shard
+    plan; without one it is guessed from the per-client count. Windows of
+    the same workload and threads (open-loop rates) pair up in order of
+    target.
+    """
+    points = {}
+    for r in rows:
+        if r['client'] != 'all' or r['op'] != 'TOTAL':
+            continue
+        if r['total_threads'] != '':
+            threads, nclients = int(r['total_threads']), 1
+        else:
+            # the log names have the total // nclients
+            threads = int(r['threads'])
+            nclients = max(sum(1 for c in rows if c['client'] != 'all' and c['phase'] == r['phase'] and
+                               c['workload'] == r['workload'] and c['threads'] == r['threads'] and
+                               c['target'] == r['target'] and c['op'] == 'TOTAL'), 1)
+        points.setdefault((r['phase'], r['workload'], threads, nclients), []).append(r)
+    for found in points.values():
+        found.sort(key=lambda r: int(r['target'] or 0))
+
+    ops = []
+    seen = {}
+    for w in windows:
+        key = (w['phase'], w['workload'], w['threads'])
+        n = seen[key] = seen.get(key, -1) + 1
+        match = [found for (phase, workload, threads, nclients), found in points.items()
+                 if phase == w['phase'] and workload == w['workload'] and threads == int(w['threads'] or 0) // nclients]
+        ops.append(match[0][n].get('ops', '') if len(match) == 1 and n < len(match[0]) else '')
+    return ops
+
+
+def align(events, results, table, dirs):
+    """Fill each event's window and return one summary row per window of the (experiment, experimenttype) dirs."""
+    summaries = []
+    for experiment, experimenttype in sorted(dirs):
+        windows = read_windows(results, experiment, experimenttype)
+        rows = [r for r in table if r['experiment'] == experiment and r['experimenttype'] == experimenttype]
+        summary = [dict(experiment=experiment, experimenttype=experimenttype, phase=w['phase'],
+                        workload=w['workload'], threads=w['threads'], start=w['start'], end=w['end'], ops=ops,
+                        slow_max_ms=0.0, **{k: 0 for k in event_kinds}, **{f'{k}_s': 0.0 for k in timed_kinds})
+                   for w, ops in zip(windows, point_ops(rows, windows))]
+        starts = [w['start'] for w in windows]
+        for e in events:
+            if (e['experiment'], e['experimenttype']) != (experiment, experimenttype):
+                continue
+            e.update(phase='', workload='', threads='')
+            end = e['time'] + (e['duration_ms'] or 0) / 1000
+            # the window the event started in, and any later ones a long event runs into
+            first = max(bisect.bisect_right(starts, e['time']) - 1, 0)
+            for w, s in zip(windows[first:], summary[first:]):
+                if w['start'] > end:
+                    break
+                overlap = min(end, w['end']) - max(e['time'], w['start'])
+                if not w['start'] <= e['time'] <= w['end'] and overlap <= 0:
+                    continue
+                if w['start'] <= e['time'] <= w['end']:
+                    e.update(phase=w['phase'], workload=w['workload'], threads=w['threads'])
+                    s[e['event']] += 1
+                    if e['event'].startswith('slow_') and e['duration_ms']:
+                        s['slow_max_ms'] = max(s['slow_max_ms'], e['duration_ms'])
+                if e['event'] in timed_kinds and overlap > 0:
+                    s[f"{e['event']}_s"] += overlap
+        for s in summary:
+            s['candidate'] = candidate(s)
+        summaries += summary
+    return summaries
+
+
+def candidate(s):
+    """Event kind that most plausibly explains a window: most seconds covered, else most slow warnings."""
+    timed = max(timed_kinds, key=lambda k: s[f'{k}_s'])
+    if s[f'{timed}_s'] > 0:
+        return timed
+    for kind in ['slow_raftstore', 'slow_apply', 'region_split']:
+        if s[kind]:
+            return kind
+    return ''
+
+
+def fmt(column, value):
+    if value is None or isinstance(value, str):
+        return value or ''
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return ''
+    return f'{value:.3f}' if column in ('time', 'start', 'end') or column.endswith('_s') else f'{value:.1f}'
+
+
+def write_rows(rows, columns, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([fmt(c, row[c]) for c in columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--results', default='../results')
+    parser.add_argument('--experiment', default=None, help='only results/<experiment> (all by default)')
+    parser.add_argument('--events', default='../dot-dat/log-events.csv')
+    parser.add_argument('--windows', default='../dot-dat/log-windows.csv')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='log parser processes (all CPUs default)')
+    parser.add_argument('--no-index', dest='use_index', action='store_false',
+                        help='parse every log even if it is unchanged since the last run')
+    args = parser.parse_args()
+
+    logs = [log for log in find_logs(args.results) if args.experiment in (None, log[1])]
+    events = parse_logs(logs, args.results, args.jobs, args.use_index)
+    events.sort(key=lambda e: (e['experiment'], e['experimenttype'], e['time']))
+    table = [r for r in build_table(args.results, args.jobs, args.use_index)
+             if args.experiment in (None, r['experiment'])]
+    summaries = align(events, args.results, table, {(log[1], log[2]) for log in logs})
+    write_rows(events, event_columns, args.events)
+    write_rows(summaries, window_columns, args.windows)
+    print(f'wrote {len(events)} events to {args.events}, {len(summaries)} windows to {args.windows}', file=sys.stderr)
+
+    for s in summaries:
+        if s['candidate']:
+            counts = ', '.join(f'{s[k]} {k}' for k in event_kinds if s[k])
+            ops = f"{float(s['ops']):.0f} ops/s, " if s['ops'] != '' else ''
+            print(f"{s['experiment']} {s['experimenttype']} {s['phase']} {s['workload'] or '-'} {s['threads']} threads: "
+                  f"{ops}{counts}; candidate {s['candidate']}")
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+"""
+Throughput and latency against memory budget (tikv-ycsb.py --experimenttype memsweep).
+
+Each budget of a sweep is its own results/<experiment>/memsweep-<budget>/
+directory. For every budget, workload and thread count the table has the
+go-ycsb result (ops summed over clients; p50 and p99 the count-weighted
+mean of the clients' percentiles, as in ycsbresults.py, which only
+approximates the percentile of all operations) next to what the TiKV
+nodes' memory looked like during that run (its phases.csv window):
+- page_cache_bytes, memory_bytes: mean cgroup file pages and usage per node
+- refaults_per_s, majfaults_per_s: page cache misses on pages that were
+  cached before (workingset refaults) and major faults, summed over the
+  nodes; node-wide /proc/vmstat counters where there is no cgroup (--local)
+- block_cache_hit: RocksDB block cache hit ratio over the budget's runs
+
+    ./memcurve.py table --results ../results --out ../dot-dat/memcurve.csv
+    ./memcurve.py plot --table ../dot-dat/memcurve.csv --workload c --out ../graphs/memcurve-c.pdf
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import warnings
+
+import numpy as np
+
+import promparse
+from writeamp import run_gnuplot, system_of
+from ycsbresults import build_table
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from phases import read_phases
+
+budget_re = re.compile(r'^memsweep-(?P<budget>.+)$')
+units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+cache_metric = 'tikv_engine_cache_efficiency'
+memory_columns = ['page_cache_bytes', 'memory_bytes', 'refaults_per_s', 'majfaults_per_s']
+columns = (['experiment', 'system', 'budget', 'budget_bytes', 'workload', 'threads', 'ops', 'p50_us', 'p99_us']
+           + memory_columns + ['block_cache_hit'])
+
+
+def budget_bytes(budget):
+    """8G, 512M, bytes -> bytes"""
+    budget = budget.upper().rstrip('B')
+    if budget[-1:] in units:
+        return int(float(budget[:-1]) * units[budget[-1]])
+    return int(budget)
+
+
+def read_memory(path):
+    """(times, {column: values}) of a memory.csv, empty cells as NaN."""
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], rows[1:]
+    data = np.array([[float(v) if v else np.nan for v in row] for row in rows]).reshape(-1, len(header))
+    return data[:, 0], {name: data[:, i] for i, name in enumerate(header)}
+
+
+def window_stats(series, start, end):
+    """memory_columns of one node within [start, end], NaN where nothing was sampled."""
+    times, cols = series
+    inside = (times >= start) & (times <= end)
+    if inside.sum() < 2:
+        return np.full(len(memory_columns), np.nan)
+    seconds = times[inside][-1] - times[inside][0]
+
+    def rate(*names):
+        # the cgroup's counter, or the node's if the cgroup was not there
+        for name in names:
+            values = cols[name][inside]
+            if not np.isnan(values).all() and seconds > 0:
+                return (np.nanmax(values) - np.nanmin(values)) / seconds
+        return np.nan
+
+    return np.array([np.nanmean(cols['file'][inside]), np.nanmean(cols['memory_current'][inside]),
+                     rate('refault', 'vm_refault'), rate('pgmajfault', 'vm_pgmajfault')])
+
+
+def block_cache_hit(typedir):
+    """Block cache hits / (hits + misses) of the kv engine over the nodes' metrics files."""
+    hits = misses = 0.0
+    for path in glob.glob(os.path.join(typedir, '[0-9]*', 'tikv-*.metrics')):
+        for key, value in promparse.load(path).samples.get(cache_metric, {}).items():
+            labels = dict(key)
+            if labels.get('db', 'kv') != 'kv':
+                continue
+            if labels.get('type') == 'block_cache_hit':
+                hits += value
+            elif labels.get('type') == 'block_cache_miss':
+                misses += value
+    return hits / (hits + misses) if hits + misses > 0 else float('nan')
+
+
+def build_curve(results, use_index=True):
+    rows = [r for r in build_table(results, use_index=use_index)
+            if budget_re.match(r['experimenttype']) and r['client'] == 'all'
+            and r['phase'] == 'run' and r['op'] == 'TOTAL']
+    curve = []
+    for typedir in sorted({(r['experiment'], r['experimenttype']) for r in rows}):
+        experiment, experimenttype = typedir
+        path = os.path.join(results, experiment, experimenttype)
+        budget = budget_re.match(experimenttype).group('budget')
+        windows = {(p['workload'], p['threads']): (p['start'], p['end'])
+                   for p in (read_phases(f'{path}/phases.csv') if os.path.exists(f'{path}/phases.csv') else [])
+                   if p['phase'] == 'run'}
+        nodes = [read_memory(p) for p in sorted(glob.glob(os.path.join(path, '[0-9]*', 'memory.csv')))]
+        hit = block_cache_hit(path)
+        for r in sorted((r for r in rows if (r['experiment'], r['experimenttype']) == typedir),
+                        key=lambda r: (r['workload'], int(r['threads']))):
+            # phases.csv has the total thread count, known if the run has a shard plan
+            window = windows.get((r['workload'], str(r['total_threads'] or r['threads'])))
+            if window is None:
+                window = next((w for (wl, _), w in windows.items() if wl == r['workload']), None)
+            stats = np.full((max(len(nodes), 1), len(memory_columns)), np.nan)
+            with warnings.catch_warnings():
+                # a counter no node has (no cgroup with --local) comes out as NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                if window and nodes:
+                    stats = np.stack([window_stats(n, *window) for n in nodes])
+                per_node = np.nanmean(stats[:, :2], axis=0)
+                summed = np.where(np.isnan(stats[:, 2:]).all(axis=0), np.nan, np.nansum(stats[:, 2:], axis=0))
+            curve.append(dict(zip(memory_columns, np.concatenate([per_node, summed])),
+                              experiment=experiment, system=system_of(experiment), budget=budget,
+                              budget_bytes=budget_bytes(budget), workload=r['workload'], threads=r['threads'],
+                              ops=r.get('ops', np.nan), p50_us=r.get('p50_us', np.nan),
+                              p99_us=r.get('p99_us', np.nan), block_cache_hit=hit))
+    curve.sort(key=lambda c: (c['experiment'], c['workload'], int(c['threads']), c['budget_bytes']))
+    return curve
+
+
+def fmt(column, value):
+    if isinstance(value, str):
+        return value
+    if value != value:
+        return ''
+    return f'{value:.4f}' if column == 'block_cache_hit' else f'{value:.1f}' if isinstance(value, float) else str(value)
+
+
+def write_curve(curve, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in curve:
+            writer.writerow([fmt(c, row[c]) for c in columns])
+
+
+def read_curve(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def plot(curve, workload, out):
+    """Throughput (left axis) and p99 latency (right axis) against budget, one pair of lines per experiment."""
+    experiments = sorted({r['experiment'] for r in curve if r['workload'] == workload})
+    datafile = os.path.splitext(out)[0] + '.dat'
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(datafile, 'w') as f:
+        for experiment in experiments:
+            f.write(f'"{experiment}"\n')
+            for r in curve:
+                if r['experiment'] == experiment and r['workload'] == workload:
+                    f.write(f"{int(r['budget_bytes']) / 1024 ** 3:g}\t{r['ops'] or 0}\t{float(r['p99_us'] or 0) / 1000:g}\n")
+            f.write('\n\n')
+    if not experiments:
+        print(f'WARN no memsweep results for workload {workload}')
+        return
+
+    plots = ', \\\n    '.join(f"'{datafile}' index {i} using 1:2 with linespoints ls {i + 1} title columnheader(1), "
+                               f"'' index {i} using 1:3 axes x1y2 with linespoints ls {i + 1} dt 2 notitle"
+                               for i in range(len(experiments)))
+    script = f'''set terminal pdf size 3.7in,2.4in
+    set output "{out}"
+    set xlabel "Memory budget (GB)"
+    set logscale x 2
+    set ylabel "Throughput (ops/sec)"
+    set y2label "p99 latency (ms, dashed)"
+    set yrange [0:*]
+    set y2range [0:*]
+    set ytics nomirror
+    set y2tics
+    set key top left
+
+    plot {plots}
+    '''
+    run_gnuplot(script)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    t = sub.add_parser('table', help='throughput, latency and memory counters of every memsweep budget')
+    t.add_argument('--results', default='../results')
+    t.add_argument('--out', default='../dot-dat/memcurve.csv')
+    t.add_argument('--no-index', dest='use_index', action='store_false',
+                   help='parse every log even if it is unchanged since the last run')
+
+    p = sub.add_parser('plot', help='throughput and p99 against memory budget for one workload')
+    p.add_argument('--table', default='../dot-dat/memcurve.csv')
+    p.add_argument('--workload', required=True)
+    p.add_argument('--out', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'table':
+        curve = build_curve(args.results, args.use_index)
+        write_curve(curve, args.out)
+        print(f'wrote {len(curve)} rows to {args.out}', file=sys.stderr)
+    else:
+        plot(read_curve(args.table), args.workload, args.out)
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+"""
+Statistics over repeated runs (tikv-ycsb.py --runs N).
+
+Repetitions live in results/<name>-<run>-<size>-<vsize>/ (see
+experiment_directory_multirun in common.sh). Every point of the results
+tree (name, size, value size, experiment type, phase, workload, threads,
+open-loop target and op, summed over clients as in ycsbresults.py) is
+grouped over its runs, and for throughput and each latency percentile
+the table has:
+
+    runs, mean, std, cv, ci_low, ci_high, min, max, outliers
+
+ci_low/ci_high is a percentile bootstrap confidence interval of the
+mean. outliers lists the runs whose modified z-score (median and MAD)
+exceeds --outlier_z (only with 4 or more runs). All groups are computed
+together as NaN-padded (group x run) arrays, so the whole tree takes one
+pass per statistic.
+
+    ./multirun.py --results ../results --out ../dot-dat/multirun.csv
+
+Directories without a run number count as one run of their own name.
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import warnings
+
+import numpy as np
+
+from ycsbresults import build_table
+
+multirun_re = re.compile(r'^(?P<name>.+)-(?P<run>\d+)-(?P<dbsize>\d+GB)-(?P<vsize>\d+KB)$')
+metrics = ['ops', 'avg_us', 'p50_us', 'p99_us', 'p999_us']
+group_columns = ['name', 'dbsize', 'vsize', 'experimenttype', 'phase', 'workload', 'threads', 'target', 'op']
+stat_columns = ['runs', 'mean', 'std', 'cv', 'ci_low', 'ci_high', 'min', 'max', 'outliers']
+columns = group_columns + ['metric'] + stat_columns
+
+
+def split_run(experiment):
+    """(name, run, dbsize, vsize) of a results directory name; run is None without a run number."""
+    m = multirun_re.match(experiment)
+    if m:
+        return m.group('name'), int(m.group('run')), m.group('dbsize'), m.group('vsize')
+    return experiment, None, '', ''
+
+
+def group_runs(rows):
+    """
+    (group keys, run numbers per group, values) where values is a
+    (groups, max runs, metrics) array, NaN where a run lacks a value.
+    """
+    groups = {}
+    for row in rows:
+        if row.get('client') != 'all':
+            continue
+        name, run, dbsize, vsize = split_run(row['experiment'])
+        key = (name, dbsize or row.get('dbsize', ''), vsize or row.get('vsize', ''), row['experimenttype'],
+               row['phase'], row['workload'], str(row['threads']), str(row.get('target', '')), row['op'])
+        groups.setdefault(key, {})[run if run is not None else 0] = row
+
+    keys = sorted(groups)
+    width = max((len(g) for g in groups.values()), default=0)
+    values = np.full((len(keys), width, len(metrics)), np.nan)
+    runs = []
+    for i, key in enumerate(keys):
+        byrun = groups[key]
+        runs.append(sorted(byrun))
+        for j, run in enumerate(runs[-1]):
+            values[i, j] = [float(byrun[run].get(m) or 'nan') for m in metrics]
+    return keys, runs, values
+
+
+def bootstrap_ci(values, confidence, resamples, rng, chunk=1 << 22):
+    """
+    Percentile bootstrap CI of the mean along axis 1 of a NaN-padded
+    (groups, runs, metrics) array: every group and metric at once, in
+    chunks of groups that keep the resample array near `chunk` values.
+    """
+    g, width, k = values.shape
+    # valid values first, so a resample of n draws indices below n
+    packed = np.sort(values, axis=1)
+    n = np.sum(~np.isnan(values), axis=1)  # (groups, metrics)
+    alpha = (1 - confidence) / 2
+    low = np.full((g, k), np.nan)
+    high = np.full((g, k), np.nan)
+    step = max(chunk // (resamples * width * k), 1)
+    for start in range(0, g, step):
+        part = slice(start, start + step)
+        pn = np.maximum(n[part], 1)
+        pg = pn.shape[0]
+        idx = np.floor(rng.random((pg, resamples, width, k)) * pn[:, None, None, :]).astype(int)
+        sampled = packed[part][np.arange(pg)[:, None, None, None], idx, np.arange(k)]
+        # only the first n draws form a resample of size n
+        used = np.arange(width)[None, None, :, None] < n[part][:, None, None, :]
+        means = np.where(used, sampled, 0.0).sum(axis=2) / pn[:, None, :]
+        low[part], high[part] = np.quantile(means, [alpha, 1 - alpha], axis=1)
+    return np.where(n >= 2, low, np.nan), np.where(n >= 2, high, np.nan)
+
+
+def outlier_mask(values, z, min_runs=4):
+    """
+    True where a run's modified z-score (0.6745 (x - median) / MAD) exceeds
+    z. With fewer than min_runs runs the MAD says little, so nothing is flagged.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        median = np.nanmedian(values, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(values - median), axis=1, keepdims=True)
+        score = 0.6745 * np.abs(values - median) / mad
+    enough = np.sum(~np.isnan(values), axis=1, keepdims=True) >= min_runs
+    return enough & (np.nan_to_num(score, nan=0.0, posinf=0.0) > z)
+
+
+def summarize(rows, confidence=0.95, resamples=2000, outlier_z=3.5, seed=0):
+    keys, runs, values = group_runs(rows)
+    if not keys:
+        return []
+    rng = np.random.default_rng(seed)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # a metric no run reported (all NaN) just comes out as NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        count = np.sum(~np.isnan(values), axis=1)
+        mean = np.nanmean(values, axis=1)
+        std = np.where(count >= 2, np.nanstd(values, axis=1, ddof=1), np.nan)
+        low, high = bootstrap_ci(values, confidence, resamples, rng)
+        vmin = np.nanmin(values, axis=1)
+        vmax = np.nanmax(values, axis=1)
+        cv = std / mean
+    outliers = outlier_mask(values, outlier_z)
+
+    table = []
+    for i, key in enumerate(keys):
+        for j, metric in enumerate(metrics):
+            if count[i, j] == 0:
+                continue
+            table.append(dict(zip(group_columns, key), metric=metric, runs=int(count[i, j]),
+                              mean=mean[i, j], std=std[i, j], cv=cv[i, j], ci_low=low[i, j], ci_high=high[i, j],
+                              min=vmin[i, j], max=vmax[i, j],
+                              outliers=';'.join(str(runs[i][r]) for r in np.flatnonzero(outliers[i, :len(runs[i]), j]))))
+    return table
+
+
+def fmt(value):
+    if isinstance(value, str):
+        return value
+    if value != value:
+        return ''
+    return f'{value:.4f}' if isinstance(value, float) else str(value)
+
+
+def write_summary(table, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in table:
+            writer.writerow([fmt(row[c]) for c in columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--results', default='../results')
+    parser.add_argument('--out', default='../dot-dat/multirun.csv')
+    parser.add_argument('--confidence', type=float, default=0.95, help='bootstrap CI level (0.95)')
+    parser.add_argument('--resamples', type=int, default=2000, help='bootstrap resamples (2000)')
+    parser.add_argument('--outlier_z', type=float, default=3.5, help='modified z-score marking an outlier run (3.5)')
+    parser.add_argument('--seed', type=int, default=0, help='bootstrap seed, so tables are reproducible (0)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='log parser processes (all CPUs default)')
+    parser.add_argument('--no-index', dest='use_index', action='store_false',
+                        help='parse every log even if it is unchanged since the last run')
+    args = parser.parse_args()
+
+    table = summarize(build_table(args.results, args.jobs, args.use_index),
+                      args.confidence, args.resamples, args.outlier_z, args.seed)
+    write_summary(table, args.out)
+    print(f'wrote {len(table)} rows to {args.out}', file=sys.stderr)
+    noisy = [r for r in table if r['metric'] == 'ops' and r['outliers']]
+    for r in noisy:
+        print(f"outlier runs {r['outliers']}: {r['name']} {r['experimenttype']} {r['phase']} "
+              f"{r['workload']} {r['threads']} threads {r['op']}")
@@ -48,10 +48,6 @@ unset multiplot
 EOF
 }
 
-read_ops_latency () {
-    awk 'BEGIN { FS = ", " } /TOTAL/ {split($3,ops," "); split($7,latency," "); print ops[2], latency[2]}' $1 | tail -n1
-}
-
 generate_data () {
     vsize=$1
     vsizestr=$(value_string $vsize)
@@ -59,32 +55,17 @@ generate_data () {
     for db in ${mydbs[@]}; do
 	echo "$db"
 	outfile="$datadir/$db-$myexperiment-$vsizestr.dat"
-	for threads in $(seq 4 4 64); do
-	    ops=()
-	    latency=()
-	    for client in $(seq 0 1); do
-		filepath=$(experiment_directory "$db" "$myexperiment" "$vsizestr")/ycsb/run_c_threads_${threads}_client_$client.ycsb
-		if [[ -f "$filepath" ]]; then
-		    found=1
-		    read clientops clientlatency < <(read_ops_latency "$filepath")
-		    ops[$client]=$clientops
-		    latency[$client]=$clientlatency
-		else
-		    found=0
-		    continue
-		fi
-	    done
 
-	    # columns: CLIENT0_OPS CLIENT1_OPS CLIENT0_LAT50 CLIENT1_LAT50
-	    if [[ $found -eq 1 ]]; then
-		echo ${ops[0]} ${ops[1]} ${latency[0]} ${latency[1]} >> $outfile
-	    fi
-	done	
+	# columns: CLIENT0_OPS CLIENT1_OPS CLIENT0_LAT50 CLIENT1_LAT50
+	python3 ycsbresults.py clients --table $ycsbtable \
+	    --dir $(experiment_directory "$db" "$myexperiment" "$vsizestr")/ycsb \
+	    --phase run --workload c --threads 4:64:4 >> $outfile
     done
 }
 
 mkdir -p $datadir
 myexperiment="read-scalability-100GB"
+build_ycsb_table
 
 for vsize in ${valuesizes[@]}; do
     vsizestr=$(value_string $vsize)
@@ -46,10 +46,6 @@ unset multiplot
 EOF
 }
 
-read_ops_latency () {
-    awk 'BEGIN { FS = ", " } /TOTAL/ {split($3,ops," "); split($7,latency," "); print ops[2], latency[2]}' $1 | tail -n1
-}
-
 generate_data () {
     vsize=$1
     vsizestr=$(value_string $vsize)
@@ -57,53 +53,26 @@ generate_data () {
     for db in ${dbs[@]}; do
 	echo "$db"
 	outfile="$datadir/$db-$myexperiment-$vsizestr.dat"
-	for threads in $(seq 4 2 64); do
-	    ops=()
-	    latency=()
-	    for client in $(seq 0 1); do
-		# we have multiple runs of 16KB write workload
-		if [ "$vsizestr" = "16KB" ]; then
-		    ops_temp=()
-		    latency_temp=()
-		    for run in $(seq 3); do
-			filepath=$(experiment_directory_multirun "$db" "$myexperiment" "$run" "$vsizestr")/writescalability/load_threads_${threads}_client_$client.ycsb
-			if [[ -f "$filepath" ]]; then
-			    read clientops clientlatency < <(read_ops_latency "$filepath")
-			    ops_temp+=("$clientops")
-			    latency_temp+=("$clientlatency")
-			fi
-		    done
-		    if [ ${#ops_temp[@]} -gt 0 ]; then
-			found=1
-			ops[$client]=$(printf '%s\n' "${ops_temp[@]}" | awk '{sum += $1} END {print sum/NR}')
-			latency[$client]=$(printf '%s\n' "${latency_temp[@]}" | awk '{sum += $1} END {print sum/NR}')
-		    else
-			found=0
-		    fi
-		else
-		    filepath=$(experiment_directory "$db" "$myexperiment" "$vsizestr")/writescalability/load_threads_${threads}_client_$client.ycsb
-		    if [[ -f "$filepath" ]]; then
-			found=1
-			read clientops clientlatency < <(read_ops_latency "$filepath")
-			ops[$client]=$clientops
-			latency[$client]=$clientlatency
-		    else
-			found=0
-			continue
-		    fi
-		fi
+	dirs=()
+	# we have multiple runs of 16KB write workload, averaged per client
+	if [ "$vsizestr" = "16KB" ]; then
+	    for run in $(seq 3); do
+		# myexperiment ends in the db size, which goes after the run number
+		dirs+=(--dir "$(experiment_directory_multirun "$db" "${myexperiment%-*}" "$run" "${myexperiment##*-}" "$vsizestr")/writescalability")
 	    done
+	else
+	    dirs+=(--dir "$(experiment_directory "$db" "$myexperiment" "$vsizestr")/writescalability")
+	fi
 
-	    # columns: CLIENT0_OPS CLIENT1_OPS CLIENT0_LAT50 CLIENT1_LAT50
-	    if [[ $found -eq 1 ]]; then
-		echo ${ops[0]} ${ops[1]} ${latency[0]} ${latency[1]} >> $outfile
-	    fi
-	done	
+	# columns: CLIENT0_OPS CLIENT1_OPS CLIENT0_LAT50 CLIENT1_LAT50
+	python3 ycsbresults.py clients --table $ycsbtable "${dirs[@]}" \
+	    --phase load --threads 4:64:2 >> $outfile
     done
 }
 
 mkdir -p $datadir
 myexperiment="write-scalability-50GB"
+build_ycsb_table
 
 for vsize in ${valuesizes[@]}; do
     vsizestr=$(value_string $vsize)
@@ -37,63 +37,40 @@ plot "$data" using 1:(\$3/\$3):xtic(2) title "TiKV" with boxes ls 1 fs pattern 1
 EOF
 }
 
+# ops summed over both clients for LOAD and every workload, one per line
 read_ops () {
-    workload=$1
-    vsize=$2
-    db=$3
-    c=$4
-
-    if [ "$vsizestr" = "16KB" ]; then
-	threads=32
-    else
-	threads=64
-    fi
-
-    filepath=$(experiment_directory "$db" "$myexperiment" "$vsizestr")/ycsb/${workload}_threads_${threads}_client_$c.ycsb
-    
-    if [ -f $filepath ]; then
-	echo $(awk 'BEGIN { FS = ", " } /TOTAL/ {split($3,ops," "); print ops[2]}' $filepath | tail -n1)
-    else
-	echo 0
-    fi
+    db=$1
+    letters=$(printf '%s,' "${workloads[@]#run_}")
+    python3 ycsbresults.py total --table $ycsbtable \
+	--dir $(experiment_directory "$db" "$myexperiment" "$vsizestr")/ycsb \
+	--threads $threads --workloads load,${letters%,}
 }
     
 generate_data () {
     vsize=$1
     vsizestr=$(value_string $vsize)
     outfile=$datadir/$myexperiment-$vsizestr.dat
-    i=0
-    ops=()
 
-    echo -en "${i}\tLOAD" >> $outfile
-    for db in ${dbs[@]}; do
-	for client in $(seq 0 1); do
-	    # YCSB LOAD (write-only)
-	    ops[$client]=$(read_ops "load" $vsize $db $client)
-	done
-	echo -en "\t$(bc <<< "${ops[0]} + ${ops[1]}")" >> $outfile
-    done
-    echo -en "\n" >> $outfile
-    
-    ((i+=1))
+    if [ "$vsizestr" = "16KB" ]; then
+	threads=32
+    else
+	threads=64
+    fi
 
+    labels=("LOAD")
     for w in ${workloads[@]}; do
 	wletter=${w: -1}
-	echo -en "${i}\t${wletter^^}" >> $outfile
-	for db in ${dbs[@]}; do
-	    for client in $(seq 0 1); do
-		ops[$client]=$(read_ops "$w" $vsize $db $client)
-	    done
-	    echo -en "\t$(bc <<< "${ops[0]} + ${ops[1]}")" >> $outfile
-	done
-	echo -en "\n" >> $outfile
-	((i+=1))
+	labels+=("${wletter^^}")
     done
+
+    paste <(seq 0 $((${#labels[@]} - 1))) <(printf '%s\n' "${labels[@]}") \
+	  <(read_ops ${dbs[0]}) <(read_ops ${dbs[1]}) <(read_ops ${dbs[2]}) >> $outfile
 }
 
 mkdir -p $datadir
 mkdir -p $graphsdir
 myexperiment="ycsb-20GB"
+build_ycsb_table
 
 
 for vsize in ${valuesizes[@]}; do
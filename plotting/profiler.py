@@ -0,0 +1,222 @@
+#!/usr/bin/python
+"""
+Per-phase resource profile of the raft write path.
+
+Joins the wf_metrics histograms (see waterfall-data.py) with the CPU,
+disk and network utilization the TiKV nodes sampled during the same
+run (tikv-ycsb.py --sample_resources, <node>/resources-<threads>.csv),
+for every metrics set of an experiment, i.e. every point of a
+writescalability sweep (tikv-<threads>.metrics).
+
+The wf_metrics are cumulative: each one is the time from the proposal
+to a checkpoint. A phase's time is the difference between the mean
+(sum / count) of its checkpoint and the previous one, and is attributed
+to what the phase waits for:
+- batch_wait, send_to_queue: queueing, charged to the busier of CPU and disk
+- before_write, write_kvdb_end, write_end: CPU
+- persist: disk
+- commit_log: followers (replication round trip)
+
+Utilization is taken over the load and run windows of phases.csv
+(the whole sample file if there is none) on each node, and the busiest
+node is reported. Network utilization needs the link speed (--link_gbps).
+
+    ./profiler.py --results ../results --out ../dot-dat/profile.csv
+
+prints, per experiment, the first thread count at which each resource
+reached --threshold utilization.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+import quantiles
+import promparse
+from resultsindex import ResultsIndex
+from writeamp import find_metrics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from phases import read_phases
+
+# bump when the way the means are computed changes
+wf_kind = 'profiler-wf/1'
+
+# checkpoint -> what the time since the previous checkpoint waits for
+phases = [('batch_wait', 'queue'),
+          ('send_to_queue', 'queue'),
+          ('before_write', 'cpu'),
+          ('write_kvdb_end', 'cpu'),
+          ('write_end', 'cpu'),
+          ('persist', 'disk'),
+          ('commit_log', 'followers')]
+wf_metric = 'tikv_raftstore_store_wf_{}_duration_seconds'
+resources = ['cpu', 'disk', 'net']
+windows = ('load', 'run')
+
+columns = ['experiment', 'experimenttype', 'threads', 'phase', 'ms', 'share', 'bound',
+           'cpu_util', 'iowait_util', 'disk_util', 'net_util', 'net_rx_Bps', 'net_tx_Bps']
+
+
+def wf_means(paths):
+    """Mean time from proposal to each checkpoint in ms, over the nodes' metrics files (NaN if absent)."""
+    indexes = [promparse.load(p) for p in paths]
+    means = []
+    for phase, _ in phases:
+        hist = quantiles.collect(indexes, wf_metric.format(phase))
+        means.append(hist.sum / hist.count * 1000 if hist.count else float('nan'))
+    return means
+
+
+def phase_times(means):
+    """Time spent in each phase in ms: differences of consecutive cumulative means."""
+    means = np.asarray(means, dtype=float)
+    # a missing checkpoint leaves the next phase with the time since the last one present
+    present = ~np.isnan(means)
+    last = np.maximum.accumulate(np.where(present, np.arange(len(means)), -1))
+    previous = np.concatenate([[-1], last[:-1]])
+    base = np.where(previous >= 0, means[np.maximum(previous, 0)], 0.0)
+    return np.clip(means - base, 0.0, None)
+
+
+def read_resources(path):
+    """(times, counters) arrays of a resources CSV, columns as disksampler.resource_fields minus time."""
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    return data[:, 0], data[:, 1:]
+
+
+def utilization(path, spans, link_bps):
+    """
+    cpu, iowait, disk and net utilization of one node, and its rx/tx bytes
+    per second, over the spans [(start, end)] (the whole file if empty).
+    """
+    times, counters = read_resources(path)
+    if len(times) < 2:
+        return np.full(6, np.nan)
+    if not spans:
+        spans = [(times[0], times[-1])]
+    spans = np.clip(np.array(spans), times[0], times[-1])
+    # counters at every span edge, interpolated between samples
+    at = np.stack([np.interp(spans.ravel(), times, counters[:, c]) for c in range(counters.shape[1])], axis=1)
+    delta = (at[1::2] - at[0::2]).sum(axis=0)
+    busy, iowait, total, disk_ms, rx, tx = delta
+    seconds = (spans[:, 1] - spans[:, 0]).sum()
+    if seconds <= 0 or total <= 0:
+        return np.full(6, np.nan)
+    net = max(rx, tx) / seconds / link_bps if link_bps else np.nan
+    return np.array([busy / total, iowait / total, disk_ms / (seconds * 1000), net, rx / seconds, tx / seconds])
+
+
+def measurement_spans(typedir, tag):
+    """Load and run windows of phases.csv belonging to a metrics set."""
+    path = os.path.join(typedir, 'phases.csv')
+    if not os.path.exists(path):
+        return []
+    rows = [r for r in read_phases(path) if r['phase'] in windows]
+    if tag.isdigit() and int(tag) > 0:
+        # a fresh cluster per thread count: only its own load
+        rows = [r for r in rows if r['threads'] == tag]
+    return [(r['start'], r['end']) for r in rows]
+
+
+def node_utilization(paths, tag, link_bps):
+    """Utilization of the busiest node per resource (element-wise max over nodes)."""
+    typedir = os.path.dirname(os.path.dirname(paths[0]))
+    spans = measurement_spans(typedir, tag)
+    found = [os.path.join(os.path.dirname(p), f'resources-{tag or 0}.csv') for p in paths]
+    found = [p for p in found if os.path.exists(p)]
+    if not found:
+        return np.full(6, np.nan)
+    util = np.stack([utilization(p, spans, link_bps) for p in found])
+    if np.isnan(util).all():
+        return np.full(6, np.nan)
+    return np.nanmax(util, axis=0)
+
+
+def build_profile(results, link_gbps=10.0, use_index=True):
+    sets = find_metrics(results)
+    index = ResultsIndex(results) if use_index else None
+    # thread counts in numeric order, so the sweep reads top to bottom
+    keys = sorted(sets, key=lambda k: (k[0], k[1], int(k[2]) if k[2].isdigit() else 0))
+    times = np.zeros((len(keys), len(phases)))
+    util = np.zeros((len(keys), 6))
+    for i, key in enumerate(keys):
+        paths = sets[key]
+        means = index.lookup(wf_kind, paths, lambda: wf_means(paths)) if index else wf_means(paths)
+        times[i] = phase_times(means)
+        util[i] = node_utilization(paths, key[2], link_gbps * 1e9 / 8)
+    if index:
+        index.close()
+
+    # queueing goes to whichever of CPU and disk was busier at that point
+    queue_bound = np.where(np.nan_to_num(util[:, 2], nan=-1) > np.nan_to_num(util[:, 0], nan=-1), 'disk', 'cpu')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = times / np.nansum(times, axis=1, keepdims=True)
+
+    rows = []
+    for i, (experiment, experimenttype, tag) in enumerate(keys):
+        for j, (phase, bound) in enumerate(phases):
+            if times[i, j] != times[i, j]:
+                continue
+            rows.append(dict(experiment=experiment, experimenttype=experimenttype, threads=tag or '0',
+                             phase=phase, ms=times[i, j], share=share[i, j],
+                             bound=f'queue:{queue_bound[i]}' if bound == 'queue' else bound,
+                             cpu_util=util[i, 0], iowait_util=util[i, 1], disk_util=util[i, 2],
+                             net_util=util[i, 3], net_rx_Bps=util[i, 4], net_tx_Bps=util[i, 5]))
+    return rows
+
+
+def saturation(rows, threshold):
+    """{experiment: {resource: first thread count with utilization >= threshold, or None}}"""
+    points = {}
+    for r in rows:
+        points.setdefault(r['experiment'], {})[int(r['threads'])] = [r[f'{res}_util'] for res in resources]
+    report = {}
+    for experiment, byth in points.items():
+        threads = np.array(sorted(byth))
+        util = np.array([byth[t] for t in threads], dtype=float)
+        hit = np.nan_to_num(util, nan=0.0) >= threshold
+        first = np.where(hit.any(axis=0), threads[hit.argmax(axis=0)], -1)
+        report[experiment] = {res: (int(t) if t >= 0 else None) for res, t in zip(resources, first)}
+    return report
+
+
+def fmt(column, value):
+    if isinstance(value, str):
+        return value
+    if value != value:
+        return ''
+    if column in ('net_rx_Bps', 'net_tx_Bps'):
+        return f'{value:.0f}'
+    return f'{value:.4f}'
+
+
+def write_profile(rows, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([fmt(c, row[c]) for c in columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--results', default='../results')
+    parser.add_argument('--out', default='../dot-dat/profile.csv')
+    parser.add_argument('--link_gbps', type=float, default=10.0, help='NIC speed for network utilization (10)')
+    parser.add_argument('--threshold', type=float, default=0.8, help='utilization that counts as saturated (0.8)')
+    parser.add_argument('--no-index', dest='use_index', action='store_false',
+                        help='parse every file even if it is unchanged since the last run')
+    args = parser.parse_args()
+
+    rows = build_profile(args.results, args.link_gbps, args.use_index)
+    write_profile(rows, args.out)
+    print(f'wrote {len(rows)} rows to {args.out}', file=sys.stderr)
+    for experiment, first in saturation(rows, args.threshold).items():
+        found = sorted((t, res) for res, t in first.items() if t is not None)
+        summary = ', '.join(f'{res} at {t} threads' for t, res in found) or 'nothing'
+        print(f'{experiment}: saturates {summary} (>= {args.threshold:.0%})')
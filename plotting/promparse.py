@@ -0,0 +1,142 @@
+"""
+Single-pass parser for Prometheus text exposition files (tikv.metrics).
+
+load() reads a metrics file once, optionally through mmap, and builds an
+index of metric name -> label set -> value or histogram. Parsed files are
+cached per path (and invalidated if the file changes), so every later
+lookup is a dictionary access instead of another scan of the file.
+
+    index = promparse.load('../results/.../0/tikv.metrics')
+    hist = index.histogram('tikv_raftstore_append_log_duration_seconds')
+    hist.count, hist.sum, hist.buckets
+"""
+
+import mmap
+import os
+import re
+from dataclasses import dataclass, field
+
+label_re = re.compile(rb'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+@dataclass
+class Histogram:
+    """One histogram series. buckets are (upper bound, cumulative count), sorted, +Inf last."""
+    buckets: list = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+
+class MetricsIndex:
+    """
+    samples:    name -> labels -> value, for every sample line
+    histograms: name -> labels -> Histogram, for *_bucket/_sum/_count families
+    labels are stored as a sorted tuple of (key, value) pairs, without 'le'.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.histograms = {}
+
+    def value(self, name, **labels):
+        return self.samples.get(name, {}).get(labels_key(labels))
+
+    def histogram(self, name, **labels):
+        return self.histograms.get(name, {}).get(labels_key(labels))
+
+    def series(self, name):
+        """All label sets of a histogram in file order: {labels: Histogram}."""
+        return self.histograms.get(name, {})
+
+    def count(self, name):
+        """_count of the first label set of a histogram, 0 if it is missing."""
+        for hist in self.series(name).values():
+            return hist.count
+        print(f"Error: Could not find {name}_count")
+        return 0
+
+    def buckets(self, name):
+        """Finite buckets of every label set of a histogram, in file order."""
+        return [(le, c) for hist in self.series(name).values()
+                for le, c in hist.buckets if le != float('inf')]
+
+
+def labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def parse_labels(raw):
+    return {k.decode(): v.decode() for k, v in label_re.findall(raw)}
+
+
+def parse_lines(lines):
+    """Build a MetricsIndex from an iterable of byte lines."""
+    index = MetricsIndex()
+    for line in lines:
+        if not line or line[0] == ord('#'):
+            continue
+        brace = line.find(b'{')
+        space = line.find(b' ')
+        if brace >= 0 and (space < 0 or brace < space):
+            close = line.rfind(b'}')
+            name = line[:brace].decode()
+            labels = parse_labels(line[brace + 1:close])
+            rest = line[close + 1:]
+        else:
+            name = line[:space].decode()
+            labels = {}
+            rest = line[space:]
+        try:
+            value = float(rest.split()[0])
+        except (ValueError, IndexError):
+            continue
+
+        le = labels.pop('le', None)
+        key = labels_key(labels)
+        index.samples.setdefault(name, {})[key] = value
+
+        if name.endswith('_bucket') and le is not None:
+            hist = histogram_for(index, name[:-len('_bucket')], key)
+            hist.buckets.append((float(le), value))
+
+    # _sum and _count may come before or after the buckets
+    for name, family in index.histograms.items():
+        sums = index.samples.get(f'{name}_sum', {})
+        counts = index.samples.get(f'{name}_count', {})
+        for key, hist in family.items():
+            hist.buckets.sort()
+            hist.sum = sums.get(key, 0.0)
+            hist.count = int(counts.get(key, 0))
+    return index
+
+
+def histogram_for(index, name, key):
+    family = index.histograms.setdefault(name, {})
+    hist = family.get(key)
+    if hist is None:
+        hist = family[key] = Histogram()
+    return hist
+
+
+def parse_file(path, use_mmap=True):
+    with open(path, 'rb') as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return parse_lines(line.rstrip(b'\n') for line in iter(mm.readline, b''))
+        return parse_lines(line.rstrip(b'\n') for line in f)
+
+
+# path -> ((size, mtime), MetricsIndex)
+_cache = {}
+
+
+def load(path, use_mmap=True):
+    """Parse path once and return its MetricsIndex, re-parsing only if the file changed."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    index = parse_file(path, use_mmap)
+    _cache[path] = (stamp, index)
+    return index
@@ -0,0 +1,123 @@
+"""
+Histogram quantiles for TiKV metrics, computed like Prometheus'
+histogram_quantile(): find the bucket holding the target rank and
+interpolate linearly between its lower and upper bound.
+
+Histograms are merged before taking quantiles, across label sets
+(e.g. every `type` of a metric) and across the TiKV nodes of an
+experiment (results/.../0, 1, 2). All requested metrics and quantiles
+are evaluated together as one NumPy array operation.
+
+    idx = [promparse.load(f) for f in node_metrics_files(expdir)]
+    table = quantile_table(idx, ['tikv_raftstore_append_log_duration_seconds'], [0.5, 0.99])
+"""
+
+import glob
+import os
+
+import numpy as np
+
+import promparse
+
+
+def node_metrics_files(expdir, name='tikv.metrics'):
+    """Per-node metrics files of an experiment directory: <expdir>/<n>/<name>, by node number."""
+    paths = glob.glob(os.path.join(expdir, '[0-9]*', name))
+    return sorted(paths, key=lambda p: int(os.path.basename(os.path.dirname(p))))
+
+
+def matches(key, labels):
+    """True if a label key (sorted tuple of pairs) contains every label in labels."""
+    if not labels:
+        return True
+    keydict = dict(key)
+    return all(keydict.get(k) == v for k, v in labels.items())
+
+
+def merge(histograms):
+    """
+    Sum histograms into one. Buckets are merged on the union of their
+    upper bounds; a histogram without a given bound contributes its
+    cumulative count at the nearest bound below it.
+    """
+    histograms = [h for h in histograms if h is not None and h.buckets]
+    if not histograms:
+        return promparse.Histogram()
+    bounds = np.unique(np.concatenate([[le for le, _ in h.buckets] for h in histograms]))
+    total = np.zeros(len(bounds))
+    for h in histograms:
+        les = np.array([le for le, _ in h.buckets])
+        counts = np.array([c for _, c in h.buckets])
+        pos = np.searchsorted(les, bounds, side='right') - 1
+        total += np.where(pos >= 0, counts[np.clip(pos, 0, None)], 0.0)
+    return promparse.Histogram(buckets=list(zip(bounds.tolist(), total.tolist())),
+                               sum=sum(h.sum for h in histograms),
+                               count=sum(h.count for h in histograms))
+
+
+def collect(indexes, metric, labels=None):
+    """Merge every series of metric matching labels, over all indexes (nodes)."""
+    return merge([hist for index in indexes
+                  for key, hist in index.series(metric).items() if matches(key, labels)])
+
+
+def histogram_quantiles(qs, bounds, counts):
+    """
+    Vectorized histogram_quantile.
+
+    qs:     (nq,) quantiles in [0, 1]
+    bounds: (n, m) bucket upper bounds per histogram, ascending, padded with +Inf
+    counts: (n, m) cumulative counts per histogram, padded with the total
+    Returns an (n, nq) array; NaN where a histogram is empty.
+    """
+    qs = np.asarray(qs, dtype=float)
+    bounds = np.asarray(bounds, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    n, m = counts.shape
+    totals = counts[:, -1]
+
+    rank = qs[None, :] * totals[:, None]                        # (n, nq)
+    idx = (counts[:, None, :] >= rank[:, :, None]).argmax(axis=2)  # (n, nq)
+    rows = np.arange(n)[:, None]
+
+    upper = bounds[rows, idx]
+    lower = np.where(idx > 0, bounds[rows, np.maximum(idx - 1, 0)], 0.0)
+    below = np.where(idx > 0, counts[rows, np.maximum(idx - 1, 0)], 0.0)
+    inbucket = counts[rows, idx] - below
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.where(inbucket > 0, (rank - below) / inbucket, 1.0)
+        result = lower + (upper - lower) * frac
+    # the rank fell in the +Inf bucket: report the highest finite bound
+    result = np.where(np.isinf(upper), lower, result)
+    result[totals <= 0] = np.nan
+    return result
+
+
+def pad(histograms):
+    """Stack histograms of different bucket layouts into (bounds, counts) matrices."""
+    width = max((len(h.buckets) for h in histograms), default=1) or 1
+    bounds = np.full((len(histograms), width), np.inf)
+    counts = np.zeros((len(histograms), width))
+    for i, h in enumerate(histograms):
+        if not h.buckets:
+            continue
+        les, cs = zip(*h.buckets)
+        bounds[i, :len(les)] = les
+        counts[i, :len(cs)] = cs
+        counts[i, len(cs):] = cs[-1]
+    return bounds, counts
+
+
+def quantile_table(indexes, metrics, qs, labels=None):
+    """
+    {metric: array of len(qs)} with the quantiles of each metric,
+    merged across label sets matching labels and across indexes.
+    """
+    histograms = [collect(indexes, m, labels) for m in metrics]
+    for metric, h in zip(metrics, histograms):
+        if not h.buckets:
+            print(f'WARN no histogram {metric}')
+    bounds, counts = pad(histograms)
+    values = histogram_quantiles(qs, bounds, counts)
+    return {metric: values[i] for i, metric in enumerate(metrics)}
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+"""
+Performance regression check between two builds.
+
+Compares results directories of a baseline build with those of a
+candidate (e.g. tikv-xll before and after a rebuild), each given as one
+or more results/<experiment> directories: repeated runs (--runs, or the
+same experiment run several times) are the samples of each side.
+Points are aligned by experiment type, value size, phase, workload,
+thread count, open-loop target rate and op, and for each the report has
+throughput and p50/p99 deltas (candidate relative to baseline) with a
+two-sided permutation test of the difference of the means over the
+runs. Where the runs are too few for the test to ever reach --alpha
+(3 + 3 runs cannot get below p = 0.1, 4 + 4 can), or a side has a single
+run, the thresholds alone decide.
+
+For every pair of TiKV metrics sets (same experiment type and
+writescalability thread count) the wf_metrics phase whose mean time
+changed most is reported as well (see profiler.py).
+
+    ./regress.py --baseline ../results/tikv-xll-{0,1,2}-100GB-1KB \\
+                 --candidate ../results/tikv-xll-new-{0,1,2}-100GB-1KB \\
+                 --max_ops_drop 0.05 --max_p99_rise 0.10
+
+Exits with status 1 if any point regressed beyond a threshold (and
+significantly, where it could be tested), so a nightly job can gate on it.
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+
+import numpy as np
+
+from multirun import split_run
+from profiler import phase_times, phases, wf_kind, wf_means
+from resultsindex import ResultsIndex
+from writeamp import find_metrics
+from ycsbresults import aggregate, find_logs, parse_logs
+
+align_columns = ['experimenttype', 'vsize', 'phase', 'workload', 'threads', 'target', 'op']
+metrics = ['ops', 'p50_us', 'p99_us']
+columns = (align_columns + ['metric', 'baseline_runs', 'candidate_runs', 'baseline', 'candidate',
+                            'delta', 'p_value', 'tested', 'regression'])
+# exact permutation tests up to this many splits of the pooled runs, random ones beyond
+exact_limit = 20000
+
+
+def side_rows(dirs, use_index=True):
+    """client=all rows of every ycsb log in the given results/<experiment> directories."""
+    rows = []
+    for d in dirs:
+        d = os.path.abspath(d.rstrip('/'))
+        results, experiment = os.path.dirname(d), os.path.basename(d)
+        logs = [(p, k) for p, k in find_logs(results) if k['experiment'] == experiment]
+        if not logs:
+            print(f'WARN no ycsb logs in {d}', file=sys.stderr)
+        rows += aggregate(parse_logs(logs, results, use_index=use_index))
+    return rows
+
+
+def samples(rows):
+    """{aligned key: {metric: [value per run]}}"""
+    points = {}
+    for row in rows:
+        vsize = split_run(row['experiment'])[3] or row.get('vsize', '')
+        key = (row['experimenttype'], vsize, row['phase'], row['workload'], str(row['threads']),
+               str(row.get('target', '')), row['op'])
+        point = points.setdefault(key, {m: [] for m in metrics})
+        for m in metrics:
+            if row.get(m) is not None:
+                point[m].append(float(row[m]))
+    return points
+
+
+def splits(na, nb):
+    """Ways to relabel na + nb pooled runs into groups of na and nb."""
+    combos = 1
+    for k in range(na):
+        combos = combos * (na + nb - k) // (k + 1)
+    return combos
+
+
+def min_p(na, nb):
+    """Smallest two-sided p-value a permutation test of na and nb runs can give."""
+    return (2 if na == nb else 1) / splits(na, nb)
+
+
+def permutation_p(a, b, resamples, rng):
+    """
+    Two-sided p-value of the difference of means of a and b: the share of
+    relabelings of the pooled values with a difference at least as large.
+    Every relabeling is evaluated at once; exact when there are few.
+    """
+    pooled = np.concatenate([a, b])
+    n, na = len(pooled), len(a)
+    observed = abs(np.mean(a) - np.mean(b))
+    combos = splits(na, len(b))
+    if combos <= exact_limit:
+        masks = np.zeros((combos, n), dtype=bool)
+        for i, chosen in enumerate(itertools.combinations(range(n), na)):
+            masks[i, list(chosen)] = True
+    else:
+        masks = np.argsort(rng.random((resamples, n)), axis=1) < na
+    means_a = (masks * pooled).sum(axis=1) / na
+    means_b = (~masks * pooled).sum(axis=1) / (n - na)
+    # small tolerance so the observed split itself always counts
+    hits = np.sum(np.abs(means_a - means_b) >= observed - 1e-12 * max(observed, 1.0))
+    if combos <= exact_limit:
+        return float(hits / combos)
+    # random relabelings may miss the observed one; count it so p is never 0
+    return float((hits + 1) / (resamples + 1))
+
+
+def compare(base, cand, thresholds, alpha, resamples, seed=0):
+    """One report row per aligned point and metric."""
+    rng = np.random.default_rng(seed)
+    report = []
+    for key in sorted(set(base) & set(cand)):
+        for m in metrics:
+            a, b = np.array(base[key][m]), np.array(cand[key][m])
+            if not len(a) or not len(b):
+                continue
+            mean_a, mean_b = a.mean(), b.mean()
+            delta = (mean_b - mean_a) / mean_a if mean_a else float('nan')
+            p = permutation_p(a, b, resamples, rng) if len(a) >= 2 and len(b) >= 2 else float('nan')
+            testable = p == p and min_p(len(a), len(b)) < alpha
+            # throughput regresses when it drops, latency when it rises
+            worse = -delta if m == 'ops' else delta
+            regression = bool(worse > thresholds[m] and (not testable or p < alpha))
+            report.append(dict(zip(align_columns, key), metric=m, baseline_runs=len(a), candidate_runs=len(b),
+                               baseline=mean_a, candidate=mean_b, delta=delta, p_value=p, tested=testable,
+                               regression=regression))
+    missing = sorted(set(base) ^ set(cand))
+    if missing:
+        print(f'WARN {len(missing)} points only on one side, e.g. {missing[0]}', file=sys.stderr)
+    return report
+
+
+def phase_shifts(base_dirs, cand_dirs, use_index=True):
+    """
+    {(experimenttype, tag): (phase, baseline ms, candidate ms)} of the
+    wf_metrics phase whose mean time changed most, runs averaged per side.
+    """
+    def side(dirs):
+        times = {}
+        for d in dirs:
+            d = os.path.abspath(d.rstrip('/'))
+            results, experiment = os.path.dirname(d), os.path.basename(d)
+            index = ResultsIndex(results) if use_index else None
+            for (e, experimenttype, tag), paths in find_metrics(results).items():
+                if e != experiment:
+                    continue
+                means = index.lookup(wf_kind, paths, lambda: wf_means(paths)) if index else wf_means(paths)
+                times.setdefault((experimenttype, tag), []).append(phase_times(means))
+            if index:
+                index.close()
+        return {key: np.nanmean(np.stack(t), axis=0) for key, t in times.items()}
+
+    base, cand = side(base_dirs), side(cand_dirs)
+    shifts = {}
+    for key in sorted(set(base) & set(cand)):
+        change = np.abs(cand[key] - base[key])
+        if np.isnan(change).all():
+            continue
+        i = int(np.nanargmax(change))
+        shifts[key] = (phases[i][0], base[key][i], cand[key][i])
+    return shifts
+
+
+def fmt(column, value):
+    if isinstance(value, (str, bool, int)):
+        return str(value)
+    if value != value:
+        return ''
+    return f'{value:.4f}' if column in ('delta', 'p_value') else f'{value:.1f}'
+
+
+def write_report(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in report:
+            writer.writerow([fmt(c, row[c]) for c in columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', nargs='+', required=True, help='results/<experiment> directories of the baseline')
+    parser.add_argument('--candidate', nargs='+', required=True, help='results/<experiment> directories of the candidate')
+    parser.add_argument('--out', default=None, help='also write the full report as CSV')
+    parser.add_argument('--max_ops_drop', type=float, default=0.05, help='throughput drop that fails (0.05)')
+    parser.add_argument('--max_p50_rise', type=float, default=0.10, help='p50 latency rise that fails (0.10)')
+    parser.add_argument('--max_p99_rise', type=float, default=0.10, help='p99 latency rise that fails (0.10)')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help='changes with a larger permutation p-value are noise, not regressions (0.05)')
+    parser.add_argument('--resamples', type=int, default=10000, help='random permutations when exact is too many (10000)')
+    parser.add_argument('--op', default='TOTAL', help="op to gate on, 'all' for every op (TOTAL)")
+    parser.add_argument('--no-index', dest='use_index', action='store_false',
+                        help='parse every file even if it is unchanged since the last run')
+    args = parser.parse_args()
+
+    thresholds = {'ops': args.max_ops_drop, 'p50_us': args.max_p50_rise, 'p99_us': args.max_p99_rise}
+    report = compare(samples(side_rows(args.baseline, args.use_index)),
+                     samples(side_rows(args.candidate, args.use_index)),
+                     thresholds, args.alpha, args.resamples)
+    if args.op != 'all':
+        report = [r for r in report if r['op'] == args.op]
+    if args.out:
+        write_report(report, args.out)
+
+    for r in report:
+        flag = 'REGRESSION' if r['regression'] else ''
+        p = f"p={r['p_value']:.3f}" if r['tested'] else 'too few runs to test'
+        print(f"{r['experimenttype']} {r['vsize']} {r['phase']} {r['workload'] or '-'} {r['threads']} threads "
+              f"{'at ' + r['target'] + ' ops/s ' if r['target'] else ''}"
+              f"{r['op']} {r['metric']}: {r['baseline']:.1f} -> {r['candidate']:.1f} ({r['delta']:+.1%}, {p}) {flag}")
+    for (experimenttype, tag), (phase, before, after) in phase_shifts(args.baseline, args.candidate,
+                                                                      args.use_index).items():
+        print(f"{experimenttype} {tag or '-'}: wf phase {phase} moved most, {before:.3f} -> {after:.3f} ms")
+
+    regressions = [r for r in report if r['regression']]
+    print(f'{len(regressions)} regressions in {len(report)} comparisons')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,136 @@
+"""
+Persistent cache of per-file analysis results, kept in a SQLite
+database next to the results directory (results-index.sqlite).
+
+Each entry is keyed by a kind (what was extracted, e.g. 'ycsb-summary/1')
+and the input path(s), and records the size, mtime and content hash of
+every input alongside the extracted summary as JSON. A lookup returns
+the stored summary while the inputs are unchanged:
+- size and mtime match: no file is read at all.
+- size or mtime changed but the hash matches (e.g. the results tree was
+  copied): the new stat is recorded and the summary reused.
+- otherwise the inputs are parsed again and the entry replaced.
+
+Bump the version suffix of a kind whenever its parser changes.
+
+    index = ResultsIndex('../results')
+    summaries = index.lookup_many(paths, 'ycsb-summary/1', parse_summary)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+'''
+
+
+def file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stat_of(path):
+    st = os.stat(path)
+    return [path, st.st_size, st.st_mtime_ns]
+
+
+def default_location(results):
+    return os.path.join(os.path.dirname(os.path.abspath(results)), 'results-index.sqlite')
+
+
+class ResultsIndex:
+
+    def __init__(self, results, path=None):
+        self.path = path or default_location(results)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def cached(self, kind, paths):
+        """
+        Return (summary, None) for an up-to-date entry, or (None, inputs)
+        where inputs is the stat of each path to store with a new summary.
+        """
+        stats = [stat_of(p) for p in paths]
+        row = self.db.execute('SELECT inputs, summary FROM entries WHERE kind = ? AND key = ?',
+                              (kind, '\n'.join(paths))).fetchone()
+        if row is None:
+            return None, stats
+
+        stored = json.loads(row[0])
+        if [s[:3] for s in stored] == stats:
+            return json.loads(row[1]), None
+
+        # changed stat: only re-parse if the content really changed
+        inputs = []
+        for st, old in zip(stats, stored + [None] * len(stats)):
+            digest = old[3] if old and old[:3] == st else file_hash(st[0])
+            if not old or old[0] != st[0] or old[3] != digest:
+                return None, stats
+            inputs.append(st + [digest])
+        self.db.execute('UPDATE entries SET inputs = ? WHERE kind = ? AND key = ?',
+                        (json.dumps(inputs), kind, '\n'.join(paths)))
+        return json.loads(row[1]), None
+
+    def store(self, kind, paths, stats, summary):
+        inputs = [st + [file_hash(st[0])] for st in stats]
+        self.db.execute('INSERT OR REPLACE INTO entries (kind, key, inputs, summary) VALUES (?, ?, ?, ?)',
+                        (kind, '\n'.join(paths), json.dumps(inputs), json.dumps(summary)))
+
+    def lookup(self, kind, paths, compute):
+        """Summary of the files in paths, calling compute() only if one of them changed."""
+        summary, stats = self.cached(kind, paths)
+        if stats is None:
+            self.hits += 1
+            return summary
+        self.misses += 1
+        summary = compute()
+        self.store(kind, paths, stats, summary)
+        self.db.commit()
+        return summary
+
+    def lookup_many(self, paths, kind, parse, jobs=None):
+        """
+        {path: parse(path)} for many single files. Unchanged files come from
+        the index, the rest are parsed in a process pool.
+        """
+        results = {}
+        missing = []
+        for path in paths:
+            summary, stats = self.cached(kind, [path])
+            if stats is None:
+                results[path] = summary
+            else:
+                missing.append((path, stats))
+        self.hits += len(results)
+        self.misses += len(missing)
+
+        if missing:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                chunksize = max(len(missing) // (4 * (os.cpu_count() or 1)), 1)
+                parsed = pool.map(parse, [p for p, _ in missing], chunksize=chunksize)
+                for (path, stats), summary in zip(missing, parsed):
+                    # round trip through JSON so hits and misses look the same
+                    summary = json.loads(json.dumps(summary))
+                    self.store(kind, [path], stats, summary)
+                    results[path] = summary
+        self.db.commit()
+        return results
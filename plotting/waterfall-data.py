@@ -5,10 +5,13 @@
 # --experimenttype writescalability --threadsmin 16 --threads 128
 
 import os
-import re
 import subprocess
 from pathlib import Path
 
+import promparse
+import quantiles
+from resultsindex import ResultsIndex
+
 experimentroot = '../results'
 experiments = ['tikv-write-scalability-50GB-1KB', 'wotr-write-scalability-50GB-1KB']
 
@@ -27,54 +30,75 @@ phase_metrics = ['tikv_raftstore_store_duration_secs',
                  'tikv_raftstore_commit_log_duration_seconds',
                  'tikv_raftstore_apply_wait_time_duration_secs']
 
-def metrics_file(exp):
-    """Helper function to get metrics file path for an experiment"""
-    return f'{experimentroot}/{exp}/writescalability/0/tikv.metrics'
-
-
-def get_count(data, metric):
-    count_pattern = f'{metric}_count'
-    count_match = re.search(rf'^.*{re.escape(count_pattern)}.*\s+(\d+)$', data, re.MULTILINE)
-    if not count_match:
-        print(f"Error: Could not find {count_pattern}")
-        return 0
-    return int(count_match.group(1))
-
-def get_buckets(data, metric):
-    bucket_pattern = f"{metric}_bucket"
-    buckets = []
-    for line in data.split('\n'):
-        if bucket_pattern in line and 'Inf' not in line:
-            match = re.search(r'le="([^"]*)".*\s+(\d+)$', line)
-            if match:
-                le_value = float(match.group(1))
-                count = int(match.group(2))
-                buckets.append((le_value, count))
-
-    return buckets
-    
-def get_median_time(metric, experiment):
+tail_quantiles = [0.5, 0.95, 0.99]
+
+# summaries of unchanged metrics files are reused from earlier runs
+results_index = ResultsIndex(experimentroot)
+
+def metrics_files(exp):
+    """Metrics file of every TiKV node in an experiment (0/, 1/, 2/...)"""
+    files = quantiles.node_metrics_files(f'{experimentroot}/{exp}/writescalability')
+    if not files:
+        print(f'WARN {exp} has no metrics files')
+    return files
+
+def metrics_indexes(exp):
+    # parsed once per file, later calls hit the cache
+    return [promparse.load(f) for f in metrics_files(exp)]
+
+def get_histogram(metric, experiment):
+    """Histogram of metric merged across label sets and nodes"""
+    def compute():
+        hist = quantiles.collect(metrics_indexes(experiment), metric)
+        return [hist.buckets, hist.sum, hist.count]
+
+    buckets, total, count = results_index.lookup(f'histogram/1/{metric}', metrics_files(experiment), compute)
+    return promparse.Histogram([tuple(b) for b in buckets], total, count)
+
+def get_quantile_times(metrics, experiment, qs):
     """
-    Get histogram bucket holding the median value for a particular metric.
+    Interpolated quantiles in milliseconds, {metric: [time per q]}.
 
     Args:
-        metric (str)
+        metrics (list of str)
         experiment (str)
+        qs (list of float)
     """
-    with open(metrics_file(experiment), 'r') as f:
-        content = f.read()
+    def compute():
+        table = quantiles.quantile_table(metrics_indexes(experiment), metrics, qs)
+        return {metric: values.tolist() for metric, values in table.items()}
+
+    kind = f'quantiles/1/{",".join(metrics)}/{",".join(map(str, qs))}'
+    table = results_index.lookup(kind, metrics_files(experiment), compute)
+    result = {}
+    for metric, values in table.items():
+        if any(v != v for v in values):  # NaN: histogram missing or empty
+            print(f'WARN {experiment} {metric} quantiles not found')
+        result[metric] = [0.0 if v != v else v * 1000 for v in values]
+    return result
 
-    total_count = get_count(content, metric)
-    histogram_data = get_buckets(content, metric)
-    target = total_count // 2
+def get_median_time(metric, experiment):
+    """
+    Get the interpolated median value for a particular metric, in milliseconds.
 
-    for time, count in histogram_data:
-        if count >= target:
-            return time * 1000
+    Args:
+        metric (str)
+        experiment (str)
+    """
+    return get_quantile_times([metric], experiment, [0.5])[metric][0]
 
-    # if our histogram didn't capture enough data
-    print(f'WARN {experiment} {metric} median value not found')
-    return 0
+def write_quantile_data(experiments, outfile='raftcommit_quantiles.dat'):
+    """
+    Write p50/p95/p99 (msec) of every waterfall and phase metric for each experiment.
+    """
+    metrics = wf_metrics + phase_metrics
+    with open(outfile, 'w') as f:
+        f.write('Experiment\tMetric\t' + '\t'.join(f'p{q * 100:g}' for q in tail_quantiles) + '\n')
+        for experiment in experiments:
+            table = get_quantile_times(metrics, experiment, tail_quantiles)
+            for metric in metrics:
+                values = '\t'.join(f'{v:.6f}' for v in table[metric])
+                f.write(f'{experiment}\t{metric}\t{values}\n')
 
 def run_gnuplot(script):
     try:
@@ -223,24 +247,23 @@ if __name__ == "__main__":
                 name = "XLL"
             f.write(f'{name.upper()}')
             prev = 0.0
+            medians = get_quantile_times(wf_metrics + phase_metrics, experiment, [0.5])
             for metric in wf_metrics:
-                time = get_median_time(metric, experiment)
+                time = medians[metric][0]
                 f.write(f'\t{time - prev:.6f}')
                 prev = time
 
             # phase metrics CDFs
             for metric in phase_metrics:
-#                for experiment in experiments:
-                with open(metrics_file(experiment), 'r') as fmetrics:
-                    content = fmetrics.read()
-                    
-                    count = get_count(content, metric)
-                    buckets = get_buckets(content, metric)
-                    median = get_median_time(metric, experiment)
-                    if 'apply' in metric:
-                        f.write(f'\t{median}')
-                        
-                    write_cdf_data(buckets, count, metric, experiment.split('-')[0])
+                hist = get_histogram(metric, experiment)
+                buckets = [(le, c) for le, c in hist.buckets if le != float('inf')]
+                median = medians[metric][0]
+                if 'apply' in metric:
+                    f.write(f'\t{median}')
+
+                write_cdf_data(buckets, hist.count, metric, experiment.split('-')[0])
             f.write('\n')
 
+    write_quantile_data(experiments)
+    results_index.close()
     generate_multiplot()
@@ -0,0 +1,280 @@
+#!/usr/bin/python
+"""
+Write amplification and dedup savings of every experiment in results/.
+
+For each set of TiKV metrics files (results/<experiment>/<type>/<n>/tikv-<tag>.metrics,
+one set per tag, i.e. per writescalability point) the bytes the storage
+engines wrote are summed over the nodes:
+- kv:   RocksDB kv WAL, flush and compaction bytes
+- raft: raft log bytes, either the raft RocksDB (WAL, flush, compaction)
+        or raft-engine (raft_engine_write_size)
+and divided by the logical bytes the clients wrote (INSERT/UPDATE counts
+of the matching go-ycsb logs times the value size). Where the experiment
+has disk samples (disk-phases.csv, disk_measurement), the bytes the
+devices wrote are reported next to it.
+
+Dedup savings compare a system to the baseline system (tikv) on the same
+experiment, size and value size, following the <system>-<experiment>
+naming in the README: 1 - write_amp / baseline write_amp.
+
+    ./writeamp.py table --results ../results --out ../dot-dat/writeamp.csv
+    ./writeamp.py plot --table ../dot-dat/writeamp.csv --experiment ycsb-100GB-16KB \\
+        --out ../graphs/writeamp-ycsb-100GB-16KB.pdf
+
+Engine counters are cumulative since TiKV started, so with --dataset_cache
+the load is not part of a ycsb experiment's engine bytes, but it is part
+of its logical bytes only if it was loaded in that run.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import subprocess
+import sys
+
+import numpy as np
+
+import promparse
+import quantiles
+from resultsindex import ResultsIndex
+from ycsbresults import expdir_re, find_logs, parse_logs
+
+# bump when components or the way they are summed changes
+engine_kind = 'writeamp-engine/1'
+
+# component -> (metric, labels); counters are summed over matching label sets and nodes
+components = {
+    'kv_wal': ('tikv_engine_flow_bytes', {'db': 'kv', 'type': 'wal_file_bytes'}),
+    'kv_flush': ('tikv_engine_flow_bytes', {'db': 'kv', 'type': 'flush_write_bytes'}),
+    'kv_compaction': ('tikv_engine_compaction_flow_bytes', {'db': 'kv', 'type': 'bytes_written'}),
+    'raft_wal': ('tikv_engine_flow_bytes', {'db': 'raft', 'type': 'wal_file_bytes'}),
+    'raft_flush': ('tikv_engine_flow_bytes', {'db': 'raft', 'type': 'flush_write_bytes'}),
+    'raft_compaction': ('tikv_engine_compaction_flow_bytes', {'db': 'raft', 'type': 'bytes_written'}),
+}
+# raft-engine only exports the size of its writes as a histogram
+raft_engine_metric = 'raft_engine_write_size'
+kv_columns = ['kv_wal', 'kv_flush', 'kv_compaction']
+raft_columns = ['raft_wal', 'raft_flush', 'raft_compaction', 'raft_engine']
+write_ops = ('INSERT', 'UPDATE', 'READ_MODIFY_WRITE', 'BATCH_INSERT')
+metrics_re = re.compile(r'^tikv(?:-(?P<tag>.+))?\.metrics$')
+
+columns = (['experiment', 'system', 'experimenttype', 'tag', 'logical_bytes'] + kv_columns + raft_columns +
+           ['kv_bytes', 'raft_bytes', 'engine_bytes', 'write_amp', 'kv_write_amp', 'raft_write_amp',
+            'raft_share', 'device_bytes', 'device_write_amp', 'dedup_savings', 'device_dedup_savings'])
+
+
+def find_metrics(results):
+    """{(experiment, experimenttype, tag): [metrics file per node]}"""
+    sets = {}
+    for path in glob.glob(os.path.join(results, '*', '*', '[0-9]*', 'tikv*.metrics')):
+        m = metrics_re.match(os.path.basename(path))
+        if not m:
+            continue
+        typedir = os.path.dirname(os.path.dirname(path))
+        experiment = os.path.basename(os.path.dirname(typedir))
+        key = (experiment, os.path.basename(typedir), m.group('tag') or '')
+        sets.setdefault(key, []).append(path)
+    return {key: sorted(paths, key=lambda p: int(os.path.basename(os.path.dirname(p))))
+            for key, paths in sorted(sets.items())}
+
+
+def engine_bytes(paths):
+    """Bytes written per component, summed over the nodes' metrics files."""
+    indexes = [promparse.load(p) for p in paths]
+    values = {}
+    for name, (metric, labels) in components.items():
+        values[name] = sum(value for index in indexes
+                           for key, value in index.samples.get(metric, {}).items()
+                           if quantiles.matches(key, labels))
+    values['raft_engine'] = quantiles.collect(indexes, raft_engine_metric).sum
+    return values
+
+
+def value_bytes(experiment):
+    m = expdir_re.match(experiment)
+    return int(m.group('vsize')[:-2]) * 1024 if m else 0
+
+
+def system_of(experiment):
+    return experiment.split('-', 1)[0]
+
+
+def logical_bytes(rows, experiment, experimenttype, tag):
+    """
+    Bytes written by the clients for one metrics set. A numeric tag is
+    the total thread count of a fresh-cluster point (writescalability),
+    so only the load with that many threads counts; otherwise every load
+    and run of the directory does. Without a shard plan the total is
+    guessed from the per-client count in the log names.
+    """
+    mine = [r for r in rows if r['experiment'] == experiment and r['experimenttype'] == experimenttype]
+    if tag.isdigit() and int(tag) > 0:
+        loads = [r for r in mine if r['phase'] == 'load']
+        if any(r['total_threads'] != '' for r in loads):
+            mine = [r for r in loads if r['total_threads'] != '' and int(r['total_threads']) == int(tag)]
+        else:
+            nclients = len({r['client'] for r in loads}) or 1
+            mine = [r for r in loads if int(r['threads']) * nclients == int(tag)]
+        if not mine:
+            print(f'WARN no load with {tag} threads in {experiment}/{experimenttype}, logical bytes unknown')
+    count = sum(r.get('count', 0.0) for r in mine if r['op'] in write_ops)
+    return count * value_bytes(experiment)
+
+
+def device_bytes(results, experiment, experimenttype):
+    """Bytes the devices wrote during load and run phases (disk-phases.csv), NaN without samples."""
+    path = os.path.join(results, experiment, experimenttype, 'disk-phases.csv')
+    if not os.path.exists(path):
+        return float('nan')
+    with open(path, newline='') as f:
+        return float(sum(int(r['write_bytes']) for r in csv.DictReader(f)
+                         if r['node'] == 'all' and r['source'] == 'dev'))
+
+
+def build_table(results, baseline='tikv', use_index=True):
+    sets = find_metrics(results)
+    logs = parse_logs(find_logs(results), results, use_index=use_index)
+    index = ResultsIndex(results) if use_index else None
+
+    keys = list(sets)
+    engine = np.zeros((len(keys), len(kv_columns) + len(raft_columns)))
+    logical = np.zeros(len(keys))
+    device = np.zeros(len(keys))
+    for i, key in enumerate(keys):
+        paths = sets[key]
+        values = index.lookup(engine_kind, paths, lambda: engine_bytes(paths)) if index else engine_bytes(paths)
+        engine[i] = [values[c] for c in kv_columns + raft_columns]
+        logical[i] = logical_bytes(logs, *key)
+        device[i] = device_bytes(results, key[0], key[1])
+    if index:
+        index.close()
+
+    # every ratio for all experiments at once; 0 logical bytes -> NaN
+    kv = engine[:, :len(kv_columns)].sum(axis=1)
+    raft = engine[:, len(kv_columns):].sum(axis=1)
+    total = kv + raft
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_logical = np.where(logical > 0, 1.0 / logical, np.nan)
+        wa = total * per_logical
+        device_wa = device * per_logical
+        raft_share = np.where(total > 0, raft / total, np.nan)
+
+        # row of the baseline system's run of the same experiment, -1 if there is none
+        position = {key: i for i, key in enumerate(keys)}
+        base = np.array([position.get((f'{baseline}-{e.split("-", 1)[-1]}', t, g), -1) for e, t, g in keys], dtype=int)
+        has_base = base >= 0
+        savings = np.where(has_base, 1.0 - wa / wa[np.maximum(base, 0)], np.nan)
+        device_savings = np.where(has_base, 1.0 - device_wa / device_wa[np.maximum(base, 0)], np.nan)
+
+    rows = []
+    for i, (experiment, experimenttype, tag) in enumerate(keys):
+        row = dict(zip(kv_columns + raft_columns, engine[i]),
+                   experiment=experiment, system=system_of(experiment), experimenttype=experimenttype, tag=tag,
+                   logical_bytes=logical[i], kv_bytes=kv[i], raft_bytes=raft[i], engine_bytes=total[i],
+                   write_amp=wa[i], kv_write_amp=kv[i] * per_logical[i], raft_write_amp=raft[i] * per_logical[i],
+                   raft_share=raft_share[i], device_bytes=device[i], device_write_amp=device_wa[i],
+                   dedup_savings=savings[i], device_dedup_savings=device_savings[i])
+        rows.append(row)
+    return rows
+
+
+ratio_columns = {'write_amp', 'kv_write_amp', 'raft_write_amp', 'raft_share', 'device_write_amp',
+                 'dedup_savings', 'device_dedup_savings'}
+
+
+def fmt(column, value):
+    if isinstance(value, str):
+        return value
+    if value != value:
+        return ''
+    return f'{value:.4f}' if column in ratio_columns else f'{value:.0f}'
+
+
+def write_table(rows, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([fmt(c, row[c]) for c in columns])
+
+
+def read_table(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def run_gnuplot(script):
+    try:
+        subprocess.run(['gnuplot'], input=script, text=True, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error running gnuplot: {e}")
+        print(f"gnuplot stderr: {e.stderr}")
+    except FileNotFoundError:
+        print("Error: gnuplot not found. Please install gnuplot.")
+
+
+def plot(rows, experiment, out, systems, titles):
+    """
+    Stacked bars of kv and raft write amplification for each system's run of
+    <system>-<experiment>, with the dedup savings above each bar.
+    """
+    datafile = os.path.splitext(out)[0] + '.dat'
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(datafile, 'w') as f:
+        f.write('System\tKV\tRaft\tSavings\n')
+        for system, title in zip(systems, titles):
+            found = [r for r in rows if r['experiment'] == f'{system}-{experiment}' and r['tag'] in ('', '0')]
+            if not found:
+                print(f'WARN no metrics for {system}-{experiment}')
+                continue
+            r = found[0]
+            savings = f'{float(r["dedup_savings"]) * 100:.0f}%' if r['dedup_savings'] else '-'
+            f.write(f'"{title}"\t{r["kv_write_amp"] or 0}\t{r["raft_write_amp"] or 0}\t{savings}\n')
+
+    script = f'''set terminal pdf size 3.7in,2.4in
+    set output "{out}"
+    set ylabel "Bytes written / logical byte"
+    set yrange [0:*]
+    set key autotitle columnheader
+    set key top right
+    set style data histograms
+    set style histogram rowstacked
+    set boxwidth 0.5
+    set style fill pattern border -1
+
+    plot '{datafile}' using 2:xtic(1) ls 2, \\
+    '' using 3 ls 3, \\
+    '' using 0:($2 + $3):4 with labels offset 0,0.7 notitle
+    '''
+    run_gnuplot(script)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    t = sub.add_parser('table', help='write amplification of every metrics set under results/')
+    t.add_argument('--results', default='../results')
+    t.add_argument('--out', default='../dot-dat/writeamp.csv')
+    t.add_argument('--baseline', default='tikv', help='system the dedup savings are relative to (tikv)')
+    t.add_argument('--no-index', dest='use_index', action='store_false',
+                   help='parse every file even if it is unchanged since the last run')
+
+    p = sub.add_parser('plot', help='kv/raft write amplification per system for one experiment')
+    p.add_argument('--table', default='../dot-dat/writeamp.csv')
+    p.add_argument('--experiment', required=True, help='experiment without the system, e.g. ycsb-100GB-16KB')
+    p.add_argument('--systems', default='tikv,xllso,xll')
+    p.add_argument('--titles', default='TiKV,XLL-SO,XLL')
+    p.add_argument('--out', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'table':
+        rows = build_table(args.results, args.baseline, args.use_index)
+        write_table(rows, args.out)
+        print(f'wrote {len(rows)} rows to {args.out}', file=sys.stderr)
+    else:
+        plot(read_table(args.table), args.experiment, args.out,
+             args.systems.split(','), args.titles.split(','))
@@ -0,0 +1,255 @@
+#!/usr/bin/python
+"""
+Collect go-ycsb results from the results tree into one tidy table.
+
+tikv-ycsb.py writes client logs as
+    results/<name>-<size>-<vsize>/<experimenttype>/run_<w>_threads_<t>_client_<c>.ycsb
+    results/<name>-<size>-<vsize>/<experimenttype>/load_threads_<t>_client_<c>.ycsb
+    results/<name>-<size>-<vsize>/openloop/run_<w>_threads_<t>_target_<rate>_client_<c>.ycsb
+where <t> is the number of threads client <c> ran. The last summary line
+for each operation type in a log is its result (the same line
+`awk ... | tail -n1` picks in the plot scripts).
+
+Threads that do not divide evenly over the clients give them different
+<t>s. Where a shard-plan.json says which logs belong to one run, every
+row of that run gets threads = total // clients, the count an even split
+would have given, and total_threads = total; without a plan threads is
+the <t> of the file name and total_threads is empty.
+
+`table` walks results/ once, parses every new or changed log in a
+process pool (unchanged ones come from results-index.sqlite) and writes
+a CSV with one row per client plus one row per experiment point with
+client=all (throughput summed over clients, latencies averaged weighted
+by operation count). The plot scripts then read their .dat columns from
+that CSV with `clients` and `total` instead of running awk on every
+log:
+
+    ./ycsbresults.py table --results ../results --out ../dot-dat/ycsb.csv
+    ./ycsbresults.py clients --table ../dot-dat/ycsb.csv --dir read-scalability-100GB-1KB/ycsb \\
+        --phase run --workload c --threads 4:64:4
+    ./ycsbresults.py total --table ../dot-dat/ycsb.csv --dir ycsb-20GB-1KB/ycsb \\
+        --threads 64 --workloads load,a,b
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from resultsindex import ResultsIndex
+
+# the go-ycsb log parser and the shard plans live with tikv-ycsb.py, one directory up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shard import log_names, read_plans
+from ycsblog import parse_summary
+
+# bump when parse_summary changes so cached summaries are re-parsed
+summary_kind = 'ycsb-summary/1'
+
+filename_re = re.compile(r'^(?P<phase>run|load)(?:_(?P<workload>[a-z]))?'
+                         r'_threads_(?P<threads>\d+)(?:_target_(?P<target>\d+))?_client_(?P<client>\d+)\.ycsb$')
+expdir_re = re.compile(r'^(?P<name>.+)-(?P<dbsize>\d+GB)-(?P<vsize>\d+KB)$')
+latency_columns = ['avg_us', 'min_us', 'max_us', 'p50_us', 'p90_us', 'p95_us',
+                   'p99_us', 'p999_us', 'p9999_us']
+key_columns = ['experiment', 'name', 'dbsize', 'vsize', 'experimenttype',
+               'phase', 'workload', 'threads', 'total_threads', 'target', 'client', 'op']
+columns = key_columns + ['takes', 'count', 'ops'] + latency_columns
+
+
+def planned_runs(typedir):
+    """{log name: (total threads, clients)} from a directory's shard-plan.json."""
+    path = os.path.join(typedir, 'shard-plan.json')
+    if not os.path.exists(path):
+        return {}
+    runs = {}
+    for label, shards in read_plans(path).items():
+        for name in log_names(label, shards):
+            runs[name] = (sum(s.threads for s in shards), len(shards))
+    return runs
+
+
+def find_logs(results):
+    """(path, key fields) for every ycsb log under results/<experiment>/<experimenttype>/."""
+    logs = []
+    for experiment in sorted(os.listdir(results)):
+        expdir = os.path.join(results, experiment)
+        if not os.path.isdir(expdir):
+            continue
+        m = expdir_re.match(experiment)
+        naming = m.groupdict() if m else {'name': experiment, 'dbsize': '', 'vsize': ''}
+        for experimenttype in sorted(os.listdir(expdir)):
+            typedir = os.path.join(expdir, experimenttype)
+            if not os.path.isdir(typedir):
+                continue
+            runs = planned_runs(typedir)
+            for filename in sorted(os.listdir(typedir)):
+                fm = filename_re.match(filename)
+                if not fm:
+                    continue
+                threads, total = int(fm.group('threads')), ''
+                if filename[:-len('.ycsb')] in runs:
+                    total, nclients = runs[filename[:-len('.ycsb')]]
+                    threads = total // nclients
+                keys = dict(naming, experiment=experiment, experimenttype=experimenttype,
+                            phase=fm.group('phase'), workload=fm.group('workload') or '',
+                            threads=threads, total_threads=total, target=fm.group('target') or '',
+                            client=fm.group('client'))
+                logs.append((os.path.join(typedir, filename), keys))
+    return logs
+
+
+def parse_logs(logs, results, jobs=None, use_index=True):
+    """Summaries of every (path, keys) log as per-client rows, parsed in parallel."""
+    paths = [p for p, _ in logs]
+    if use_index:
+        index = ResultsIndex(results)
+        summaries = index.lookup_many(paths, summary_kind, parse_summary, jobs)
+        print(f'{index.hits} logs unchanged, {index.misses} parsed', file=sys.stderr)
+        index.close()
+    elif paths:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(len(paths) // (4 * (os.cpu_count() or 1)), 1)
+            summaries = dict(zip(paths, pool.map(parse_summary, paths, chunksize=chunksize)))
+    else:
+        summaries = {}
+    return [dict(keys, op=op, **values) for path, keys in logs
+            for op, values in summaries[path].items()]
+
+
+def aggregate(rows):
+    """One client=all row per experiment point: ops and counts summed, latencies count-weighted."""
+    groups = {}
+    for row in rows:
+        key = tuple(row.get(c, '') for c in key_columns if c != 'client')
+        groups.setdefault(key, []).append(row)
+
+    totals = []
+    for key, group in groups.items():
+        total = dict(zip([c for c in key_columns if c != 'client'], key), client='all')
+        total['takes'] = max(r.get('takes', 0.0) for r in group)
+        total['count'] = sum(r.get('count', 0.0) for r in group)
+        total['ops'] = sum(r.get('ops', 0.0) for r in group)
+        for c in latency_columns:
+            present = [r for r in group if c in r]
+            if not present:
+                continue
+            weight = sum(r.get('count', 0.0) for r in present)
+            if c == 'min_us':
+                total[c] = min(r[c] for r in present)
+            elif c == 'max_us':
+                total[c] = max(r[c] for r in present)
+            elif weight > 0:
+                total[c] = sum(r[c] * r.get('count', 0.0) for r in present) / weight
+            else:
+                total[c] = sum(r[c] for r in present) / len(present)
+        totals.append(total)
+    return totals
+
+
+def build_table(results, jobs=None, use_index=True):
+    rows = parse_logs(find_logs(results), results, jobs, use_index)
+    return rows + aggregate(rows)
+
+
+def write_table(rows, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_table(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def select(rows, directory, phase, workload, op='TOTAL'):
+    """
+    Rows of one results directory for a phase/workload, keyed by (threads, client).
+    directory is <experiment>/<experimenttype>, optionally prefixed by the results path.
+    """
+    experiment, experimenttype = directory.rstrip('/').split('/')[-2:]
+    found = {}
+    for row in rows:
+        if row['experiment'] == experiment and row['experimenttype'] == experimenttype and \
+           row['phase'] == phase and row['workload'] == workload and row['op'] == op:
+            found[(int(row['threads']), row['client'])] = row
+    return found
+
+
+def thread_range(spec):
+    """'4:64:4' -> [4, 8, ..., 64]; '32' -> [32]"""
+    parts = [int(p) for p in spec.split(':')]
+    if len(parts) == 1:
+        return parts
+    step = parts[2] if len(parts) > 2 else 1
+    return list(range(parts[0], parts[1] + 1, step))
+
+
+def print_clients(args, rows):
+    """
+    For each thread count: ops of every client, then latency of every client
+    (client order 0..n-1), averaged over --dir repetitions. Thread counts
+    missing for any client are skipped, as the awk scripts did.
+    """
+    selected = [select(rows, d, args.phase, args.workload, args.op) for d in args.dir]
+    for threads in thread_range(args.threads):
+        ops = []
+        latency = []
+        for client in range(args.clients):
+            found = [s[(threads, str(client))] for s in selected if (threads, str(client)) in s]
+            if not found:
+                break
+            ops.append(sum(float(r['ops'] or 0) for r in found) / len(found))
+            latency.append(sum(float(r[args.latency] or 0) for r in found) / len(found))
+        else:
+            print(' '.join(f'{v:g}' for v in ops + latency))
+
+
+def print_total(args, rows):
+    """Ops summed over clients for each workload ('load' for the load phase), one per line."""
+    for workload in args.workloads.split(','):
+        phase, w = ('load', '') if workload == 'load' else ('run', workload)
+        row = select(rows, args.dir[0], phase, w, args.op).get((int(args.threads), 'all'))
+        print(f'{float(row["ops"]):g}' if row else 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    t = sub.add_parser('table', help='parse every ycsb log under results/ into a CSV')
+    t.add_argument('--results', default='../results')
+    t.add_argument('--out', default='../dot-dat/ycsb.csv')
+    t.add_argument('-j', '--jobs', type=int, default=None, help='parser processes (all CPUs default)')
+    t.add_argument('--no-index', dest='use_index', action='store_false',
+                   help='parse every log even if it is unchanged since the last run')
+
+    for cmd, helptext in [('clients', 'per-client ops and latency columns over a thread range'),
+                          ('total', 'ops summed over clients for a list of workloads')]:
+        p = sub.add_parser(cmd, help=helptext)
+        p.add_argument('--table', default='../dot-dat/ycsb.csv')
+        p.add_argument('--dir', action='append', required=True,
+                       help='[results/]<experiment>/<experimenttype>, repeat to average repeated runs')
+        p.add_argument('--threads', required=True, help='thread count or min:max:step range')
+        p.add_argument('--op', default='TOTAL', help='operation type (TOTAL default)')
+        if cmd == 'clients':
+            p.add_argument('--phase', default='run')
+            p.add_argument('--workload', default='')
+            p.add_argument('--clients', type=int, default=2)
+            p.add_argument('--latency', default='p50_us', help='latency column (p50_us default)')
+        else:
+            p.add_argument('--workloads', required=True, help="comma-separated, 'load' for the load phase")
+
+    args = parser.parse_args()
+    if args.command == 'table':
+        rows = build_table(args.results, args.jobs, args.use_index)
+        write_table(rows, args.out)
+        print(f'wrote {len(rows)} rows to {args.out}', file=sys.stderr)
+    elif args.command == 'clients':
+        print_clients(args, read_table(args.table))
+    elif args.command == 'total':
+        print_total(args, read_table(args.table))
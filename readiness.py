@@ -0,0 +1,111 @@
+"""
+Readiness probes for the PD and TiKV services started by tikv-ycsb.py.
+
+Rather than sleeping for a fixed amount of time after starting a
+service, we poll its HTTP endpoints until it reports healthy:
+- PD: the client URL answers /pd/api/v1/health with every member healthy.
+- TiKV: each status-addr answers /status, and PD lists every store as Up.
+
+Everything here only speaks HTTP, so it can be exercised against a
+local fake status server.
+"""
+
+import json
+import time
+import urllib.error
+import urllib.request
+
+
+class NotReadyError(Exception):
+    """Raised when a service does not become ready before the timeout."""
+
+
+def http_get(url, timeout=2.0):
+    """Return (status, body) for a GET request, or (None, '') if unreachable."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, resp.read().decode('utf-8', errors='replace')
+    except urllib.error.HTTPError as e:
+        return e.code, ''
+    except (urllib.error.URLError, OSError, ValueError):
+        return None, ''
+
+
+def wait_until(probe, what, timeout=120.0, delay=0.1, max_delay=2.0):
+    """
+    Call probe() until it returns True, backing off exponentially between
+    attempts. Raise NotReadyError with the last probe message on timeout.
+
+    probe returns either a bool or a (bool, message) tuple.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    message = ''
+    while True:
+        res = probe()
+        ok, message = res if isinstance(res, tuple) else (res, message)
+        if ok:
+            print(f'{what} ready after {time.monotonic() - start:.2f}s')
+            return time.monotonic() - start
+
+        now = time.monotonic()
+        if now >= deadline:
+            raise NotReadyError(f'{what} not ready after {timeout:.0f}s: {message}')
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, max_delay)
+
+
+def pd_healthy(pd_url):
+    status, body = http_get(f'{pd_url}/pd/api/v1/health')
+    if status != 200:
+        return False, f'{pd_url} health returned {status}'
+    try:
+        members = json.loads(body)
+    except ValueError:
+        members = None
+    if not isinstance(members, list) or not all(isinstance(m, dict) for m in members):
+        return False, f'{pd_url} returned malformed health response'
+    sick = [m.get('name', '?') for m in members if not m.get('health')]
+    if not members or sick:
+        return False, f'unhealthy PD members: {sick}'
+    return True, ''
+
+
+def tikv_status_ok(status_url):
+    status, _ = http_get(f'{status_url}/status')
+    return status == 200, f'{status_url}/status returned {status}'
+
+
+def stores_up(pd_url, store_addrs):
+    """Check that PD reports a store in state Up for every address in store_addrs."""
+    status, body = http_get(f'{pd_url}/pd/api/v1/stores')
+    if status != 200:
+        return False, f'{pd_url} stores returned {status}'
+    try:
+        stores = json.loads(body).get('stores') or []
+    except (ValueError, AttributeError):
+        return False, f'{pd_url} returned malformed stores response'
+
+    states = {s['store'].get('address'): s['store'].get('state_name')
+              for s in stores if 'store' in s}
+    missing = [a for a in store_addrs if states.get(a) != 'Up']
+    if missing:
+        return False, 'stores not up: ' + ', '.join(f'{a}={states.get(a)}' for a in missing)
+    return True, ''
+
+
+def wait_for_pd(pd_url, timeout=120.0):
+    return wait_until(lambda: pd_healthy(pd_url), f'PD {pd_url}', timeout)
+
+
+def wait_for_tikv(pd_url, status_urls, store_addrs, timeout=120.0):
+    """Wait until every TiKV status port answers and PD reports all stores Up."""
+    start = time.monotonic()
+    for url in status_urls:
+        remaining = max(timeout - (time.monotonic() - start), 0.0)
+        wait_until(lambda: tikv_status_ok(url), f'TiKV {url}', remaining)
+
+    remaining = max(timeout - (time.monotonic() - start), 0.0)
+    wait_until(lambda: stores_up(pd_url, store_addrs),
+               f'{len(store_addrs)} TiKV stores', remaining)
+    return time.monotonic() - start
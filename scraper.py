@@ -0,0 +1,318 @@
+#!/usr/bin/python
+"""
+Background scraper for TiKV /metrics endpoints.
+
+While YCSB is running we poll every TiKV status port at a fixed
+interval and append the samples to one time-series file per node.
+
+File format (all integers little-endian):
+    b'TKTS1\\n'
+    records of [kind: 1 byte][length: u32][payload]
+      kind b'S': newline separated series names (name{labels}), appended
+                 to the series table in order of first appearance.
+      kind b'B': zlib compressed block of consecutive scrapes:
+                 u32 ntimes, u32 nseries, float64[ntimes] timestamps, then
+                 one column per series: u8 mode followed by ntimes deltas
+                 (mode 0: int64, mode 1: float64).
+
+Every column is delta encoded against the series' previous value (across
+block boundaries), so idle counters and histogram buckets compress to
+almost nothing. Memory is bounded by one block of samples per node.
+
+Query from the command line with:
+    ./scraper.py query results/.../0/tikv.tsdb tikv_grpc_msg_duration_seconds --quantile 0.99
+"""
+
+import argparse
+import http.client
+import math
+import re
+import struct
+import sys
+import threading
+import time
+import urllib.request
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+MAGIC = b'TKTS1\n'
+BLOCK_TICKS = 60
+
+# name{labels} value [timestamp]
+sample_re = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{.*\})?)\s+(\S+)')
+label_re = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_exposition(text, prefixes=None):
+    """Return {series: value} for every sample line in a Prometheus text exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line[0] == '#':
+            continue
+        m = sample_re.match(line)
+        if not m:
+            continue
+        series = m.group(1)
+        if prefixes and not series.startswith(prefixes):
+            continue
+        try:
+            value = float(m.group(2))
+        except ValueError:
+            continue
+        # NaN would poison every later delta of the series
+        if math.isfinite(value):
+            samples[series] = value
+    return samples
+
+
+def split_series(series):
+    """'name{a="b"}' -> ('name', {'a': 'b'})"""
+    brace = series.find('{')
+    if brace < 0:
+        return series, {}
+    return series[:brace], dict(label_re.findall(series[brace:]))
+
+
+class SeriesWriter:
+    """Appends scrapes for one node to a time-series file."""
+
+    def __init__(self, path, block_ticks=BLOCK_TICKS):
+        self.f = open(path, 'wb')
+        self.f.write(MAGIC)
+        self.block_ticks = block_ticks
+        self.index = {}
+        self.names = []
+        self.last = []
+        self.times = []
+        self.rows = []
+
+    def append(self, timestamp, samples):
+        new = [s for s in samples if s not in self.index]
+        if new:
+            for s in new:
+                self.index[s] = len(self.names)
+                self.names.append(s)
+                self.last.append(0.0)
+            self._record(b'S', '\n'.join(new).encode())
+
+        self.times.append(timestamp)
+        self.rows.append(samples)
+        if len(self.times) >= self.block_ticks:
+            self.flush()
+
+    def flush(self):
+        if not self.times:
+            return
+        ntimes, nseries = len(self.times), len(self.names)
+        parts = [struct.pack('<II', ntimes, nseries), array('d', self.times).tobytes()]
+        for i, name in enumerate(self.names):
+            prev = self.last[i]
+            values = []
+            for row in self.rows:
+                # a series missing from a scrape keeps its previous value
+                prev = row.get(name, prev)
+                values.append(prev)
+            deltas = [b - a for a, b in zip([self.last[i]] + values[:-1], values)]
+            self.last[i] = prev
+            # the first delta is against the previous block, so check the deltas, not the values
+            if all(d.is_integer() and abs(d) < 2 ** 62 for d in deltas):
+                parts.append(b'\x00' + array('q', map(int, deltas)).tobytes())
+            else:
+                parts.append(b'\x01' + array('d', deltas).tobytes())
+        self._record(b'B', zlib.compress(b''.join(parts), 6))
+        self.times = []
+        self.rows = []
+
+    def _record(self, kind, payload):
+        self.f.write(kind + struct.pack('<I', len(payload)) + payload)
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+class TimeSeries:
+    """
+    A time-series file loaded into memory: names, timestamps and one value
+    column per series. Pass prefixes to only keep the series you will query.
+    """
+
+    def __init__(self, path, prefixes=None):
+        self.prefixes = tuple(prefixes) if prefixes else None
+        self.names = []
+        self.times = array('d')
+        self.columns = {}
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a metrics time-series file')
+            while header := f.read(5):
+                kind, length = header[:1], struct.unpack('<I', header[1:])[0]
+                payload = f.read(length)
+                if kind == b'S':
+                    self.names.extend(payload.decode().split('\n'))
+                elif kind == b'B':
+                    self._load_block(zlib.decompress(payload))
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def _load_block(self, block):
+        ntimes, nseries = struct.unpack_from('<II', block)
+        offset = 8
+        self.times.extend(array('d', block[offset:offset + 8 * ntimes]))
+        offset += 8 * ntimes
+        for i in range(nseries):
+            mode = block[offset]
+            start = offset + 1
+            offset = start + 8 * ntimes
+            if self.prefixes and not self.names[i].startswith(self.prefixes):
+                continue
+            if i not in self.columns:
+                # series that first appeared in this block were 0 before it
+                self.columns[i] = array('d', bytes(8 * (len(self.times) - ntimes)))
+            column = self.columns[i]
+            prev = column[-1] if column else 0.0
+            for d in array('q' if mode == 0 else 'd', block[start:offset]):
+                prev += d
+                column.append(prev)
+
+    def matching(self, metric, labels=None):
+        """Indices of series named exactly metric whose labels include labels."""
+        labels = labels or {}
+        found = []
+        for i, series in enumerate(self.names):
+            name, serieslabels = split_series(series)
+            if i in self.columns and name == metric and \
+               all(serieslabels.get(k) == v for k, v in labels.items()):
+                found.append(i)
+        return found
+
+    def summed(self, metric, labels=None):
+        """Per-scrape sum of every matching series."""
+        total = [0.0] * len(self.times)
+        for i in self.matching(metric, labels):
+            total = [a + b for a, b in zip(total, self.columns[i])]
+        return total
+
+    def interval_rate(self, metric, labels=None):
+        """[(end time, increase per second)] for each scrape interval of a counter."""
+        values = self.summed(metric, labels)
+        rates = []
+        for j in range(1, len(self.times)):
+            dt = self.times[j] - self.times[j - 1]
+            rates.append((self.times[j], (values[j] - values[j - 1]) / dt if dt > 0 else 0.0))
+        return rates
+
+    def interval_quantile(self, metric, q, labels=None):
+        """
+        [(end time, quantile)] of a histogram over each scrape interval,
+        interpolating linearly inside the bucket like histogram_quantile().
+        """
+        bybound = {}
+        for i in self.matching(f'{metric}_bucket', labels):
+            le = split_series(self.names[i])[1].get('le')
+            column = bybound.setdefault(float(le), [0.0] * len(self.times))
+            for j, v in enumerate(self.columns[i]):
+                column[j] += v
+        bounds = sorted(bybound)
+
+        result = []
+        for j in range(1, len(self.times)):
+            counts = [bybound[b][j] - bybound[b][j - 1] for b in bounds]
+            result.append((self.times[j], bucket_quantile(q, bounds, counts)))
+        return result
+
+
+def bucket_quantile(q, bounds, cumulative):
+    """Quantile from cumulative bucket counts (bounds sorted, last may be +Inf)."""
+    if not bounds or cumulative[-1] <= 0:
+        return math.nan
+    rank = q * cumulative[-1]
+    for k, (bound, count) in enumerate(zip(bounds, cumulative)):
+        if count >= rank:
+            if math.isinf(bound):
+                return bounds[k - 1] if k > 0 else math.nan
+            lower = bounds[k - 1] if k > 0 else 0.0
+            below = cumulative[k - 1] if k > 0 else 0.0
+            inbucket = count - below
+            if inbucket <= 0:
+                return bound
+            return lower + (bound - lower) * (rank - below) / inbucket
+    return bounds[-1]
+
+
+class MetricsScraper:
+    """
+    Poll a set of /metrics URLs every interval seconds on a background
+    thread, writing one time-series file per URL.
+    """
+
+    def __init__(self, urls, paths, interval=5.0, prefixes=None, timeout=10.0):
+        self.urls = urls
+        self.writers = [SeriesWriter(p) for p in paths]
+        self.interval = interval
+        self.prefixes = tuple(prefixes) if prefixes else None
+        self.timeout = timeout
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.pool = ThreadPoolExecutor(max_workers=max(len(urls), 1))
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.pool.shutdown()
+        for w in self.writers:
+            w.close()
+
+    def scrape(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                return parse_exposition(resp.read().decode('utf-8', errors='replace'), self.prefixes)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            # a TiKV restarting mid-response cuts it short or garbles it; skip this tick
+            print(f'WARN scrape {url} failed: {e!r}')
+            return None
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            now = time.time()
+            for writer, samples in zip(self.writers, self.pool.map(self.scrape, self.urls)):
+                if samples is not None:
+                    writer.append(now, samples)
+            next_tick += self.interval
+            self.stopped.wait(max(next_tick - time.monotonic(), 0))
+
+
+def query(args):
+    ts = TimeSeries(args.file, [args.metric])
+    labels = dict(l.split('=', 1) for l in args.label)
+    if args.quantile is not None:
+        rows = ts.interval_quantile(args.metric, args.quantile, labels)
+        print(f'time\tp{args.quantile * 100:g}')
+    else:
+        rows = ts.interval_rate(f'{args.metric}_count' if ts.matching(f'{args.metric}_count', labels)
+                                else args.metric, labels)
+        print('time\tper_second')
+    start = ts.times[0] if ts.times else 0.0
+    for t, v in rows:
+        print(f'{t - start:.1f}\t{v:.6f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    q = sub.add_parser('query', help='per-interval rate or quantile of one metric')
+    q.add_argument('file')
+    q.add_argument('metric')
+    q.add_argument('--quantile', type=float, default=None,
+                   help='histogram quantile (e.g. 0.99) instead of a per-second rate')
+    q.add_argument('--label', action='append', default=[],
+                   help='label filter key=value, may be repeated')
+    args = parser.parse_args()
+    if args.command == 'query':
+        query(args)
+    sys.exit(0)
@@ -0,0 +1,88 @@
+"""
+Splitting a go-ycsb run across client nodes.
+
+Threads are divided in proportion to each client's core count (every
+client gets at least one), and records, operations and an open-loop
+target rate in proportion to the threads, so all clients finish at about
+the same time and every thread is paced alike. Every split uses the
+largest remainder method, so the parts always add up to the total: 64
+threads on three equal clients run as 22 + 21 + 21, not 3 x 21.
+
+A run is labelled by its total thread count (run_a_threads_64), and each
+client's go-ycsb log by the threads that client really ran
+(run_a_threads_22_client_0.ycsb); see log_names().
+"""
+
+import json
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class Shard:
+    client: int
+    host: str
+    cores: int
+    threads: int
+    operationcount: int
+    insertstart: int
+    insertcount: int
+    # go-ycsb target ops/sec of this client, 0 for closed-loop runs
+    target: int = 0
+
+
+def apportion(total, weights):
+    """Split the integer total into parts proportional to weights (largest remainder)."""
+    wsum = sum(weights)
+    if wsum <= 0:
+        weights = [1] * len(weights)
+        wsum = len(weights)
+    quotas = [total * w / wsum for w in weights]
+    parts = [int(q) for q in quotas]
+    # hand out what rounding down left over, largest fractional part first
+    order = sorted(range(len(weights)), key=lambda i: (parts[i] - quotas[i], i))
+    for i in order[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def plan_shards(hosts, cores, threads, recordcount, operationcount, target=0):
+    """
+    One Shard per client for a run of threads over recordcount keys and
+    operationcount ops, at target ops/sec in total if target is set.
+    """
+    n = len(hosts)
+    if threads < n:
+        raise ValueError(f'{threads} threads for {n} clients, every client needs at least one')
+    threadparts = [1 + t for t in apportion(max(threads - n, 0), cores)]
+    records = apportion(recordcount, threadparts)
+    ops = apportion(operationcount, threadparts)
+    targets = apportion(target, threadparts)
+
+    shards = []
+    start = 0
+    for i in range(n):
+        shards.append(Shard(i, hosts[i], cores[i], threadparts[i], ops[i], start, records[i], targets[i]))
+        start += records[i]
+    return shards
+
+
+def log_names(label, shards):
+    """
+    Log name (without .ycsb) of every client of the run labelled
+    <phase>[_<workload>]_threads_<total>[_target_<rate>].
+    """
+    head, _, rest = label.partition('_threads_')
+    tail = rest.lstrip('0123456789')
+    return [f'{head}_threads_{s.threads}{tail}_client_{s.client}' for s in shards]
+
+
+def write_plans(path, plans):
+    """Save {label: [Shard]} as JSON."""
+    with open(path, 'w') as f:
+        json.dump({label: [asdict(s) for s in shards] for label, shards in plans.items()}, f, indent=1)
+
+
+def read_plans(path):
+    """{label: [Shard]} saved by write_plans."""
+    with open(path) as f:
+        return {label: [Shard(**s) for s in shards] for label, shards in json.load(f).items()}
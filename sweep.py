@@ -0,0 +1,96 @@
+"""
+Adaptive thread sweeps.
+
+Instead of running every thread count in [threadsmin, threads], we
+measure both ends and bisect towards the knee of the throughput curve:
+the interval whose upper half still gains more than `gain` (relative
+throughput) is split, the flat half is dropped. The search stops once
+the bracket is one step wide, the remaining interval gains less than
+`gain`, or a point exceeds the latency SLO (points past the SLO are
+treated as beyond the knee).
+"""
+
+import csv
+
+from ycsblog import parse_summary
+
+
+def client_summary(paths, op='TOTAL'):
+    """
+    (throughput, p99 latency in usec) of one run from its per-client logs:
+    throughput summed, latency the worst client's (average if no p99 is printed).
+    """
+    ops = 0.0
+    latency = 0.0
+    for path in paths:
+        values = parse_summary(path).get(op, {})
+        ops += values.get('ops', 0.0)
+        latency = max(latency, values.get('p99_us', values.get('avg_us', 0.0)))
+    return ops, latency
+
+
+def adaptive_sweep(measure, lo, hi, step, gain=0.05, slo_us=0.0, log_path=None):
+    """
+    Search thread counts in [lo, hi] (multiples of step above lo) for the
+    throughput knee. measure(threads) runs one point and returns
+    (throughput, latency_us). Returns {threads: (throughput, latency_us)}
+    and the knee: the fewest threads within `gain` of the best throughput
+    that stays under the SLO.
+    """
+    points = {}
+
+    def at(threads):
+        if threads not in points:
+            points[threads] = measure(threads)
+            ops, latency = points[threads]
+            print(f'adaptive sweep: {threads} threads -> {ops:.1f} ops/s, {latency:.0f} us')
+        return points[threads]
+
+    def over_slo(threads):
+        return slo_us > 0 and points[threads][1] > slo_us
+
+    def flat(a, b):
+        ta, tb = points[a][0], points[b][0]
+        return ta > 0 and (tb - ta) / ta < gain
+
+    a, b = lo, hi
+    at(a)
+    if hi > lo and not over_slo(a):
+        at(b)
+    while b - a > step and not over_slo(a):
+        if not over_slo(b) and flat(a, b):
+            break
+        m = a + max((b - a) // 2 // step, 1) * step
+        if m >= b:
+            break
+        at(m)
+        if over_slo(m):
+            b = m
+        elif over_slo(b) or not flat(m, b):
+            a = m
+        else:
+            b = m
+
+    knee = find_knee(points, gain, slo_us)
+    print(f'adaptive sweep: knee at {knee} threads after {len(points)} runs')
+    if log_path:
+        write_log(log_path, points, knee, slo_us)
+    return points, knee
+
+
+def find_knee(points, gain, slo_us):
+    within = {t: p for t, p in points.items() if slo_us <= 0 or p[1] <= slo_us}
+    if not within:
+        return None
+    best = max(p[0] for p in within.values())
+    return min(t for t, p in within.items() if p[0] >= (1 - gain) * best)
+
+
+def write_log(path, points, knee, slo_us):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['threads', 'ops', 'latency_us', 'over_slo', 'knee'])
+        for threads in sorted(points):
+            ops, latency = points[threads]
+            writer.writerow([threads, f'{ops:.1f}', f'{latency:.0f}',
+                             int(slo_us > 0 and latency > slo_us), int(threads == knee)])
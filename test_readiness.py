@@ -0,0 +1,123 @@
+"""
+Tests for readiness.py against a fake PD/TiKV status server on localhost.
+
+    python -m pytest -q test_readiness.py   (or python -m unittest test_readiness)
+"""
+
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import readiness
+
+
+class FakeStatus(BaseHTTPRequestHandler):
+    # path -> (status, body); the test sets these per case
+    routes = {}
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        status, body = self.routes.get(self.path, (404, ''))
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    """A localhost port nothing listens on."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def store(address, state):
+    return {'store': {'address': address, 'state_name': state}}
+
+
+class ReadinessTest(unittest.TestCase):
+    def setUp(self):
+        FakeStatus.routes = {}
+        FakeStatus.delay = 0.0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeStatus)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pd_ready(self):
+        FakeStatus.routes['/pd/api/v1/health'] = (200, [{'name': 'pd-0', 'health': True}])
+        self.assertEqual(readiness.pd_healthy(self.url), (True, ''))
+        self.assertGreaterEqual(readiness.wait_for_pd(self.url, timeout=1.0), 0.0)
+
+    def test_pd_not_ready(self):
+        FakeStatus.routes['/pd/api/v1/health'] = (200, [{'name': 'pd-0', 'health': False}])
+        ok, message = readiness.pd_healthy(self.url)
+        self.assertFalse(ok)
+        self.assertIn('pd-0', message)
+        FakeStatus.routes['/pd/api/v1/health'] = (503, '')
+        self.assertFalse(readiness.pd_healthy(self.url)[0])
+        FakeStatus.routes['/pd/api/v1/health'] = (200, 'not json')
+        self.assertIn('malformed', readiness.pd_healthy(self.url)[1])
+        # valid JSON that is not a list of members, e.g. an error object
+        for body in ({'error': 'not leader'}, ['pd-0'], None):
+            FakeStatus.routes['/pd/api/v1/health'] = (200, body)
+            self.assertEqual(readiness.pd_healthy(self.url), (False, f'{self.url} returned malformed health response'))
+
+    def test_tikv_ready(self):
+        FakeStatus.routes['/status'] = (200, '')
+        FakeStatus.routes['/pd/api/v1/stores'] = (200, {'stores': [store('127.0.0.1:20160', 'Up')]})
+        self.assertTrue(readiness.tikv_status_ok(self.url)[0])
+        self.assertEqual(readiness.stores_up(self.url, ['127.0.0.1:20160']), (True, ''))
+        self.assertGreaterEqual(readiness.wait_for_tikv(self.url, [self.url], ['127.0.0.1:20160'], timeout=1.0), 0.0)
+
+    def test_tikv_not_ready(self):
+        FakeStatus.routes['/status'] = (500, '')
+        FakeStatus.routes['/pd/api/v1/stores'] = (200, {'stores': [store('127.0.0.1:20160', 'Offline')]})
+        self.assertFalse(readiness.tikv_status_ok(self.url)[0])
+        ok, message = readiness.stores_up(self.url, ['127.0.0.1:20160', '127.0.0.1:20161'])
+        self.assertFalse(ok)
+        self.assertIn('127.0.0.1:20160=Offline', message)
+        self.assertIn('127.0.0.1:20161=None', message)
+
+    def test_wait_times_out(self):
+        FakeStatus.routes['/pd/api/v1/health'] = (503, '')
+        start = time.monotonic()
+        with self.assertRaises(readiness.NotReadyError) as raised:
+            readiness.wait_for_pd(self.url, timeout=0.3)
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertIn('returned 503', str(raised.exception))
+        FakeStatus.routes['/status'] = (200, '')
+        FakeStatus.routes['/pd/api/v1/stores'] = (200, {'stores': []})
+        with self.assertRaises(readiness.NotReadyError):
+            readiness.wait_for_tikv(self.url, [self.url], ['127.0.0.1:20160'], timeout=0.3)
+
+    def test_slow_server_times_out(self):
+        FakeStatus.routes['/status'] = (200, '')
+        FakeStatus.delay = 1.0
+        start = time.monotonic()
+        self.assertEqual(readiness.http_get(f'{self.url}/status', timeout=0.2), (None, ''))
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_connection_refused(self):
+        url = f'http://127.0.0.1:{free_port()}'
+        self.assertEqual(readiness.http_get(f'{url}/status'), (None, ''))
+        self.assertEqual(readiness.pd_healthy(url), (False, f'{url} health returned None'))
+        self.assertFalse(readiness.tikv_status_ok(url)[0])
+        self.assertFalse(readiness.stores_up(url, ['127.0.0.1:20160'])[0])
+        with self.assertRaises(readiness.NotReadyError):
+            readiness.wait_for_tikv(url, [url], ['127.0.0.1:20160'], timeout=0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
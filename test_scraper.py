@@ -0,0 +1,53 @@
+"""
+Round-trip tests for the scraper.py time-series file.
+
+    python -m pytest -q test_scraper.py   (or python -m unittest test_scraper)
+"""
+
+import os
+import tempfile
+import unittest
+
+from scraper import SeriesWriter, TimeSeries
+
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.tsdb')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def round_trip(self, rows, block_ticks):
+        writer = SeriesWriter(self.path, block_ticks)
+        for t, row in enumerate(rows):
+            writer.append(float(t), row)
+        writer.close()
+        return TimeSeries(self.path)
+
+    def column(self, ts, name):
+        return list(ts.columns[ts.index[name]])
+
+    def test_fractional_then_whole_across_blocks(self):
+        # the second block's values are whole, but its first delta (1.0 - 0.25) is not
+        values = [0.5, 0.25, 1.0, 2.0, 2.5, 7.0]
+        ts = self.round_trip([{'x': v} for v in values], block_ticks=2)
+        self.assertEqual(self.column(ts, 'x'), values)
+
+    def test_whole_then_fractional_across_blocks(self):
+        values = [1.0, 3.0, 3.5, 4.5, 10.0, 12.0]
+        ts = self.round_trip([{'x': v} for v in values], block_ticks=2)
+        self.assertEqual(self.column(ts, 'x'), values)
+
+    def test_counters_and_missing_series(self):
+        rows = [{'a': 1.0}, {'a': 5.0, 'b': 0.75}, {'b': 1.75}, {'a': 2.0 ** 40, 'b': 2.0}, {}]
+        ts = self.round_trip(rows, block_ticks=3)
+        self.assertEqual(list(ts.times), [0.0, 1.0, 2.0, 3.0, 4.0])
+        # a series missing from a scrape keeps its previous value, and is 0 before its first
+        self.assertEqual(self.column(ts, 'a'), [1.0, 5.0, 5.0, 2.0 ** 40, 2.0 ** 40])
+        self.assertEqual(self.column(ts, 'b'), [0.0, 0.75, 1.75, 2.0, 2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,33 @@
 #!/usr/bin/python
 
 import argparse
+import csv
+import json
+import random
 import shlex
-import subprocess
 import time
 import sys
 import os
 import glob
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass, field
 from fabric import Connection
+from disksampler import phase_deltas, read_samples
+from hostpool import HostPool
+from journal import Journal
+from localhost import LocalConnection, is_local
+from phases import PhaseLog, read_phases
+from readiness import NotReadyError, wait_for_pd, wait_for_tikv, wait_until
+from scraper import MetricsScraper
+from openloop import rate_sweep, write_rates
+from shard import log_names, plan_shards, read_plans, write_plans
+from sweep import adaptive_sweep, client_summary
+from ycsbstream import StopRule, stream_clients
+from ycsblog import parse_summary
+from transfer import TransferStats, can_use_zstd, fetch_compressed, fetch_matching, fetch_url
 
 # we support a few different experiment types
 # - disk measurement
@@ -30,6 +47,8 @@ class NodeConfig:
     home: str = str(Path.home())
     exe: str = '/software'
     data: str = '/mnt/data'
+    # --tikv_exe: a build other than the tikv-xll checkout, e.g. a worktree per branch
+    tikv_bin: str = ''
 
     @property
     def ycsb_home(self):
@@ -39,9 +58,18 @@ class NodeConfig:
     def ycsb_exe(self):
         return f'{self.ycsb_home}/bin/go-ycsb'
 
+    @property
+    def tikv_repo(self):
+        return f'{self.exe}/tikv-xll'
+
     @property
     def tikv_exe(self):
-        return f'{self.exe}/tikv-xll/target/release/tikv-server'
+        return self.tikv_bin or f'{self.tikv_repo}/target/release/tikv-server'
+
+    @property
+    def tikv_build_repo(self):
+        """git checkout the TiKV binary was built from"""
+        return os.path.dirname(self.tikv_bin) if self.tikv_bin else self.tikv_repo
 
     @property
     def pd_exe(self):
@@ -51,6 +79,28 @@ class NodeConfig:
     def workload_path(self):
         return f'{self.ycsb_home}/workloads/workload'
 
+# --fake: the stand-ins in fakecluster.py instead of the real binaries
+@dataclass
+class FakeNodeConfig(NodeConfig):
+    exe: str = os.path.dirname(os.path.abspath(__file__))
+
+    @property
+    def ycsb_exe(self):
+        return f'{sys.executable} {self.exe}/fakecluster.py ycsb'
+
+    @property
+    def tikv_exe(self):
+        return f'{sys.executable} {self.exe}/fakecluster.py tikv'
+
+    @property
+    def pd_exe(self):
+        return f'{sys.executable} {self.exe}/fakecluster.py pd'
+
+    @property
+    def workload_path(self):
+        # only the workload letter is read
+        return 'workload'
+
 # launch parameters for go-ycsb. Somewhat simplified... these are the
 # ones which actually change per-experiment.
 @dataclass
@@ -61,6 +111,8 @@ class YcsbConfig:
     fieldlength: int = 0
     operationcount: int = 0
     recordcount: int = 0
+    # total go-ycsb target ops/sec, 0 for closed-loop runs
+    target: int = 0
 
 # global parameters for this experiment
 @dataclass
@@ -68,6 +120,7 @@ class ExperimentConfig:
     dbnodes: list[str] = field(default_factory=list)
     monitornode: str = ""
     clientnodes: list[str] = field(default_factory=list)
+    clientcores: list[int] = field(default_factory=list)
     expname: str = ""
     valuesize: int = 0
     dbsize: int = 0
@@ -75,24 +128,101 @@ class ExperimentConfig:
     threads: int = 0
     threadsmin: int = 0
     outdirectory: str = ""
+    readytimeout: float = 120.0
+    scrapeinterval: float = 5.0
+    adaptive: bool = False
+    threadstep: int = 0
+    kneegain: float = 0.05
+    latencyslo: float = 0.0
+    datasetcache: bool = False
+    disktracer: str = 'sample'
+    sampleinterval: float = 0.1
+    sampleresources: bool = False
+    stream: bool = False
+    streaminterval: float = 5.0
+    stopstable: float = 0.0
+    stopcollapse: float = 0.0
+    local: bool = False
+    runs: int = 1
+    membudgets: list[str] = field(default_factory=list)
+    blockcacheratio: float = 0.45
+    # memsweep: cgroup MemoryMax of the TiKV nodes right now, '' for the usual 32G
+    membudget: str = ''
+    targetrates: list[int] = field(default_factory=list)
+    rateseconds: float = 60.0
+    minrateratio: float = 0.95
 
 # <service>-i => (pid, Connection)
 running_pids = {}
+running_pids_lock = threading.Lock()
+# warm connections and batched control commands, see hostpool.py
+hostpool = HostPool()
+# phases.csv timeline, and client output still being copied in the background
+phaselog = PhaseLog()
+# finished steps, so --resume can pick up after a crash
+journal = Journal()
+fetcher = ThreadPoolExecutor(max_workers=4)
+pending_fetches = []
+# label -> [Shard] of every run so far, saved as shard-plan.json
+shard_plans = {}
+# TiKV node index -> block device backing its data directory (None if unknown)
+data_devices = {}
 tikvconf = TiKVConfig()
 nodeconf = NodeConfig()
 expconf = ExperimentConfig()
 
-def start_remotely(conn, cmd, name, log_file=None):
+def node_home(conn):
+    """home directory of a node; local nodes each have their own"""
+    return getattr(conn, 'home', nodeconf.home)
+
+def node_data(conn):
+    return getattr(conn, 'data', nodeconf.data)
+
+def tikv_addr(i):
+    # local TiKV nodes share an IP, so each one gets its own ports
+    return f'{expconf.dbnodes[i]}:{tikvconf.tikv_addr_port + (i if expconf.local else 0)}'
+
+def tikv_status_addr(i):
+    return f'{expconf.dbnodes[i]}:{tikvconf.tikv_status_port + (i if expconf.local else 0)}'
+
+def start_remotely(conn, cmd, name, log_file=None, **info):
     """
 Start a remote process using nohup and add its PID to a global dict.
+Local processes get their own session, so the PID is also the process
+group we kill on shutdown. info is kept with it in the journal.
 """
-    nohupcmd = f"nohup {cmd} < /dev/null > {log_file} 2>&1 & echo $!"
-    print(f'running {nohupcmd}')
-    res = conn.run(nohupcmd, hide=True)
-    pid = res.stdout.strip()
-    running_pids[name] = (pid, conn)
-    print(f'added {name} -> {pid}')
+    start_all([(conn, cmd, name, log_file, info)])
 
+def start_all(starts):
+    """
+start_remotely() every (conn, cmd, name, log_file, info) of starts. All of
+them are queued before any is waited for, so each host gets its starts
+(and anything queued just before them) in one round trip.
+"""
+    futures = []
+    for conn, cmd, name, log_file, info in starts:
+        if is_local(conn):
+            cmd = f'setsid {cmd}'
+        nohupcmd = f"nohup {cmd} < /dev/null > {log_file} 2>&1 & echo $!"
+        print(f'running {nohupcmd}')
+        futures.append(hostpool.submit(conn, nohupcmd))
+    for (conn, _, name, _, info), future in zip(starts, futures):
+        res = future.result()
+        if not res.ok:
+            raise RuntimeError(f'{conn.host}: could not start {name}: {res.stdout}')
+        pid = res.stdout.strip()
+        with running_pids_lock:
+            running_pids[name] = (pid, conn)
+        journal.record('service', name=name, pid=pid, host=conn.host, **info)
+        print(f'added {name} -> {pid}')
+
+def parallel_map(fn, items):
+    """Call fn on every item concurrently (one thread each) and return the results in order."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        return list(pool.map(fn, items))
 
 def build_cmd(exe, options):
     cmdlist = [exe]
@@ -104,40 +234,219 @@ def start_pd(conn):
     print("starting pd...")    
     pd_options = {
         'name': 'pd',
-        'data-dir': f'{nodeconf.data}/pd',
+        'data-dir': f'{node_data(conn)}/pd',
         'client-urls': f'http://{expconf.monitornode}:{tikvconf.pd_port}',
         'peer-urls': f'http://{expconf.monitornode}:{tikvconf.pd_peer_port}',
-        'log-file': f'{nodeconf.home}/pd.log'
+        'log-file': f'{node_home(conn)}/pd.log'
     }
 
     cmd = build_cmd(nodeconf.pd_exe, pd_options)
     start_remotely(conn, cmd, f'pd-0', f'runpd.log')
 
 def start_tikv(tikvconns):
+    """Launch tikv-server on every node at once. Readiness is checked afterwards."""
     print("starting db...")    
+    starts = []
     for i, conn in enumerate(tikvconns):
         tikv_options = {
             'pd-endpoints': f'{expconf.monitornode}:{tikvconf.pd_port}',
-            'addr': f'{expconf.dbnodes[i]}:{tikvconf.tikv_addr_port}',
-            'status-addr': f'{expconf.dbnodes[i]}:{tikvconf.tikv_status_port}',
-            'data-dir': f'{nodeconf.data}/tikv-data',
-            'log-file': f'{nodeconf.home}/tikv.log'
+            'addr': tikv_addr(i),
+            'status-addr': tikv_status_addr(i),
+            'data-dir': f'{node_data(conn)}/tikv-data',
+            'log-file': f'{node_home(conn)}/tikv.log'
         }
-        cmd = build_cmd(f'sudo systemd-run --scope -p MemoryMax=32G --setenv=RUST_BACKTRACE=1 {nodeconf.tikv_exe}', tikv_options)
-        start_remotely(conn, cmd, f'tikv-{i}', f'run-tikv-{i}.log')
-        time.sleep(3)
+        if expconf.membudget:
+            tikv_options['config'] = write_memory_config(conn)
+        # local nodes run unprivileged, without a memory-limited scope
+        launcher = '' if is_local(conn) else 'sudo systemd-run --scope -p MemoryMax=32G --setenv=RUST_BACKTRACE=1 '
+        if expconf.membudget and not is_local(conn):
+            # a named scope, so the sampler can find its cgroup
+            launcher = (f'sudo systemd-run --scope --unit=tikv-{i} -p MemoryMax={expconf.membudget} '
+                        f'--setenv=RUST_BACKTRACE=1 ')
+        cmd = build_cmd(f'{launcher}{nodeconf.tikv_exe}', tikv_options)
+        starts.append((conn, cmd, f'tikv-{i}', f'run-tikv-{i}.log', {}))
+    start_all(starts)
+
+def parse_budget(budget):
+    """systemd size (8G, 512M, bytes) -> bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    budget = budget.strip().upper().rstrip('B')
+    if budget[-1:] in units:
+        return int(float(budget[:-1]) * units[budget[-1]])
+    return int(budget)
+
+def write_memory_config(conn):
+    """
+TiKV config sizing the block cache to --block_cache_ratio of the memory
+budget. Returns its path. The write is only queued: a host runs its
+commands in order, so it is done before a TiKV start queued after it.
+"""
+    capacity = int(parse_budget(expconf.membudget) * expconf.blockcacheratio) // (1024 * 1024)
+    path = f'{node_home(conn)}/tikv-memsweep.toml'
+    hostpool.submit(conn, f"printf '[storage.block-cache]\\ncapacity = \"{capacity}MB\"\\n' > {path}")
+    return path
+
+def pd_url():
+    return f'http://{expconf.monitornode}:{tikvconf.pd_port}'
+
+def wait_for_cluster(tikv=True):
+    """Block until PD (and optionally every TiKV store) is ready. Raises NotReadyError."""
+    wait_for_pd(pd_url(), expconf.readytimeout)
+    if not tikv:
+        return
+    status_urls = [f'http://{tikv_status_addr(i)}' for i in range(len(expconf.dbnodes))]
+    store_addrs = [tikv_addr(i) for i in range(len(expconf.dbnodes))]
+    wait_for_tikv(pd_url(), status_urls, store_addrs, expconf.readytimeout)
+
+def start_scraper(tag):
+    """Poll every TiKV /metrics endpoint in the background into <node>/tikv-<tag>.tsdb."""
+    if expconf.scrapeinterval <= 0:
+        return None
+    urls = []
+    paths = []
+    for i in range(len(expconf.dbnodes)):
+        os.makedirs(f'{expconf.outdirectory}/{i}', exist_ok=True)
+        urls.append(f'http://{tikv_status_addr(i)}/metrics')
+        paths.append(f'{expconf.outdirectory}/{i}/tikv-{tag}.tsdb')
+    print(f'scraping metrics every {expconf.scrapeinterval}s')
+    return MetricsScraper(urls, paths, expconf.scrapeinterval).start()
+
+def stop_scraper(scraper):
+    if scraper:
+        scraper.stop()
+
+def detect_data_devices(conns):
+    """
+Whole disk backing each node's data directory (e.g. nvme1n1), or None
+where it is not a block device. One command per node, all nodes at once.
+"""
+    # the source, then the disk it is a partition of (nothing for a whole disk)
+    futures = [hostpool.submit(conn, f'source=$(findmnt -no SOURCE --target {node_data(conn)}) && '
+                                     f'echo "$source" && lsblk -no pkname "$source"')
+               for conn in conns]
+    devices = []
+    for future in futures:
+        lines = future.result().stdout.split()
+        if not lines or not lines[0].startswith('/dev/'):
+            devices.append(None)
+        else:
+            devices.append(lines[1] if len(lines) > 1 else os.path.basename(lines[0]))
+    return devices
+
+def start_samplers(nodes):
+    """
+Start disksampler.py on every TiKV node: disk I/O counters, plus CPU,
+disk busy time and network with --sample_resources.
+"""
+    nodes = list(nodes)
+    devices = detect_data_devices(nodes)
+    parallel_map(lambda conn: conn.put(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'disksampler.py'),
+                                       f'{node_home(conn)}/disksampler.py'), nodes)
+    starts = []
+    for i, conn in enumerate(nodes):
+        device = data_devices[i] = devices[i]
+        print(f'tikv-{i} data device: {device or "unknown"}')
+        home = node_home(conn)
+        devopt = f' --device {device}' if device else ''
+        resopt = f' --resources {home}/resources.csv' if expconf.sampleresources else ''
+        if expconf.membudget:
+            resopt += f' --memory {home}/memory.csv'
+            if not is_local(conn):
+                resopt += f' --cgroup /system.slice/tikv-{i}.scope'
+        # the data directory only appears on the command line of this node's TiKV
+        cmd = (f'sudo python3 {home}/disksampler.py --interval {expconf.sampleinterval:g}{devopt}{resopt} '
+               f'--match {node_data(conn)}/tikv-data --out {home}/disk-samples.csv')
+        starts.append((conn, cmd, f'disksampler-{i}', f'disksampler-{i}.log', {}))
+    start_all(starts)
 
 def start_disk_measurement(nodes):
+    """
+Measure disk I/O of every TiKV node. The default sampler reads kernel
+counters (see disksampler.py); --disk_tracer strace attaches strace and
+blktrace instead, which slows TiKV down.
+"""
+    if expconf.disktracer == 'sample':
+        start_samplers(nodes)
+        return
+
+    nodes = list(nodes)
+    devices = detect_data_devices(nodes)
+    pgreps = [hostpool.submit(conn, 'pgrep -f tikv-server') for conn in nodes]
+    starts = []
     for i, conn in enumerate(nodes):
+        device = data_devices[i] = devices[i]
+        print(f'tikv-{i} data device: {device or "unknown"}')
+
         grouppid, tikvconn = running_pids[f'tikv-{i}']
-        res = conn.run('pgrep -f tikv-server')
-        tikvpid = res.stdout.strip().splitlines()[1]
+        tikvpid = pgreps[i].result().stdout.strip().splitlines()[1]
         print(f'CGROUP PID {grouppid} TIKV-SERVER PID {tikvpid}')
         cmd = f'sudo nsenter -t {tikvpid} -p -n -u -i -C strace -r -e trace=%file,write,fsync -o {expconf.expname}-{expconf.dbsize}.strace -fp {tikvpid}'
-        start_remotely(conn, cmd, f'strace-{i}', f'strace-{i}.log')
+        starts.append((conn, cmd, f'strace-{i}', f'strace-{i}.log', {}))
+
+        if device:
+            cmd = f'sudo blktrace -d /dev/{device}'
+            # cleanup needs the device to find the trace files, also after --resume
+            starts.append((conn, cmd, f'blktrace-{i}', f'blktrace-{i}.summary', {'device': device}))
+        else:
+            print(f'WARN tikv-{i}: no block device found for {node_data(conn)}, not running blktrace')
+    # strace and blktrace of a node go out in one round trip
+    start_all(starts)
+
+def stop_samplers():
+    """Stop the samplers so their output is complete before it is collected."""
+    for f in kill_service('disksampler'):
+        f.result()
 
-        cmd = f'sudo blktrace -d /dev/sdb'
-        start_remotely(conn, cmd, f'blktrace-{i}', f'blktrace-{i}.summary')
+def logical_write_bytes(phase):
+    """Bytes the clients asked to write during a load or run phase, from their go-ycsb logs."""
+    if phase['phase'] == 'load':
+        label = f'load_threads_{phase["threads"]}'
+    else:
+        label = f'run_{phase["workload"]}_threads_{phase["threads"]}'
+    writes = 0.0
+    for path in point_logs(label):
+        summary = parse_summary(path)
+        writes += sum(summary.get(op, {}).get('count', 0.0)
+                      for op in ('INSERT', 'UPDATE', 'READ_MODIFY_WRITE', 'BATCH_INSERT'))
+    return writes * expconf.valuesize
+
+def write_disk_phases():
+    """
+disk-phases.csv: what every sampled device and TiKV process wrote in each
+load/run phase, plus cluster totals (node all) with write amplification
+relative to the bytes the clients wrote.
+"""
+    phasespath = f'{expconf.outdirectory}/phases.csv'
+    if not os.path.exists(phasespath):
+        return
+    phases = [p for p in read_phases(phasespath) if p['phase'] in ('load', 'run')]
+    rows = []
+    for i in range(len(expconf.dbnodes)):
+        samples = f'{expconf.outdirectory}/{i}/disk-samples.csv'
+        if os.path.exists(samples):
+            rows += [dict(row, node=i) for row in phase_deltas(read_samples(samples), phases)]
+
+    counters = ['read_bytes', 'write_bytes', 'writes', 'flushes', 'wchar']
+    for phase in phases:
+        logical = logical_write_bytes(phase)
+        for kind in ('dev', 'pid'):
+            mine = [r for r in rows if r['source'].startswith(kind) and
+                    (r['phase'], r['workload'], r['threads']) == (phase['phase'], phase['workload'], phase['threads'])]
+            if kind == 'dev' and expconf.local:
+                # local nodes share this machine's disks, count each once
+                mine = list({r['source']: r for r in mine}.values())
+            total = {c: sum(r[c] for r in mine) for c in counters}
+            rows.append(dict(total, phase=phase['phase'], workload=phase['workload'], threads=phase['threads'],
+                             node='all', source=kind, seconds=phase['end'] - phase['start'],
+                             logical_bytes=int(logical),
+                             write_amp=f'{total["write_bytes"] / logical:.3f}' if logical else ''))
+
+    columns = ['phase', 'workload', 'threads', 'node', 'source', 'seconds'] + counters + ['logical_bytes', 'write_amp']
+    with open(f'{expconf.outdirectory}/disk-phases.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, seconds=f'{row["seconds"]:.3f}'))
 
 def generate_ycsb_opts():
     opts = YcsbConfig()
@@ -146,46 +455,95 @@ def generate_ycsb_opts():
     opts.fieldlength = expconf.valuesize // opts.fieldcount
     size = opts.fieldcount * opts.fieldlength
     opts.recordcount = int(expconf.dbsize // size)
-    opts.operationcount = expconf.ops // len(expconf.clientnodes)
+    # totals, divided amongst the clients by plan_shards
+    opts.operationcount = expconf.ops
     opts.threads = expconf.threads
 
     return opts
 
+def probe_cores(conns):
+    """Core count of every node (1 if nproc fails)."""
+    results = hostpool.run_all(conns, 'nproc')
+    return [int(r.stdout.strip()) if r.ok and r.stdout.strip().isdigit() else 1 for r in results]
+
+def shard_run(label, opts):
+    """Split opts.threads, records and operations over the clients and record the plan."""
+    shards = plan_shards(expconf.clientnodes, expconf.clientcores, opts.threads,
+                         opts.recordcount, opts.operationcount, opts.target)
+    names = set(log_names(label, shards))
+    for other, planned in shard_plans.items():
+        if other != label and names & set(log_names(other, planned)):
+            print(f'WARN {label} and {other} give a client the same thread count, '
+                  f'their client logs overwrite each other')
+    shard_plans[label] = shards
+    write_plans(f'{expconf.outdirectory}/shard-plan.json', shard_plans)
+    return shards
+
+def point_logs(label):
+    """Local go-ycsb logs of every client of the run labelled label."""
+    if label not in shard_plans:
+        return []
+    return [f'{expconf.outdirectory}/{name}.ycsb' for name in log_names(label, shard_plans[label])]
+
+def shard_optlist(opts, shard):
+    optlist = [f'tikv.pd={opts.pd}', 'tikv.type=raw', f'threadcount={shard.threads}',
+               f'fieldcount={opts.fieldcount}', f'fieldlength={opts.fieldlength}',
+               f'operationcount={shard.operationcount}', f'recordcount={opts.recordcount}', 'dotransactions=false']
+    if shard.target:
+        optlist.append(f'target={shard.target}')
+    return optlist
+
 def load_ycsb(clientconns, threads):
+    """Load the database with threads divided amongst the client nodes."""
     opts = generate_ycsb_opts()
     opts.threads = threads
-    
-    optlist = [f'tikv.pd={opts.pd}', 'tikv.type=raw', f'threadcount={opts.threads}',
-               f'fieldcount={opts.fieldcount}', f'fieldlength={opts.fieldlength}',
-               f'operationcount={opts.operationcount}', f'recordcount={opts.recordcount}', 'dotransactions=false']
 
     # run ycsb on each client node
-    basename = f'load_threads_{opts.threads}_client'
-    incr = opts.recordcount // len(expconf.clientnodes)
+    label = f'load_threads_{threads}'
+    shards = shard_run(label, opts)
+    names = log_names(label, shards)
     jobs = []
 
     # TODO run_in_parallel doesn't support this command type well...
     for i, client in enumerate(clientconns):
-        cmd = build_ycsb_cmd('load', f'{nodeconf.workload_path}a', optlist + [f'insertstart={i * incr}', f'insertcount={incr}'])
-        job = client.run(f'{" ".join(cmd)} > {nodeconf.home}/{basename}_{i}.ycsb', asynchronous=True)
+        shard = shards[i]
+        cmd = build_ycsb_cmd('load', f'{nodeconf.workload_path}a', shard_optlist(opts, shard) +
+                             [f'insertstart={shard.insertstart}', f'insertcount={shard.insertcount}'])
+        job = client.run(f'{" ".join(cmd)} > {node_home(client)}/{names[i]}.ycsb', asynchronous=True)
         jobs.append(job)
         
     # wait for all the clients to finish
-    for job in jobs:
-        job.join()
+    with phaselog.phase('load', '', threads):
+        for job in jobs:
+            job.join()
 
     # get output from the client nodes
-    for i, client in enumerate(clientconns):
-        client.get(f'{nodeconf.home}/{basename}_{i}.ycsb', f'{expconf.outdirectory}/{basename}_{i}.ycsb')
+    fetch_outputs(clientconns, names, 'ycsb', ('', threads))
+
+def fetch_outputs(conns, names, extension, label=('', '')):
+    """Copy <names[i]>.<extension> from connection i's home to the output directory."""
+    with phaselog.phase('fetch', *label):
+        for client, name in zip(conns, names):
+            client.get(f'{node_home(client)}/{name}.{extension}', f'{expconf.outdirectory}/{name}.{extension}')
 
-def run_in_parallel(cmd, conns, outfile=None, extension=None):
-    """Run cmd on all connections in parallel and return after all are finished."""
+def wait_for_fetches():
+    """Block until all background output copies are done."""
+    while pending_fetches:
+        pending_fetches.pop(0).result()
+
+def run_in_parallel(cmd, conns, outfiles=None, extension=None, background=False, label=('', '')):
+    """
+Run cmd on all connections in parallel and return after all are finished.
+cmd is one command for every connection or a list with one per connection,
+and outfiles the name of each connection's output file, if wanted.
+With background, the output files are copied by the fetcher while the
+caller moves on; the returned future completes once they are local.
+"""
     jobs = []
     for i, c in enumerate(conns):
-        if not outfile:
-            newcmd = cmd
-        else: # redirect to an output file if wanted
-            newcmd = f'{cmd} > {nodeconf.home}/{outfile}_{i}.{extension}'
+        newcmd = cmd[i] if isinstance(cmd, list) else cmd
+        if outfiles: # redirect to an output file if wanted
+            newcmd = f'{newcmd} > {node_home(c)}/{outfiles[i]}.{extension}'
             print(newcmd)
             
         job = c.run(newcmd, asynchronous=True, warn=True)
@@ -195,97 +553,303 @@ def run_in_parallel(cmd, conns, outfile=None, extension=None):
         job.join()
 
     # if we have an output file, gather output from each client
-    if outfile:
-        for i, client in enumerate(conns):
-            client.get(f'{nodeconf.home}/{outfile}_{i}.{extension}', f'{expconf.outdirectory}/{outfile}_{i}.{extension}')
-    
-def run_ycsb_workloads(workloads, conns, clientconns):
+    if outfiles and background:
+        future = fetcher.submit(fetch_outputs, conns, outfiles, extension, label)
+        pending_fetches.append(future)
+        return future
+    if outfiles:
+        fetch_outputs(conns, outfiles, extension, label)
+
+def drop_caches(conns):
+    # needs root, so local nodes keep their caches
+    hostpool.run_all([c for c in conns if not is_local(c)], "echo 3 | sudo tee /proc/sys/vm/drop_caches")
+
+def run_ycsb_point(w, threads, conns, clientconns, wait=True, target=0):
+    """
+Run workload w with threads divided amongst client nodes. Returns (ops/sec, p99 usec).
+Without wait the client output is still being copied when this returns,
+overlapping the next point's preparation, and nothing is returned.
+With a target the clients are paced to target ops/sec in total, for
+--rate_seconds if set.
+"""
     opts = generate_ycsb_opts()
+    opts.threads = threads
+    opts.target = target
+    label = f'run_{w}_threads_{threads}'
+    step = f'run:{w}:{threads}' + (f':{expconf.membudget}' if expconf.membudget else '')
+    if target:
+        label += f'_target_{target}'
+        step += f':{target}'
+        if expconf.rateseconds:
+            opts.operationcount = int(target * expconf.rateseconds)
+    if journal.done(step):
+        print(f'{step} already done, skipping')
+        return client_summary(point_logs(label)) if wait else None
+    shards = shard_run(label, opts)
+    names = log_names(label, shards)
+
+    # drop caches on TiKV nodes
+    with phaselog.phase('prepare', w, threads):
+        drop_caches(conns)
+        wait_for_cluster()
+        # keep transfers of the previous point out of the measurement window
+        wait_for_fetches()
+
+    cmds = [" ".join(build_ycsb_cmd('run', f'{nodeconf.workload_path}{w}', shard_optlist(opts, shard)))
+            for shard in shards]
+
+    if expconf.stream:
+        with phaselog.phase('run', w, threads):
+            stream_run(cmds, clientconns, names, label)
+        journal.record(step)
+        if not wait:
+            return None
+        return client_summary(point_logs(label))
+
+    # run ycsb on each client node
+    with phaselog.phase('run', w, threads):
+        fetched = run_in_parallel(cmds, clientconns, names, 'ycsb',
+                                  background=True, label=(w, threads))
+    # the point is only done once its output is local
+    journal.record_when_done(fetched, step)
+    if not wait:
+        return None
+    fetched.result()
+    return client_summary(point_logs(label))
+
+def stream_run(cmds, clientconns, names, label):
+    """
+Run cmds[i] on client i into names[i].ycsb, following the go-ycsb status
+lines live (see ycsbstream.py) and stopping early if --stop_stable or
+--stop_collapse fire.
+"""
+    pidfiles = [f'{node_home(c)}/ycsb-{i}.pid' for i, c in enumerate(clientconns)]
+    # the pid file lets us interrupt go-ycsb itself rather than the ssh shell
+    remote = [f'{cmd} -p status.interval={expconf.streaminterval:g} & echo $! > {pidfile}; wait $!'
+              for cmd, pidfile in zip(cmds, pidfiles)]
+    rule = StopRule(expconf.stopstable, expconf.stopcollapse)
+    def stop():
+        futures = [hostpool.submit(c, f'kill -INT $(cat {pidfile})') for c, pidfile in zip(clientconns, pidfiles)]
+        for f in futures:
+            f.result()
+    return stream_clients(clientconns, remote,
+                          [f'{expconf.outdirectory}/{name}.ycsb' for name in names],
+                          expconf.streaminterval, rule, stop, f'{expconf.outdirectory}/stream_{label}.csv')
+
+def sweep_threads(measure, label, defaultstep):
+    """
+Call measure(threads) over threadsmin..threads, either every step or
+searching adaptively for the throughput knee.
+"""
+    step = expconf.threadstep or defaultstep
+    if not expconf.adaptive:
+        # add one to force at least once number if threadsmin and threads are the same
+        for threads in range(expconf.threadsmin, expconf.threads + 1, step):
+            measure(threads)
+        return
 
-    # add one to force at least once number if threadsmin and threads are the same
+    adaptive_sweep(measure, expconf.threadsmin, expconf.threads, step,
+                   expconf.kneegain, expconf.latencyslo * 1000,
+                   f'{expconf.outdirectory}/adaptive_{label}.csv')
+
+def run_ycsb_workloads(workloads, conns, clientconns):
     # we use threadsmin for scalability tests. threads are divided amongst client nodes
-    for threads in range(expconf.threadsmin, expconf.threads + 1, 8):
-        opts.threads = threads // len(expconf.clientnodes)
-        optlist = [f'tikv.pd={opts.pd}', 'tikv.type=raw', f'threadcount={opts.threads}',
-                   f'fieldcount={opts.fieldcount}', f'fieldlength={opts.fieldlength}',
-                   f'operationcount={opts.operationcount}', f'recordcount={opts.recordcount}', 'dotransactions=false']
+    if expconf.adaptive:
+        # each workload saturates at a different point, so search each separately
+        for w in workloads:
+            sweep_threads(lambda threads: run_ycsb_point(w, threads, conns, clientconns), f'run_{w}', 8)
+        return
 
-        # workloads
+    def all_workloads(threads):
         for w in workloads:
-            # drop caches on TiKV nodes
-            run_in_parallel("echo 3 | sudo tee /proc/sys/vm/drop_caches", conns)
-            time.sleep(5)
+            run_ycsb_point(w, threads, conns, clientconns, wait=False)
 
-            cmd = build_ycsb_cmd('run', f'{nodeconf.workload_path}{w}', optlist)
-            jobs = []
+    sweep_threads(all_workloads, 'ycsb', 8)
 
-            # run ycsb on each client node
-            run_in_parallel(f'{" ".join(cmd)}', clientconns, f'run_{w}_threads_{opts.threads}_client', 'ycsb')
+def run_openloop(workloads, conns, clientconns):
+    """
+Run each workload at every --target_rates rate with --threads threads, from
+the lowest rate until one is not met (see openloop.py). Points go to
+openloop.csv: offered and achieved rate, p50/p99/p999.
+"""
+    for w in workloads:
+        step = f'rates:{w}'
+        if journal.done(step):
+            print(f'{step} already done, skipping')
+            continue
 
-def kill_service(pname):
-    for name, info in running_pids.items():
-        if name.startswith(pname):
-            pid, conn = info
-            conn.run(f'sudo pkill -9 {pname}')
-            
-def shutdown_services():
-    # strace and blktrace should fail silently if they were never started
-    kill_service("strace")
-    kill_service("blktrace")
-    kill_service("tikv")
-    kill_service("pd")
+        def measure(rate):
+            run_ycsb_point(w, expconf.threads, conns, clientconns, target=rate)
+            label = f'run_{w}_threads_{expconf.threads}_target_{rate}'
+            return point_logs(label), [shard.target for shard in shard_plans[label]]
+
+        points = rate_sweep(measure, expconf.targetrates, expconf.minrateratio)
+        write_rates(f'{expconf.outdirectory}/openloop.csv', w, expconf.threads, points)
+        journal.record(step)
+
+def kill_command(pname, signal='KILL'):
+    if pname == 'disksampler':
+        # let the sampler write its last samples, and wait until it has
+        return ("sudo pkill -TERM -f '[d]isksampler.py'; "
+                "while pgrep -f '[d]isksampler.py' > /dev/null; do sleep 0.05; done")
+    return f'sudo pkill -{signal} {pname}'
+
+def kill_service(pname, signal='KILL'):
+    """Queue the kill commands for a service. Returns their futures."""
+    # one pkill per host is enough, even if several instances share a node.
+    # local nodes share this host, so kill their process groups instead.
+    services = [(pid, c) for name, (pid, c) in running_pids.items() if name.startswith(pname)]
+    conns = {c.host: c for _, c in services if not is_local(c)}
+    futures = [hostpool.submit(c, kill_command(pname, signal)) for c in conns.values()]
+    futures += [hostpool.submit(c, f'kill -{signal} -- -{pid}') for pid, c in services if is_local(c)]
+    return futures
+
+def shutdown_services(graceful=False):
+    """
+Stop every service. With graceful, TiKV and PD get SIGTERM and time to
+close their data cleanly (as a dataset snapshot needs), and are only
+killed if they are still running after --ready_timeout.
+"""
+    # tracers should fail silently if they were never started.
+    # all kills are queued first so each host gets them in one round trip,
+    # together with the first exit check, which a host runs after them.
+    futures = []
+    for pname in ["disksampler", "strace", "blktrace", "tikv", "pd"]:
+        futures += kill_service(pname, 'TERM' if graceful and pname in ('tikv', 'pd') else 'KILL')
+    exited = wait_for_exit()
+    for f in futures:
+        f.result()
+    if graceful and not exited:
+        print('WARN TiKV/PD did not stop on SIGTERM, killing them; their data is only crash-consistent')
+        for f in kill_service('tikv') + kill_service('pd'):
+            f.result()
+        wait_for_exit()
+    journal.record('shutdown')
+
+def wait_for_exit():
+    """
+Wait until no tikv-server or pd-server processes remain on the nodes we
+started. Returns whether they did.
+"""
+    services = [(pid, conn) for name, (pid, conn) in running_pids.items()
+                if name.startswith(('tikv', 'pd'))]
+    # the brackets keep pgrep from matching the shell running the command
+    checks = {conn.host: (conn, 'pgrep -f "[t]ikv-server|[p]d-server"') for _, conn in services}
+    for pid, conn in services:
+        if is_local(conn):
+            checks[conn.host] = (conn, f'kill -0 -- -{pid}')
+
+    def exited():
+        futures = {host: hostpool.submit(c, cmd) for host, (c, cmd) in checks.items()}
+        alive = [host for host, f in futures.items() if f.result().ok]
+        return not alive, f'still running on {alive}'
+
+    try:
+        wait_until(exited, 'service shutdown', expconf.readytimeout)
+        return True
+    except NotReadyError as e:
+        print(f'WARN {e}')
+        return False
 
 def collect_output(threads):
     """Consolidate experiment output in local results directory.
-Remote output: TiKV logs, strace out, blktrace out.
+Remote output: TiKV logs, disk samples or strace and blktrace out.
 Local output: ycsb log
-We create a subdir for each remote node.
+We create a subdir for each remote node. All nodes are collected concurrently;
+logs and traces are compressed on the node before transfer.
 """
-    # files from remote
+    wait_for_fetches()
+    # group the services by host so each node gets one collection thread
+    byhost = {}
     for name, info in running_pids.items():
-        vals = name.split("-")
-        nodeindex = vals[1]
-        destdir = f'{expconf.outdirectory}/{nodeindex}'
-        os.makedirs(destdir, exist_ok=True)
-
-        # collect logs
         _, conn = info
-        if vals[0].startswith("tikv"):
-            conn.get(f'{nodeconf.home}/tikv.log', f'{destdir}/tikv-{threads}.log')
-
-            # collect tikv metrics
-            tikvip = expconf.dbnodes[int(nodeindex)]
-            curlmetrics = ['curl', f'http://{tikvip}:{tikvconf.tikv_status_port}/metrics']
-            with open(f'{destdir}/tikv-{threads}.metrics', 'w') as outfile:
-                print(f'get metrics: {curlmetrics}')
-                p = subprocess.Popen(curlmetrics, stdout=outfile)
-                p.wait()
-        elif vals[0].startswith("pd"):
-            conn.get(f'{nodeconf.home}/pd.log', f'{destdir}/pd.log')
-        elif vals[0].startswith("strace"):
-            conn.get(f'{nodeconf.home}/{expconf.expname}-{expconf.dbsize}.strace', f'{destdir}/strace.out')
-        elif vals[0].startswith("blktrace"):
-            for i in range(32):
-                conn.get(f'{nodeconf.home}/sdb.blktrace.{i}', f'{destdir}/sdb.blktrace.{i}')
-        else:
-            print("tried to collect output from unknown service")
+        byhost.setdefault(conn.host, (conn, []))[1].append(name)
+
+    def collect_host(host):
+        conn, names = byhost[host]
+        stats = TransferStats(host)
+        use_zstd = can_use_zstd(conn)
+        with stats.timed():
+            for name in names:
+                stats.nbytes += collect_service(name, conn, threads, use_zstd)
+        return stats
+
+    allstats = parallel_map(collect_host, byhost)
+    print('collected output:')
+    for stats in allstats:
+        print(f'  {stats}')
+
+def collect_service(name, conn, threads, use_zstd):
+    """Fetch the output of one service into its node directory. Returns bytes transferred."""
+    vals = name.split("-")
+    nodeindex = vals[1]
+    destdir = f'{expconf.outdirectory}/{nodeindex}'
+    os.makedirs(destdir, exist_ok=True)
+
+    if vals[0].startswith("tikv"):
+        nbytes = fetch_compressed(conn, f'{node_home(conn)}/tikv.log', f'{destdir}/tikv-{threads}.log', use_zstd)
+
+        # collect tikv metrics
+        metricsurl = f'http://{tikv_status_addr(int(nodeindex))}/metrics'
+        print(f'get metrics: {metricsurl}')
+        try:
+            nbytes += fetch_url(metricsurl, f'{destdir}/tikv-{threads}.metrics')
+        except OSError as e:
+            print(f'WARN could not scrape {metricsurl}: {e}')
+        return nbytes
+    elif vals[0].startswith("pd"):
+        return fetch_compressed(conn, f'{node_home(conn)}/pd.log', f'{destdir}/pd.log', use_zstd)
+    elif vals[0].startswith("strace"):
+        return fetch_compressed(conn, f'{node_home(conn)}/{expconf.expname}-{expconf.dbsize}.strace', f'{destdir}/strace.out', use_zstd)
+    elif vals[0].startswith("blktrace"):
+        # blktrace writes one file per CPU; only the ones that exist are sent
+        return fetch_matching(conn, node_home(conn), f'{data_devices[int(nodeindex)]}.blktrace.*', destdir)
+    elif vals[0].startswith("disksampler"):
+        # one file per writescalability point, like the metrics
+        suffix = '' if threads == 0 else f'-{threads}'
+        nbytes = fetch_compressed(conn, f'{node_home(conn)}/disk-samples.csv', f'{destdir}/disk-samples{suffix}.csv', use_zstd)
+        if expconf.sampleresources:
+            nbytes += fetch_compressed(conn, f'{node_home(conn)}/resources.csv', f'{destdir}/resources-{threads}.csv', use_zstd)
+        if expconf.membudget:
+            nbytes += fetch_compressed(conn, f'{node_home(conn)}/memory.csv', f'{destdir}/memory{suffix}.csv', use_zstd)
+        return nbytes
+    else:
+        print("tried to collect output from unknown service")
+        return 0
     
 def cleanup_services():
+    # gather the files to remove on each host, then clean all hosts at once
+    paths = {}
+    conns = {}
     for name, info in running_pids.items():
         _, conn = info
+        conns[conn.host] = conn
+        hostpaths = paths.setdefault(conn.host, [])
+        home, data = node_home(conn), node_data(conn)
         if name.startswith("tikv"):
-            conn.run(f'sudo rm {nodeconf.home}/tikv.log')
-            conn.run(f'sudo rm -rf {nodeconf.data}/tikv-data')
+            hostpaths += [f'{home}/tikv.log', f'{data}/tikv-data', f'{home}/tikv-memsweep.toml']
         elif name.startswith("pd"):
-            conn.run(f'sudo rm {nodeconf.home}/pd.log')
-            conn.run(f'sudo rm -rf {nodeconf.data}/pd')
+            hostpaths += [f'{home}/pd.log', f'{data}/pd']
         elif name.startswith("strace"):
-            conn.run(f'sudo rm {nodeconf.home}/{expconf.expname}-{expconf.dbsize}.strace')
+            hostpaths += [f'{home}/{expconf.expname}-{expconf.dbsize}.strace']
         elif name.startswith("blktrace"):
-            conn.run(f'sudo rm {nodeconf.home}/sdb.blktrace.*')
+            hostpaths += [f'{home}/{data_devices[int(name.split("-")[1])]}.blktrace.*']
+        elif name.startswith("disksampler"):
+            hostpaths += [f'{home}/disk-samples.csv', f'{home}/resources.csv', f'{home}/memory.csv',
+                          f'{home}/disksampler.py']
         else:
             print("tried to cleanup unknown service")
 
+    futures = [hostpool.submit(conns[host], f'sudo rm -rf {" ".join(paths[host])}')
+               for host in paths if paths[host]]
+    for f in futures:
+        f.result()
+    # nothing is left of these services; the next start or --resume begins from scratch
+    with running_pids_lock:
+        running_pids.clear()
+    data_devices.clear()
+    journal.record('cleanup')
+
 def build_ycsb_cmd(cmdtype, workload, opts):
     cmd = [nodeconf.ycsb_exe, cmdtype, 'tikv', '-P', workload]
     for o in opts:
@@ -297,12 +861,12 @@ def build_ycsb_cmd(cmdtype, workload, opts):
 # ./measure-writes.py --tikv_nodes 10.10.1.2,10.10.1.3,10.10.1.4 --pd_node 10.10.1.1 --client_node 10.10.1.5 -s $((100 * 1024 * 1024 * 1024)) -v 16384 --workloads a,b,c,d,e,f --name helloworld --experimenttype ycsb
 def get_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--tikv_nodes", type=str, required=True,
-                        help="TiKV node IPs as comma-separated list")
-    parser.add_argument("--pd_node", type=str, required=True,
-                        help="PD IP")
-    parser.add_argument("--client_nodes", type=str, required=True,
-                        help="Client IPs as comma-separated list")
+    parser.add_argument("--tikv_nodes", type=str, default=None,
+                        help="TiKV node IPs as comma-separated list (--local: 3x 127.0.0.1)")
+    parser.add_argument("--pd_node", type=str, default=None,
+                        help="PD IP (--local: 127.0.0.1)")
+    parser.add_argument("--client_nodes", type=str, default=None,
+                        help="Client IPs as comma-separated list (--local: 127.0.0.1)")
     parser.add_argument("-v", "--vsize", type=int, default=1024,
                         help="value size (1KB)")
     parser.add_argument("-s", "--db_size", type=int, default=(10 * 1024 * 1024 * 1024),
@@ -318,17 +882,90 @@ def get_args():
     parser.add_argument("-n", "--name", type=str, default='',
                         help="experiment name (used in results directory)")
     parser.add_argument("--experimenttype", type=str, required=True,
-                        help="experiment type: disk_measurement OR ycsb")
+                        help="experiment type: disk_measurement, ycsb, writescalability, memsweep or openloop")
     parser.add_argument("--workloads", type=str, default=None,
                         help="YCSB workloads by lower-case letter name as comma-separated list")
+    parser.add_argument("--ready_timeout", type=float, default=120.0,
+                        help="seconds to wait for PD/TiKV to become ready (120 default)")
+    parser.add_argument("--scrape_interval", type=float, default=5.0,
+                        help="seconds between TiKV metrics scrapes during runs, 0 disables (5 default)")
+    parser.add_argument("--adaptive", action='store_true',
+                        help="search threadsmin..threads for the throughput knee instead of running every step")
+    parser.add_argument("--threadstep", type=int, default=None,
+                        help="thread count step (8 for ycsb, 4 for writescalability by default)")
+    parser.add_argument("--knee_gain", type=float, default=0.05,
+                        help="adaptive: stop splitting intervals gaining less throughput than this (0.05)")
+    parser.add_argument("--latency_slo", type=float, default=0.0,
+                        help="adaptive: p99 latency SLO in ms, points above it are past the knee (off)")
+    parser.add_argument("--dataset_cache", action='store_true',
+                        help="ycsb: restore the loaded dataset from a per-node cache instead of reloading, saving it after the first load")
+    parser.add_argument("--disk_tracer", choices=['sample', 'strace'], default='sample',
+                        help="disk_measurement: sample kernel I/O counters (default) or attach strace and blktrace")
+    parser.add_argument("--sample_interval", type=float, default=0.1,
+                        help="disk_measurement: seconds between I/O counter samples (0.1)")
+    parser.add_argument("--sample_resources", action='store_true',
+                        help="sample CPU, disk and network of the TiKV nodes into <node>/resources-<threads>.csv")
+    parser.add_argument("--mem_budgets", type=str, default='8G,16G,32G',
+                        help="memsweep: TiKV cgroup memory limits to sweep, comma-separated (8G,16G,32G)")
+    parser.add_argument("--block_cache_ratio", type=float, default=0.45,
+                        help="memsweep: block cache capacity as a fraction of the memory budget (0.45, TiKV's default)")
+    parser.add_argument("--target_rates", type=str, default=None,
+                        help="openloop: total go-ycsb target rates in ops/sec to offer, comma-separated")
+    parser.add_argument("--rate_seconds", type=float, default=60.0,
+                        help="openloop: seconds per rate, 0 runs --ops operations at every rate (60)")
+    parser.add_argument("--min_rate_ratio", type=float, default=0.95,
+                        help="openloop: a rate counts as met if this fraction of it was achieved (0.95)")
+    parser.add_argument("--stream", action='store_true',
+                        help="follow go-ycsb status lines live during runs, merged into stream_*.csv")
+    parser.add_argument("--stream_interval", type=float, default=5.0,
+                        help="--stream: go-ycsb status interval in seconds (5 default)")
+    parser.add_argument("--stop_stable", type=float, default=0.0,
+                        help="--stream: end a run once throughput stays within this fraction for 3 intervals (off)")
+    parser.add_argument("--stop_collapse", type=float, default=0.0,
+                        help="--stream: end a run once throughput falls below this fraction of its peak (off)")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="repeat the experiment N times into <name>-<run>-<size>-<vsize>, shuffling the workload order per run (1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="--runs: seed of the workload order shuffle, recorded in run.json (random)")
+    parser.add_argument("--resume", action='store_true',
+                        help="continue a crashed experiment from its journal.jsonl, skipping finished steps")
+    parser.add_argument("--tikv_exe", type=str, default=None,
+                        help="tikv-server binary on the TiKV nodes (default /software/tikv-xll/target/release/tikv-server)")
+    parser.add_argument("--local", action='store_true',
+                        help="run every node as a local process on this host, each with its own directories and ports")
+    parser.add_argument("--local_root", type=str, default=f'{os.getcwd()}/local-cluster',
+                        help="--local: directory holding each node's home and data directories")
+    parser.add_argument("--fake", action='store_true',
+                        help="run the stand-ins in fakecluster.py instead of pd-server, tikv-server and go-ycsb")
+
+    args = parser.parse_args()
+    if args.local:
+        args.tikv_nodes = args.tikv_nodes or '127.0.0.1,127.0.0.1,127.0.0.1'
+        args.pd_node = args.pd_node or '127.0.0.1'
+        args.client_nodes = args.client_nodes or '127.0.0.1'
+    elif not (args.tikv_nodes and args.pd_node and args.client_nodes):
+        parser.error('--tikv_nodes, --pd_node and --client_nodes are required without --local')
+    if args.experimenttype.strip() == 'openloop' and not args.target_rates:
+        parser.error('--experimenttype openloop needs --target_rates')
+    nclients = len(args.client_nodes.split(','))
+    if (args.threadsmin or args.threads) < nclients:
+        parser.error(f'--threads/--threadsmin must be at least the number of client nodes ({nclients})')
+    return args
 
-    return  parser.parse_args()
+def make_connection(args, host, role, index):
+    if args.local:
+        return LocalConnection(args.local_root, role, index)
+    return Connection(host=host, user=os.getlogin(), port=22)
 
 def main():
+    global nodeconf
     # arguments and setup experiment parameters
     args = get_args()
+    if args.fake:
+        nodeconf = FakeNodeConfig()
+    if args.tikv_exe:
+        nodeconf.tikv_bin = args.tikv_exe.strip()
     experimenttype = args.experimenttype.strip()
-    expconf.expname = f'{args.name.strip()}-{args.db_size // (1024 * 1024 * 1024)}GB-{args.vsize // 1024}KB'
     expconf.monitornode = args.pd_node.strip()
     expconf.dbnodes = [ip.strip() for ip in args.tikv_nodes.split(',')]
     expconf.clientnodes = [ip.strip() for ip in args.client_nodes.split(',')]
@@ -337,62 +974,380 @@ def main():
     expconf.threads = args.threads
     expconf.threadsmin = args.threads if not args.threadsmin else args.threadsmin
     expconf.ops = args.ops
-    expconf.outdirectory = f'{os.getcwd()}/results/{expconf.expname}/{experimenttype}'
+    expconf.readytimeout = args.ready_timeout
+    expconf.scrapeinterval = args.scrape_interval
+    expconf.adaptive = args.adaptive
+    expconf.threadstep = args.threadstep or 0
+    expconf.kneegain = args.knee_gain
+    expconf.latencyslo = args.latency_slo
+    expconf.datasetcache = args.dataset_cache
+    expconf.local = args.local
+    expconf.disktracer = args.disk_tracer
+    expconf.sampleinterval = args.sample_interval
+    expconf.sampleresources = args.sample_resources
+    expconf.stream = args.stream
+    expconf.streaminterval = args.stream_interval
+    expconf.stopstable = args.stop_stable
+    expconf.stopcollapse = args.stop_collapse
+    expconf.runs = args.runs
+    expconf.membudgets = [b.strip() for b in args.mem_budgets.split(',') if b.strip()]
+    expconf.blockcacheratio = args.block_cache_ratio
+    expconf.targetrates = [int(float(r)) for r in (args.target_rates or '').split(',') if r.strip()]
+    expconf.rateseconds = args.rate_seconds
+    expconf.minrateratio = args.min_rate_ratio
     workloads = [] if not args.workloads else [workload.strip() for workload in args.workloads.split(',')]
+    seed = args.seed if args.seed is not None else random.randrange(2**32)
 
+    # open connections
+    pdconn = make_connection(args, expconf.monitornode, 'pd', 0)
+    tikvconns = [make_connection(args, ip, 'tikv', i) for i, ip in enumerate(expconf.dbnodes)]
+    clientconns = [make_connection(args, ip, 'client', i) for i, ip in enumerate(expconf.clientnodes)]
+    hostpool.warm([pdconn] + tikvconns + clientconns)
+    expconf.clientcores = probe_cores(clientconns)
+
+    try:
+        for run in range(expconf.runs):
+            order = start_run(args, experimenttype, run, workloads, seed)
+            if order is None:
+                continue
+            resumed = reconcile(experimenttype, [pdconn] + tikvconns + clientconns) if args.resume else None
+            run_experiment(experimenttype, order, pdconn, tikvconns, clientconns, resumed)
+    except NotReadyError as e:
+        # don't run ycsb against a broken cluster. keep the logs so we can see why.
+        print(f'ERROR {e}, aborting')
+        collect_output('failed')
+        shutdown_services()
+        cleanup_services()
+        sys.exit(1)
+    finally:
+        print(hostpool.summary())
+        hostpool.close()
+
+def start_run(args, experimenttype, run, workloads, seed):
+    """
+Point the output at the directory of one repetition and return its workload
+order, or None if --resume finds it already finished. With --runs > 1 the
+directory is <name>-<run>-<size>-<vsize> with runs numbered from 1 (see
+experiment_directory_multirun in plotting/common.sh) and the workloads run
+in a shuffled order, so no workload always runs on the freshest dataset.
+"""
+    name = args.name.strip()
+    if expconf.runs > 1:
+        name = f'{name}-{run + 1}'
+        order = random.Random(seed + run).sample(workloads, len(workloads))
+    else:
+        order = list(workloads)
+    expconf.expname = f'{name}-{args.db_size // (1024 * 1024 * 1024)}GB-{args.vsize // 1024}KB'
+    expconf.outdirectory = f'{os.getcwd()}/results/{expconf.expname}/{experimenttype}'
+    phaselog.path = f'{expconf.outdirectory}/phases.csv'
+    shard_plans.clear()
+    # a previous repetition's services are not this run's leftovers
+    running_pids.clear()
+    data_devices.clear()
     os.makedirs(expconf.outdirectory, exist_ok=True)
+    journal.open(f'{expconf.outdirectory}/journal.jsonl', args.resume)
+    if args.resume:
+        if journal.done('experiment'):
+            print(f'{expconf.expname} already finished, skipping')
+            return None
+        if os.path.exists(f'{expconf.outdirectory}/shard-plan.json'):
+            shard_plans.update(read_plans(f'{expconf.outdirectory}/shard-plan.json'))
+        if os.path.exists(f'{expconf.outdirectory}/run.json'):
+            # keep the order the crashed run was using
+            with open(f'{expconf.outdirectory}/run.json') as f:
+                order = json.load(f)['workloads']
+    if expconf.runs > 1:
+        print(f'run {run + 1}/{expconf.runs}: workloads {",".join(order)}')
+        with open(f'{expconf.outdirectory}/run.json', 'w') as f:
+            json.dump({'run': run + 1, 'runs': expconf.runs, 'seed': seed, 'workloads': order}, f, indent=1)
+    return order
 
-    # open connections
-    pdconn = Connection(host=expconf.monitornode, user=os.getlogin(), port=22)
-    tikvconns = list(map(lambda c:
-                         Connection(host=c, user=os.getlogin(), port=22),
-                         expconf.dbnodes))
-    clientconns = list(map(lambda c:
-                           Connection(host=c, user=os.getlogin(), port=22),
-                           expconf.clientnodes))
+def start_cluster(pdconn, tikvconns):
+    start_pd(pdconn)
+    wait_for_cluster(tikv=False)
+
+    start_tikv(tikvconns)
+    wait_for_cluster()
 
+def run_write_point(threads, pdconn, tikvconns, clientconns):
+    """Load a fresh cluster with threads divided amongst clients. Returns (ops/sec, p99 usec)."""
+    label = f'load_threads_{threads}'
+    if journal.done(f'point:{threads}'):
+        print(f'point:{threads} already done, skipping')
+        return client_summary(point_logs(label))
+
+    # not sure if this matters for write-only workload
+    drop_caches(tikvconns)
+
+    start_cluster(pdconn, tikvconns)
+    if expconf.sampleresources:
+        start_samplers(tikvconns)
+
+    scraper = start_scraper(threads)
+    try:
+        load_ycsb(clientconns, threads)
+    finally:
+        stop_scraper(scraper)
+
+    if expconf.sampleresources:
+        stop_samplers()
+    collect_output(threads)
+    shutdown_services()
+    cleanup_services()
+    journal.record(f'point:{threads}')
+    return client_summary(point_logs(label))
+
+def dataset_key(tikvconns):
+    """
+Name of the cached dataset for this configuration: TiKV branch, db size,
+value size, record count, and the TiKV node list (stores remember their
+addresses, so a dataset only restores onto the same nodes in the same order).
+"""
+    res = hostpool.run(tikvconns[0], f'git -C {nodeconf.tikv_build_repo} rev-parse --abbrev-ref HEAD')
+    branch = res.stdout.strip().replace('/', '_') if res.ok else 'unknown'
+    nodes = '_'.join(expconf.dbnodes).replace('.', '_')
+    opts = generate_ycsb_opts()
+    return f'{branch}-{expconf.dbsize}-{expconf.valuesize}-{opts.recordcount}-{nodes}'
+
+def dataset_cache(conn):
+    return f'{node_data(conn)}/dataset-cache'
+
+def dataset_paths(pdconn, tikvconns):
+    """(connection, data directory) of every directory that makes up the dataset"""
+    return [(pdconn, 'pd')] + [(conn, 'tikv-data') for conn in tikvconns]
+
+def reflink_hosts(conns):
+    """Hosts among conns whose data directory cannot clone a file (cp --reflink=always), probed on all at once."""
+    futures = [(conn, hostpool.submit(conn, f'sudo mkdir -p {dataset_cache(conn)} && probe=$(sudo mktemp -p {dataset_cache(conn)}) && '
+                                            f'{{ sudo cp --reflink=always $probe $probe.clone 2> /dev/null; ok=$?; '
+                                            f'sudo rm -f $probe $probe.clone; test $ok = 0; }}'))
+               for conn in conns]
+    return [conn.host for conn, future in futures if not future.result().ok]
+
+def clone_command(src, dst):
+    """
+Shell command copying src to dst as a copy-on-write clone (btrfs, xfs).
+Where the filesystem cannot clone (ext4) it prints "full copy" and copies
+every byte instead.
+"""
+    return (f'{{ sudo cp -a --reflink=always {src} {dst} 2> /dev/null || '
+            f'{{ sudo rm -rf {dst} && echo "full copy" && sudo cp -a {src} {dst}; }}; }}')
+
+def copy_dataset(commands, what):
+    """
+Run one copy command per (conn, name) on all nodes at once, warning
+where clone_command fell back to a full copy.
+"""
+    futures = [(conn, name, hostpool.submit(conn, cmd)) for (conn, name), cmd in commands]
+    for conn, name, future in futures:
+        res = future.result()
+        if not res.ok:
+            raise RuntimeError(f'{conn.host}: could not {what} {name}: {res.stdout}')
+        if 'full copy' in res.stdout:
+            print(f'WARN {conn.host}: {node_data(conn)} cannot reflink, {name} was copied in full')
+
+def snapshot_dataset(pdconn, tikvconns, key):
+    """
+Copy the loaded PD and TiKV data into the dataset cache on every node in
+parallel. The services must have been stopped with
+shutdown_services(graceful=True), so the copy is of cleanly closed data.
+"""
+    print(f'saving dataset {key}')
+    commands = []
+    for conn, name in dataset_paths(pdconn, tikvconns):
+        cache = f'{dataset_cache(conn)}/{key}'
+        commands.append(((conn, name), f'sudo mkdir -p {cache} && sudo rm -rf {cache}/{name}.tmp && '
+                                       f'{clone_command(f"{node_data(conn)}/{name}", f"{cache}/{name}.tmp")} && '
+                                       f'sudo mv {cache}/{name}.tmp {cache}/{name}'))
+    copy_dataset(commands, 'save')
+
+def dataset_cached(pdconn, tikvconns, key):
+    paths = dataset_paths(pdconn, tikvconns)
+    futures = [hostpool.submit(conn, f'test -d {dataset_cache(conn)}/{key}/{name}') for conn, name in paths]
+    return all(f.result().ok for f in futures)
+
+def restore_dataset(pdconn, tikvconns, key):
+    """Restore a cached dataset on every node in parallel. Returns False if any node lacks it."""
+    paths = dataset_paths(pdconn, tikvconns)
+    if not dataset_cached(pdconn, tikvconns, key):
+        print(f'dataset {key} not cached on every node, loading')
+        return False
+
+    print(f'restoring dataset {key}')
+    copy_dataset([((conn, name), f'sudo rm -rf {node_data(conn)}/{name} && '
+                                 f'{clone_command(f"{dataset_cache(conn)}/{key}/{name}", f"{node_data(conn)}/{name}")}')
+                  for conn, name in paths], 'restore')
+    return True
+
+def services_alive(services):
+    """Whether each (pid, conn) is still running, checked on all nodes at once."""
+    futures = [hostpool.submit(conn, f'kill -0 -- -{pid}' if is_local(conn) else f'sudo kill -0 {pid}')
+               for pid, conn in services]
+    return [f.result().ok for f in futures]
+
+def reconcile(experimenttype, conns):
+    """
+--resume: take over the services the journal says were started since the
+last cleanup. A loaded ycsb cluster is kept: reused as is if PD and every
+TiKV are still up and ready ('running'), otherwise restarted on its data
+('data'). Anything else is killed and removed, so a writescalability
+point or a disk measurement starts over (None).
+"""
+    byhost = {c.host: c for c in conns}
+    for name, (pid, host) in journal.leftovers().items():
+        if host in byhost:
+            running_pids[name] = (pid, byhost[host])
+    for e in journal.since('cleanup'):
+        if e['step'] == 'service' and e.get('device'):
+            data_devices[int(e['name'].split('-')[1])] = e['device']
+    if not running_pids:
+        return None
+    print(f'leftover services: {", ".join(sorted(running_pids))}')
+
+    keep = experimenttype in ('ycsb', 'openloop') and journal.done('load')
+    cluster = [(name, info) for name, info in running_pids.items() if name.startswith(('tikv', 'pd'))]
+    if keep and cluster and all(services_alive([info for _, info in cluster])):
+        try:
+            wait_for_cluster()
+            # samplers and tracers are restarted for the rest of the experiment
+            futures = []
+            for pname in ["disksampler", "strace", "blktrace"]:
+                futures += kill_service(pname)
+            for f in futures:
+                f.result()
+            running_pids.clear()
+            running_pids.update(cluster)
+            print('reusing the running cluster')
+            return 'running'
+        except NotReadyError as e:
+            print(f'leftover cluster not usable: {e}')
+
+    shutdown_services()
+    if keep:
+        print('restarting on the loaded data')
+        return 'data'
+    cleanup_services()
+    return None
+
+def run_memsweep(workloads, pdconn, tikvconns, clientconns):
+    """
+Run the workloads once per --mem_budgets value on the same dataset: the
+load is cached (as with --dataset_cache) and restored before every budget,
+and the cluster restarts with TiKV limited to the budget (cgroup MemoryMax)
+and its block cache sized to --block_cache_ratio of it. Memory and page
+cache counters are sampled on the TiKV nodes throughout. Each budget's
+output goes to <experiment>/memsweep-<budget>/, like an experiment type
+of its own, so the usual tools read it unchanged. Unlike --dataset_cache
+this needs the cache even without reflink: a full copy still beats a load.
+"""
+    base = expconf.outdirectory
+    cachekey = dataset_key(tikvconns)
+    if dataset_cached(pdconn, tikvconns, cachekey):
+        print(f'using cached dataset {cachekey}')
+    else:
+        start_cluster(pdconn, tikvconns)
+        load_ycsb(clientconns, expconf.threads)
+        collect_output(0)
+        shutdown_services(graceful=True)
+        snapshot_dataset(pdconn, tikvconns, cachekey)
+        cleanup_services()
+        journal.record('load')
+
+    for budget in expconf.membudgets:
+        step = f'budget:{budget}'
+        if journal.done(step):
+            print(f'{step} already done, skipping')
+            continue
+        print(f'memory budget {budget}')
+        expconf.membudget = budget
+        expconf.outdirectory = f'{base}-{budget}'
+        phaselog.path = f'{expconf.outdirectory}/phases.csv'
+        os.makedirs(expconf.outdirectory, exist_ok=True)
+
+        restore_dataset(pdconn, tikvconns, cachekey)
+        start_cluster(pdconn, tikvconns)
+        start_samplers(tikvconns)
+        scraper = start_scraper(0)
+        try:
+            run_ycsb_workloads(workloads, tikvconns, clientconns)
+        finally:
+            stop_scraper(scraper)
+        stop_samplers()
+        collect_output(0)
+        shutdown_services()
+        cleanup_services()
+        journal.record(step)
+
+    expconf.membudget = ''
+    expconf.outdirectory = base
+    phaselog.path = f'{base}/phases.csv'
+
+def run_experiment(experimenttype, workloads, pdconn, tikvconns, clientconns, resumed=None):
     # really ugly but we need a fresh start each time for writes
     if experimenttype == 'writescalability':
-        for threads in range(expconf.threadsmin, expconf.threads + 1, 4):
-            # not sure if this matters for write-only workload
-            run_in_parallel("echo 3 | sudo tee /proc/sys/vm/drop_caches", tikvconns)
-            time.sleep(5)
-
-            clientthreads = threads // len(expconf.clientnodes)
-            start_pd(pdconn)
-            time.sleep(8)
-            
-            start_tikv(tikvconns)
-            time.sleep(8)
+        sweep_threads(lambda threads: run_write_point(threads, pdconn, tikvconns, clientconns),
+                      'load', 4)
+        journal.record('experiment')
+        return
 
-            load_ycsb(clientconns, clientthreads)
-            
-            collect_output(threads)
-            shutdown_services()
-            time.sleep(5)
-            cleanup_services()
-        sys.exit(0)
+    if experimenttype == 'memsweep':
+        run_memsweep(workloads, pdconn, tikvconns, clientconns)
+        journal.record('experiment')
+        return
 
-    start_pd(pdconn)
-    time.sleep(8)
+    if resumed:
+        # the loaded data is still on the nodes
+        cachekey = None
+        loaded = True
+        if resumed == 'data':
+            start_cluster(pdconn, tikvconns)
+    else:
+        # disk measurement is about the load itself, so only ycsb and openloop runs use the cache
+        cachekey = dataset_key(tikvconns) if experimenttype in ('ycsb', 'openloop') and expconf.datasetcache else None
+        noreflink = reflink_hosts([pdconn] + tikvconns) if cachekey else []
+        if noreflink:
+            # a full copy of the dataset each way costs about as much as loading it again
+            print(f'WARN {", ".join(noreflink)}: data directory cannot reflink (ext4?), not using the dataset cache')
+            cachekey = None
+        loaded = cachekey is not None and restore_dataset(pdconn, tikvconns, cachekey)
+        start_cluster(pdconn, tikvconns)
 
-    start_tikv(tikvconns)
-    time.sleep(8)
+    if cachekey and not loaded:
+        # build the cache first so every run starts from a freshly started cluster
+        load_ycsb(clientconns, expconf.threads)
+        shutdown_services(graceful=True)
+        snapshot_dataset(pdconn, tikvconns, cachekey)
+        start_cluster(pdconn, tikvconns)
+        loaded = True
 
     if experimenttype == 'disk_measurement':
         start_disk_measurement(tikvconns)
         time.sleep(2)
+    elif expconf.sampleresources:
+        start_samplers(tikvconns)
 
-    load_ycsb(clientconns, expconf.threads // len(expconf.clientnodes))
-    
-    if experimenttype == 'ycsb':
-        # this will handle a scalability workload if given threadsmin and threads
-        run_ycsb_workloads(workloads, tikvconns, clientconns)
+    scraper = start_scraper(0)
+    try:
+        if not loaded:
+            load_ycsb(clientconns, expconf.threads)
+        journal.record('load')
 
+        if experimenttype == 'ycsb':
+            # this will handle a scalability workload if given threadsmin and threads
+            run_ycsb_workloads(workloads, tikvconns, clientconns)
+        elif experimenttype == 'openloop':
+            run_openloop(workloads, tikvconns, clientconns)
+    finally:
+        stop_scraper(scraper)
+
+    if experimenttype == 'disk_measurement' or expconf.sampleresources:
+        stop_samplers()
     collect_output(0)
+    if experimenttype == 'disk_measurement':
+        write_disk_phases()
     shutdown_services()
-    time.sleep(5)
     cleanup_services()
+    journal.record('experiment')
     
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+"""
+Streaming file transfer from experiment nodes.
+
+Large logs and traces are compressed on the remote side and streamed
+back over the existing SSH connection, then decompressed on the fly, so
+the results tree looks exactly as if the files had been copied with
+conn.get(). zstd is used when both ends have it, gzip otherwise.
+"""
+
+import shutil
+import subprocess
+import tarfile
+import time
+import urllib.request
+import zlib
+from contextlib import contextmanager
+
+CHUNK = 1 << 20
+
+
+class CountingReader:
+    """File-like wrapper that counts the bytes read through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.nbytes = 0
+
+    def read(self, n=-1):
+        data = self.f.read(n)
+        self.nbytes += len(data)
+        return data
+
+
+@contextmanager
+def stream_command(conn, cmd):
+    """Run cmd on conn and yield its stdout as a binary file object."""
+    if hasattr(conn, 'stream'):
+        # local nodes (see localhost.py) stream from a subprocess instead
+        with conn.stream(cmd) as stdout:
+            yield stdout
+        return
+    conn.open()
+    chan = conn.client.get_transport().open_session()
+    chan.exec_command(cmd)
+    stdout = chan.makefile('rb', CHUNK)
+    try:
+        yield stdout
+    finally:
+        status = chan.recv_exit_status()
+        chan.close()
+        if status != 0:
+            print(f'WARN {conn.host}: "{cmd}" exited with {status}')
+
+
+def can_use_zstd(conn):
+    """zstd needs to be installed both here and on the remote node."""
+    if not shutil.which('zstd'):
+        return False
+    return conn.run('command -v zstd', hide=True, warn=True).ok
+
+
+def fetch_compressed(conn, remote_path, local_path, use_zstd=False):
+    """
+    Copy remote_path to local_path, compressed in flight.
+    Returns the number of bytes that crossed the network, 0 without
+    creating local_path if remote_path does not exist.
+    """
+    if not conn.run(f'sudo test -f {remote_path}', hide=True, warn=True).ok:
+        print(f'WARN {conn.host}: {remote_path} does not exist, not fetched')
+        return 0
+    if use_zstd:
+        with stream_command(conn, f'sudo zstd -q -1 -c {remote_path}') as stream, \
+             open(local_path, 'wb') as out:
+            reader = CountingReader(stream)
+            p = subprocess.Popen(['zstd', '-q', '-d', '-c'], stdin=subprocess.PIPE, stdout=out)
+            while chunk := reader.read(CHUNK):
+                p.stdin.write(chunk)
+            p.stdin.close()
+            p.wait()
+            return reader.nbytes
+
+    with stream_command(conn, f'sudo gzip -1 -c {remote_path}') as stream, \
+         open(local_path, 'wb') as out:
+        reader = CountingReader(stream)
+        inflate = zlib.decompressobj(wbits=31)
+        while chunk := reader.read(CHUNK):
+            out.write(inflate.decompress(chunk))
+        out.write(inflate.flush())
+        return reader.nbytes
+
+
+def fetch_matching(conn, remote_dir, pattern, local_dir):
+    """
+    Copy every file in remote_dir matching the shell glob pattern into
+    local_dir as a single compressed tar stream. Files that don't exist
+    are simply not sent. Returns the number of bytes transferred.
+    """
+    cmd = f'cd {remote_dir} && ls -1 {pattern} 2>/dev/null | sudo tar -czf - -T -'
+    with stream_command(conn, cmd) as stream:
+        reader = CountingReader(stream)
+        with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(local_dir, filter='data')
+            else:
+                tar.extractall(local_dir)
+        return reader.nbytes
+
+
+def fetch_url(url, local_path, timeout=30.0):
+    """Save the body of an HTTP GET (e.g. a TiKV /metrics scrape). Returns its size."""
+    with urllib.request.urlopen(url, timeout=timeout) as resp, open(local_path, 'wb') as out:
+        shutil.copyfileobj(resp, out, CHUNK)
+        return out.tell()
+
+
+class TransferStats:
+    """Bytes and wall-clock seconds spent collecting from one node."""
+
+    def __init__(self, host):
+        self.host = host
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    @contextmanager
+    def timed(self):
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.seconds += time.monotonic() - start
+
+    def __str__(self):
+        mb = self.nbytes / (1024 * 1024)
+        rate = mb / self.seconds if self.seconds else 0.0
+        return f'{self.host:<20} {mb:10.1f} MB {self.seconds:8.2f} s {rate:8.1f} MB/s'
@@ -0,0 +1,49 @@
+"""
+go-ycsb log lines.
+
+go-ycsb prints one line per operation type, both in its periodic status
+output and in the summary at the end of a run:
+
+    READ   - Takes(s): 60.0, Count: 100, OPS: 1.6, Avg(us): 10, ..., 99th(us): 20
+
+The harness (sweep.py, ycsbstream.py, openloop.py) and the plotting
+scripts (plotting/ycsbresults.py) all read them through this module.
+"""
+
+import re
+
+summary_re = re.compile(r'^(?P<op>[A-Z][A-Z_-]*)\s+- (?P<fields>Takes\(s\): .*)$')
+
+# go-ycsb field name -> table column
+fieldnames = {
+    'Takes(s)': 'takes', 'Count': 'count', 'OPS': 'ops', 'Avg(us)': 'avg_us',
+    'Min(us)': 'min_us', 'Max(us)': 'max_us', '50th(us)': 'p50_us', '90th(us)': 'p90_us',
+    '95th(us)': 'p95_us', '99th(us)': 'p99_us', '99.9th(us)': 'p999_us', '99.99th(us)': 'p9999_us',
+}
+
+
+def parse_line(line):
+    """(op, {column: value}) of a go-ycsb summary or status line, None for other lines."""
+    m = summary_re.match(line)
+    if not m:
+        return None
+    values = {}
+    for field in m.group('fields').split(', '):
+        key, _, value = field.partition(': ')
+        if key in fieldnames:
+            try:
+                values[fieldnames[key]] = float(value)
+            except ValueError:
+                pass
+    return m.group('op'), values
+
+
+def parse_summary(path):
+    """{op: {column: value}} from the last summary line of each operation in a go-ycsb log."""
+    ops = {}
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            parsed = parse_line(line)
+            if parsed:
+                ops[parsed[0]] = parsed[1]
+    return ops
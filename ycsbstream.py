@@ -0,0 +1,163 @@
+"""
+Live go-ycsb output.
+
+In stream mode each client's go-ycsb stdout is read over its SSH
+connection while the run is going (instead of redirected to a file and
+fetched afterwards) and written to the same local .ycsb file. The
+periodic status lines (every status.interval seconds) of all clients
+are merged into one aggregate time series, written to
+stream_<run>.csv as it grows:
+
+    time,elapsed,op,ops,avg_us,p99_us,clients,event
+
+ops is the summed throughput of the clients' latest status intervals,
+avg_us the count-weighted average and p99_us the worst client's p99
+(both cumulative since the start of the run, as go-ycsb reports them).
+
+A StopRule can end a run early, once TOTAL throughput has stayed within
+a tolerance for a few intervals (stable), or has dropped below a
+fraction of its peak (collapsed). The run is then interrupted, and
+go-ycsb prints its summary as usual.
+"""
+
+import csv
+import threading
+import time
+
+from transfer import stream_command
+from ycsblog import parse_line
+
+
+class ClientState:
+    """Latest status of one client: {op: (window ops/s, count, avg_us, p99_us)}."""
+
+    def __init__(self):
+        self.ops = {}
+        self.last = {}
+
+    def update(self, op, values):
+        count = values.get('count', 0.0)
+        takes = values.get('takes', 0.0)
+        prev_count, prev_takes = self.last.get(op, (0.0, 0.0))
+        if takes <= prev_takes:
+            # repeated line (e.g. the final summary right after a status line)
+            return
+        rate = (count - prev_count) / (takes - prev_takes)
+        self.last[op] = (count, takes)
+        self.ops[op] = (rate, count, values.get('avg_us', 0.0), values.get('p99_us', values.get('avg_us', 0.0)))
+
+
+class LiveAggregate:
+
+    def __init__(self, nclients, path=None):
+        self.clients = [ClientState() for _ in range(nclients)]
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.series = []
+        self.updated = False
+        self.f = open(path, 'w', newline='') if path else None
+        self.writer = csv.writer(self.f) if self.f else None
+        if self.writer:
+            self.writer.writerow(['time', 'elapsed', 'op', 'ops', 'avg_us', 'p99_us', 'clients', 'event'])
+
+    def update(self, client, op, values):
+        with self.lock:
+            self.clients[client].update(op, values)
+            self.updated = True
+
+    def tick(self):
+        """Merge the clients' latest status into one row per op. Returns TOTAL ops/s (None without new status)."""
+        now = time.time()
+        with self.lock:
+            if not self.updated:
+                return None
+            self.updated = False
+            ops = sorted({op for c in self.clients for op in c.ops})
+            rows = []
+            for op in ops:
+                states = [c.ops[op] for c in self.clients if op in c.ops]
+                count = sum(s[1] for s in states)
+                avg = sum(s[2] * s[1] for s in states) / count if count else 0.0
+                rows.append((op, sum(s[0] for s in states), avg, max(s[3] for s in states), len(states)))
+        total = None
+        for op, rate, avg, p99, n in rows:
+            if op == 'TOTAL':
+                total = rate
+                self.series.append(rate)
+            self.write(now, op, rate, avg, p99, n)
+        return total
+
+    def write(self, now, op, rate, avg, p99, n, event=''):
+        if self.writer:
+            self.writer.writerow([f'{now:.3f}', f'{now - self.start:.1f}', op,
+                                  f'{rate:.1f}', f'{avg:.0f}', f'{p99:.0f}', n, event])
+            self.f.flush()
+
+    def event(self, event):
+        self.write(time.time(), '', 0.0, 0.0, 0.0, 0, event)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+
+class StopRule:
+    """
+    stable: the last `window` TOTAL intervals are within tolerance (max-min
+    relative to their mean). collapse: the last interval is below
+    `collapse` times the peak. The first `warmup` intervals are ignored.
+    """
+
+    def __init__(self, stable=0.0, collapse=0.0, window=3, warmup=1):
+        self.stable = stable
+        self.collapse = collapse
+        self.window = window
+        self.warmup = warmup
+
+    def check(self, series):
+        series = series[self.warmup:]
+        if self.collapse > 0 and len(series) > 1 and series[-1] < self.collapse * max(series):
+            return f'throughput collapsed to {series[-1]:.1f} ops/s (peak {max(series):.1f})'
+        if self.stable > 0 and len(series) >= self.window:
+            last = series[-self.window:]
+            mean = sum(last) / len(last)
+            if mean > 0 and (max(last) - min(last)) / mean <= self.stable:
+                return f'throughput stable at {mean:.1f} ops/s'
+        return None
+
+
+def stream_clients(conns, cmds, paths, interval, stop_rule=None, stop=None, log_path=None):
+    """
+    Run cmds[i] on conns[i], writing its stdout to paths[i] and merging the
+    status lines every interval seconds. stop() is called once when the stop
+    rule fires and must interrupt the runs. Returns the stop reason or None.
+    """
+    live = LiveAggregate(len(conns), log_path)
+
+    def follow(i):
+        with stream_command(conns[i], cmds[i]) as stdout, open(paths[i], 'wb') as out:
+            for raw in iter(stdout.readline, b''):
+                out.write(raw)
+                parsed = parse_line(raw.decode(errors='replace'))
+                if parsed:
+                    live.update(i, *parsed)
+
+    readers = [threading.Thread(target=follow, args=(i,), daemon=True) for i in range(len(conns))]
+    for t in readers:
+        t.start()
+
+    reason = None
+    while any(t.is_alive() for t in readers):
+        for t in readers:
+            t.join(timeout=interval / len(readers))
+        total = live.tick()
+        if total is not None:
+            print(f'live: {total:.1f} ops/s after {time.time() - live.start:.0f}s')
+        if reason is None and stop_rule and total is not None:
+            reason = stop_rule.check(live.series)
+            if reason:
+                print(f'stopping run early: {reason}')
+                live.event(f'stop: {reason}')
+                stop()
+    live.close()
+    return reason